@@ -18,6 +18,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 # Import your Base and settings
 from app.db.base import Base
 from app.core.config import settings
+from app.core.partitions import is_partition
 
 # Alembic Config object
 config = context.config
@@ -33,6 +34,11 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave daily partitions (created at runtime, not in the models) to app.core.partitions."""
+    return not (type_ == "table" and reflected and is_partition(name))
+
+
 def run_migrations_offline() -> None:
     """
     Run migrations in 'offline' mode.
@@ -46,6 +52,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -56,7 +63,11 @@ def run_migrations_offline() -> None:
 
 def do_run_migrations(connection: Connection) -> None:
     """Run migrations with the given connection."""
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object
+    )
 
     with context.begin_transaction():
         context.run_migrations()
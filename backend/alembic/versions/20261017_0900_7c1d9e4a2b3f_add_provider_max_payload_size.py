@@ -0,0 +1,23 @@
+"""Add per-provider max payload size
+
+Revision ID: 7c1d9e4a2b3f
+Revises: 2be6c878e8a5
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7c1d9e4a2b3f'
+down_revision = '2be6c878e8a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('providers', sa.Column('max_payload_size_bytes', sa.Integer(), nullable=True, comment='Per-provider max payload size in bytes (NULL = global default)'))
+
+
+def downgrade() -> None:
+    op.drop_column('providers', 'max_payload_size_bytes')
@@ -0,0 +1,26 @@
+"""Add provider signature scheme and rotation secrets
+
+Revision ID: a4e8f2c61d07
+Revises: 7c1d9e4a2b3f
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a4e8f2c61d07'
+down_revision = '7c1d9e4a2b3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('providers', sa.Column('additional_secret_keys', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False, comment='Extra HMAC secret keys accepted during rotation'))
+    op.add_column('providers', sa.Column('signature_scheme', sa.String(length=32), server_default='sha256-hex', nullable=False, comment="Signature scheme (e.g., 'sha256-hex', 'timestamped-sha256')"))
+
+
+def downgrade() -> None:
+    op.drop_column('providers', 'signature_scheme')
+    op.drop_column('providers', 'additional_secret_keys')
@@ -0,0 +1,29 @@
+"""Add provider rate limit policy
+
+Revision ID: 3f6b0d2e9c41
+Revises: a4e8f2c61d07
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f6b0d2e9c41'
+down_revision = 'a4e8f2c61d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('providers', sa.Column('rate_limit_algorithm', sa.String(length=32), nullable=True, comment='Rate limit algorithm: fixed_window, sliding_window or gcra (NULL = global default)'))
+    op.add_column('providers', sa.Column('rate_limit_requests', sa.Integer(), nullable=True, comment='Requests allowed per rate limit period (NULL = global default)'))
+    op.add_column('providers', sa.Column('rate_limit_period_seconds', sa.Integer(), nullable=True, comment='Rate limit period in seconds (NULL = global default)'))
+    op.add_column('providers', sa.Column('rate_limit_burst', sa.Integer(), nullable=True, comment='Requests GCRA allows back to back (NULL = rate_limit_requests)'))
+
+
+def downgrade() -> None:
+    op.drop_column('providers', 'rate_limit_burst')
+    op.drop_column('providers', 'rate_limit_period_seconds')
+    op.drop_column('providers', 'rate_limit_requests')
+    op.drop_column('providers', 'rate_limit_algorithm')
@@ -0,0 +1,32 @@
+"""Cover webhook stats columns in the provider/received_at index
+
+Revision ID: 8d2a5c7e1b90
+Revises: 3f6b0d2e9c41
+Create Date: 2026-10-17 10:30:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8d2a5c7e1b90'
+down_revision = '3f6b0d2e9c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same key columns, plus the columns the stats aggregates read, so
+    # /admin/webhooks/stats and /admin/providers/{name}/stats never touch the heap
+    op.drop_index('ix_webhook_events_provider_received', table_name='webhook_events')
+    op.create_index(
+        'ix_webhook_events_provider_received',
+        'webhook_events',
+        ['provider_id', 'received_at'],
+        unique=False,
+        postgresql_include=['forwarded', 'response_status', 'forwarded_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_webhook_events_provider_received', table_name='webhook_events')
+    op.create_index('ix_webhook_events_provider_received', 'webhook_events', ['provider_id', 'received_at'], unique=False)
@@ -0,0 +1,33 @@
+"""Add per-minute metric rollups
+
+Revision ID: 5e9c3a71f2d8
+Revises: 8d2a5c7e1b90
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5e9c3a71f2d8'
+down_revision = '8d2a5c7e1b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('metric_rollups',
+    sa.Column('bucket', sa.DateTime(), nullable=False, comment='Start of the one-minute bucket (UTC)'),
+    sa.Column('provider_name', sa.String(length=100), nullable=False, comment='Provider name'),
+    sa.Column('outcome', sa.String(length=50), nullable=False, comment='received, forwarded_ok, forwarded_failed or a security event type'),
+    sa.Column('count', sa.BigInteger(), nullable=False, comment='Number of events in this bucket'),
+    sa.Column('latency_sum', sa.Float(), nullable=False, comment='Sum of latencies in seconds (forwarding outcomes)'),
+    sa.PrimaryKeyConstraint('bucket', 'provider_name', 'outcome')
+    )
+    op.create_index('ix_metric_rollups_provider_bucket', 'metric_rollups', ['provider_name', 'bucket'], unique=False)
+    # Populate from existing data with: python -m app.core.rollups backfill
+
+
+def downgrade() -> None:
+    op.drop_index('ix_metric_rollups_provider_bucket', table_name='metric_rollups')
+    op.drop_table('metric_rollups')
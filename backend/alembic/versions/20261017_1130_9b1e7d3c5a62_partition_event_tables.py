@@ -0,0 +1,157 @@
+"""Partition webhook_events and security_logs by day
+
+Revision ID: 9b1e7d3c5a62
+Revises: 5e9c3a71f2d8
+Create Date: 2026-10-17 11:30:00.000000
+
+Both tables are rebuilt as RANGE-partitioned tables (received_at /
+created_at) with one partition per day of existing data, a week of
+future partitions and a DEFAULT partition. Existing rows are copied
+over, so the upgrade takes time and locks proportional to the table
+sizes; run it in a maintenance window.
+
+Unique constraints on a partitioned table must include the partition
+key, so:
+- the primary keys become (id, received_at) / (id, created_at)
+- webhook_events.request_id keeps its index but is no longer unique
+  (replay protection is enforced in Redis before the row is written;
+  d2f7a9c4e013 makes it unique within each partition)
+
+app.core.partitions takes over creating and dropping partitions.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '9b1e7d3c5a62'
+down_revision = '5e9c3a71f2d8'
+branch_labels = None
+depends_on = None
+
+# Future days created up front (the maintenance task keeps this topped up)
+PRECREATE_DAYS = 7
+
+
+def _webhook_event_columns():
+    return [
+        sa.Column('id', sa.UUID(), nullable=False, comment='Unique event identifier'),
+        sa.Column('provider_id', sa.UUID(), nullable=False, comment='Which provider sent this webhook'),
+        sa.Column('request_id', sa.String(length=255), nullable=False, comment='Unique request ID for idempotency'),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='Webhook payload (JSON)'),
+        sa.Column('headers', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='Request headers (JSON)'),
+        sa.Column('signature_valid', sa.Boolean(), nullable=False, comment='Whether HMAC signature was valid'),
+        sa.Column('forwarded', sa.Boolean(), nullable=False, comment='Whether webhook was forwarded to internal service'),
+        sa.Column('response_status', sa.Integer(), nullable=True, comment='HTTP status code from forwarding attempt'),
+        sa.Column('response_body', sa.Text(), nullable=True, comment='HTTP response body from forwarding attempt'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='Error message if processing failed'),
+        sa.Column('received_at', sa.DateTime(), nullable=False, comment='When webhook was received'),
+        sa.Column('forwarded_at', sa.DateTime(), nullable=True, comment='When webhook was forwarded'),
+    ]
+
+
+def _security_log_columns():
+    return [
+        sa.Column('id', sa.UUID(), nullable=False, comment='Unique log entry identifier'),
+        sa.Column('provider_name', sa.String(length=100), nullable=False, comment='Provider name from request'),
+        sa.Column('event_type', sa.String(length=50), nullable=False, comment='Type of security event'),
+        sa.Column('ip_address', sa.String(length=45), nullable=False, comment='Source IP address'),
+        sa.Column('request_id', sa.String(length=255), nullable=True, comment='Request ID if available'),
+        sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='Additional event details (JSON)'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, comment='When this event occurred'),
+    ]
+
+
+def _create_daily_partitions(table: str, source: str, column: str) -> None:
+    """One partition per day from the oldest row in source to PRECREATE_DAYS past today, plus DEFAULT."""
+    op.execute(f"""
+        DO $$
+        DECLARE
+            day date;
+            last_day date;
+        BEGIN
+            SELECT COALESCE(min({column})::date, current_date),
+                   GREATEST(COALESCE(max({column})::date, current_date), current_date) + {PRECREATE_DAYS}
+            INTO day, last_day
+            FROM {source};
+            WHILE day <= last_day LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+                day := day + 1;
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _copy_rows(table: str, source: str, columns) -> None:
+    names = ", ".join(column.name for column in columns)
+    op.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM {source}")
+
+
+def _create_webhook_event_indexes(unique_request_id: bool) -> None:
+    op.create_foreign_key(
+        'webhook_events_provider_id_fkey', 'webhook_events', 'providers',
+        ['provider_id'], ['id'], ondelete='RESTRICT'
+    )
+    op.create_index(
+        'ix_webhook_events_provider_received',
+        'webhook_events',
+        ['provider_id', 'received_at'],
+        unique=False,
+        postgresql_include=['forwarded', 'response_status', 'forwarded_at']
+    )
+    op.create_index(op.f('ix_webhook_events_received_at'), 'webhook_events', ['received_at'], unique=False)
+    op.create_index(op.f('ix_webhook_events_request_id'), 'webhook_events', ['request_id'], unique=unique_request_id)
+
+
+def _create_security_log_indexes() -> None:
+    op.create_index(op.f('ix_security_logs_created_at'), 'security_logs', ['created_at'], unique=False)
+    op.create_index(op.f('ix_security_logs_event_type'), 'security_logs', ['event_type'], unique=False)
+    op.create_index(op.f('ix_security_logs_ip_address'), 'security_logs', ['ip_address'], unique=False)
+    op.create_index('ix_security_logs_ip_created', 'security_logs', ['ip_address', 'created_at'], unique=False)
+    op.create_index(op.f('ix_security_logs_provider_name'), 'security_logs', ['provider_name'], unique=False)
+    op.create_index('ix_security_logs_provider_type_created', 'security_logs', ['provider_name', 'event_type', 'created_at'], unique=False)
+
+
+def upgrade() -> None:
+    # The old tables are renamed and dropped only after their rows are
+    # copied; keys and indexes are built once, after the bulk copy
+    op.rename_table('webhook_events', 'webhook_events_unpartitioned')
+    columns = _webhook_event_columns()
+    op.create_table('webhook_events', *columns, postgresql_partition_by='RANGE (received_at)')
+    _create_daily_partitions('webhook_events', 'webhook_events_unpartitioned', 'received_at')
+    _copy_rows('webhook_events', 'webhook_events_unpartitioned', columns)
+    op.drop_table('webhook_events_unpartitioned')
+    op.create_primary_key('webhook_events_pkey', 'webhook_events', ['id', 'received_at'])
+    _create_webhook_event_indexes(unique_request_id=False)
+
+    op.rename_table('security_logs', 'security_logs_unpartitioned')
+    columns = _security_log_columns()
+    op.create_table('security_logs', *columns, postgresql_partition_by='RANGE (created_at)')
+    _create_daily_partitions('security_logs', 'security_logs_unpartitioned', 'created_at')
+    _copy_rows('security_logs', 'security_logs_unpartitioned', columns)
+    op.drop_table('security_logs_unpartitioned')
+    op.create_primary_key('security_logs_pkey', 'security_logs', ['id', 'created_at'])
+    _create_security_log_indexes()
+
+
+def downgrade() -> None:
+    # Fails if request_id values were duplicated while the constraint was off
+    op.rename_table('webhook_events', 'webhook_events_partitioned')
+    columns = _webhook_event_columns()
+    op.create_table('webhook_events', *columns)
+    _copy_rows('webhook_events', 'webhook_events_partitioned', columns)
+    op.drop_table('webhook_events_partitioned')  # Drops its partitions too
+    op.create_primary_key('webhook_events_pkey', 'webhook_events', ['id'])
+    _create_webhook_event_indexes(unique_request_id=True)
+
+    op.rename_table('security_logs', 'security_logs_partitioned')
+    columns = _security_log_columns()
+    op.create_table('security_logs', *columns)
+    _copy_rows('security_logs', 'security_logs_partitioned', columns)
+    op.drop_table('security_logs_partitioned')
+    op.create_primary_key('security_logs_pkey', 'security_logs', ['id'])
+    _create_security_log_indexes()
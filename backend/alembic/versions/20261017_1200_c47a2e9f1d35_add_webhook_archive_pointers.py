@@ -0,0 +1,34 @@
+"""Add archive pointers to webhook_events
+
+Revision ID: c47a2e9f1d35
+Revises: 9b1e7d3c5a62
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c47a2e9f1d35'
+down_revision = '9b1e7d3c5a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('webhook_events', sa.Column('archive_segment', sa.String(length=64), nullable=True, comment='Archive segment holding payload and headers'))
+    op.add_column('webhook_events', sa.Column('archive_offset', sa.BigInteger(), nullable=True, comment='Byte offset of the record in the segment'))
+    op.add_column('webhook_events', sa.Column('archive_length', sa.Integer(), nullable=True, comment='Compressed length of the record'))
+    # Archived rows keep only the pointer
+    op.alter_column('webhook_events', 'payload', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=True)
+    op.alter_column('webhook_events', 'headers', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=True)
+
+
+def downgrade() -> None:
+    # Fails while archived rows exist; their payloads only live in the segment files
+    op.alter_column('webhook_events', 'headers', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=False)
+    op.alter_column('webhook_events', 'payload', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=False)
+    op.drop_column('webhook_events', 'archive_length')
+    op.drop_column('webhook_events', 'archive_offset')
+    op.drop_column('webhook_events', 'archive_segment')
@@ -0,0 +1,47 @@
+"""Add header_sets and per-provider header capture allowlist
+
+Revision ID: e8f3b6a0d914
+Revises: c47a2e9f1d35
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'e8f3b6a0d914'
+down_revision = 'c47a2e9f1d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('header_sets',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False, comment='Header set identifier'),
+    sa.Column('digest', sa.String(length=64), nullable=False, comment='SHA-256 of the canonical header JSON'),
+    sa.Column('headers', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='Header names (lowercase) and values'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='When this header set was first seen'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_header_sets_digest'), 'header_sets', ['digest'], unique=True)
+    # Existing rows keep their full headers inline (header_set_id NULL)
+    op.add_column('webhook_events', sa.Column('header_set_id', sa.BigInteger(), nullable=True, comment='Shared header set (merged with headers when read)'))
+    op.create_foreign_key(
+        'webhook_events_header_set_id_fkey', 'webhook_events', 'header_sets',
+        ['header_set_id'], ['id'], ondelete='RESTRICT'
+    )
+    op.add_column('providers', sa.Column('captured_headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='Header names to store with each webhook (null = global allowlist)'))
+
+
+def downgrade() -> None:
+    op.drop_column('providers', 'captured_headers')
+    # Fold shared headers back into the rows before dropping the reference
+    op.execute(
+        "UPDATE webhook_events SET headers = header_sets.headers || COALESCE(webhook_events.headers, '{}'::jsonb) "
+        "FROM header_sets WHERE webhook_events.header_set_id = header_sets.id"
+    )
+    op.drop_constraint('webhook_events_header_set_id_fkey', 'webhook_events', type_='foreignkey')
+    op.drop_column('webhook_events', 'header_set_id')
+    op.drop_index(op.f('ix_header_sets_digest'), table_name='header_sets')
+    op.drop_table('header_sets')
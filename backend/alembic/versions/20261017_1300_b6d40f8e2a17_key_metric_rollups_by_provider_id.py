@@ -0,0 +1,49 @@
+"""Key metric rollups by provider id
+
+Revision ID: b6d40f8e2a17
+Revises: e8f3b6a0d914
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b6d40f8e2a17'
+down_revision = 'e8f3b6a0d914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('metric_rollups', sa.Column('provider_id', postgresql.UUID(as_uuid=True), nullable=True, comment='Provider the events belong to'))
+    op.execute(
+        "UPDATE metric_rollups SET provider_id = providers.id "
+        "FROM providers WHERE providers.name = metric_rollups.provider_name"
+    )
+    # Buckets recorded for names that never matched a provider
+    op.execute("DELETE FROM metric_rollups WHERE provider_id IS NULL")
+    op.alter_column('metric_rollups', 'provider_id', nullable=False)
+
+    op.drop_index('ix_metric_rollups_provider_bucket', table_name='metric_rollups')
+    op.drop_constraint('metric_rollups_pkey', 'metric_rollups', type_='primary')
+    op.drop_column('metric_rollups', 'provider_name')
+    op.create_primary_key('metric_rollups_pkey', 'metric_rollups', ['bucket', 'provider_id', 'outcome'])
+    op.create_index('ix_metric_rollups_provider_bucket', 'metric_rollups', ['provider_id', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    op.add_column('metric_rollups', sa.Column('provider_name', sa.String(length=100), nullable=True, comment='Provider name'))
+    op.execute(
+        "UPDATE metric_rollups SET provider_name = providers.name "
+        "FROM providers WHERE providers.id = metric_rollups.provider_id"
+    )
+    op.execute("DELETE FROM metric_rollups WHERE provider_name IS NULL")
+    op.alter_column('metric_rollups', 'provider_name', nullable=False)
+
+    op.drop_index('ix_metric_rollups_provider_bucket', table_name='metric_rollups')
+    op.drop_constraint('metric_rollups_pkey', 'metric_rollups', type_='primary')
+    op.drop_column('metric_rollups', 'provider_id')
+    op.create_primary_key('metric_rollups_pkey', 'metric_rollups', ['bucket', 'provider_name', 'outcome'])
+    op.create_index('ix_metric_rollups_provider_bucket', 'metric_rollups', ['provider_name', 'bucket'], unique=False)
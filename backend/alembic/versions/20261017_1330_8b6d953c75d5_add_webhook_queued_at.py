@@ -0,0 +1,36 @@
+"""Add queued_at to webhook_events
+
+Revision ID: 8b6d953c75d5
+Revises: b6d40f8e2a17
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8b6d953c75d5'
+down_revision = 'b6d40f8e2a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'webhook_events',
+        sa.Column(
+            'queued_at', sa.DateTime(), nullable=True,
+            comment='When the last forwarding job was queued'
+        )
+    )
+    # Rows claimed by the pending-forward sweep used to carry the claim in
+    # forwarded_at / error_message
+    op.execute(
+        "UPDATE webhook_events SET queued_at = forwarded_at, forwarded_at = NULL, "
+        "error_message = NULL "
+        "WHERE forwarded = false AND error_message = 'Queued by pending-forward sweep'"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('webhook_events', 'queued_at')
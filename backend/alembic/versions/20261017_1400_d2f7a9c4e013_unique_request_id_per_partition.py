@@ -0,0 +1,60 @@
+"""Make webhook_events.request_id unique within each partition
+
+Revision ID: d2f7a9c4e013
+Revises: 8b6d953c75d5
+Create Date: 2026-10-17 14:00:00.000000
+
+A unique constraint on the partitioned table would have to include
+received_at, which makes it useless for deduplication, so every daily
+partition (and the default one) gets its own unique index on request_id
+instead. app.core.partitions creates it on new partitions and the event
+writer inserts with ON CONFLICT DO NOTHING.
+
+Duplicates stored while only the Redis replay check guarded request_id
+are removed first, keeping the earliest row of each day.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e013'
+down_revision = '8b6d953c75d5'
+branch_labels = None
+depends_on = None
+
+
+def _for_each_partition(statements: str) -> None:
+    """Run plpgsql statements on every webhook_events partition (its name is in `part`)."""
+    op.execute(f"""
+        DO $$
+        DECLARE
+            part text;
+        BEGIN
+            FOR part IN
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'webhook_events'
+            LOOP
+                {statements}
+            END LOOP;
+        END $$;
+    """)
+
+
+def upgrade() -> None:
+    _for_each_partition("""
+        EXECUTE format(
+            'DELETE FROM %1$I a USING %1$I b WHERE a.request_id = b.request_id '
+            'AND (a.received_at, a.id) > (b.received_at, b.id)',
+            part
+        );
+        EXECUTE format(
+            'CREATE UNIQUE INDEX %I ON %I (request_id)', part || '_request_id_key', part
+        );
+    """)
+
+
+def downgrade() -> None:
+    _for_each_partition("""
+        EXECUTE format('DROP INDEX IF EXISTS %I', part || '_request_id_key');
+    """)
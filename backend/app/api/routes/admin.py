@@ -1,24 +1,190 @@
 """
 Admin API routes for provider management.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func, and_, cast, Text
+import json
 import uuid
+import logging
 from typing import List
 
 from app.db.session import get_db
 from app.db.models.provider import Provider
 from app.db.models.webhook_event import WebhookEvent
 from app.db.models.security_log import SecurityLog
-from app.schemas.provider import ProviderCreate, ProviderUpdate, ProviderResponse
+from app.db.models.metric_rollup import MetricRollup
+from app.schemas.provider import (
+    ProviderCreate, ProviderUpdate, ProviderResponse, RATE_LIMIT_ALGORITHM_DEFAULT
+)
 from app.schemas.webhook import WebhookEventResponse
 from app.schemas.security_log import SecurityLogResponse
+from app.core.provider_cache import provider_registry
+from app.core.pagination import apply_keyset, encode_cursor, InvalidCursorError, NEXT_CURSOR_HEADER
+from app.core import export
+from app.core.archive import load_archived, segment_reader, ArchiveReadError
+from app.core.header_sets import load_headers
+from app.core.rollups import (
+    WEBHOOK_OUTCOMES, OUTCOME_RECEIVED, OUTCOME_FORWARDED_OK, OUTCOME_FORWARDED_FAILED
+)
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
+def _paginate(stmt, timestamp_column, id_column, cursor: str, limit: int, offset: int):
+    """Newest first, paged by cursor if one is given, otherwise by offset."""
+    try:
+        stmt = apply_keyset(stmt, timestamp_column, id_column, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    stmt = stmt.limit(limit)
+    return stmt if cursor else stmt.offset(offset)
+
+
+def _load_archived_or_log(webhook: WebhookEvent) -> None:
+    """Read an archived payload back; on failure the response carries payload=None."""
+    try:
+        load_archived(webhook)
+    except ArchiveReadError as e:
+        logger.error(f"Webhook {webhook.id}: {str(e)}")
+
+
+def _export_response(
+    stmt, columns, name: str, export_format: str, compress: bool, prepare_rows=None
+):
+    """Stream stmt as a CSV/NDJSON attachment."""
+    from fastapi.responses import StreamingResponse
+
+    return StreamingResponse(
+        export.stream_export(stmt, columns, export_format, compress, prepare_rows=prepare_rows),
+        media_type=export.media_type(export_format, compress),
+        headers={
+            "Content-Disposition":
+                f"attachment; filename={export.filename(name, export_format, compress)}"
+        }
+    )
+
+
+# JSONB columns are exported as their stored text (no decode/re-encode)
+WEBHOOK_EXPORT_COLUMNS = [
+    export.ExportColumn("id", "ID", WebhookEvent.id),
+    export.ExportColumn("provider_name", "Provider", Provider.name),
+    export.ExportColumn("request_id", "Request ID", WebhookEvent.request_id),
+    export.ExportColumn("signature_valid", "Signature Valid", WebhookEvent.signature_valid),
+    export.ExportColumn("forwarded", "Forwarded", WebhookEvent.forwarded),
+    export.ExportColumn("response_status", "Response Status", WebhookEvent.response_status),
+    export.ExportColumn("error_message", "Error", WebhookEvent.error_message),
+    export.ExportColumn("received_at", "Received At", WebhookEvent.received_at),
+    export.ExportColumn("forwarded_at", "Forwarded At", WebhookEvent.forwarded_at),
+    export.ExportColumn("archived", "Archived", WebhookEvent.archive_segment.is_not(None)),
+    export.ExportColumn("payload", "Payload", cast(WebhookEvent.payload, Text), raw_json=True),
+]
+
+# Selected after WEBHOOK_EXPORT_COLUMNS so archived payloads can be read back
+WEBHOOK_ARCHIVE_POINTER = (
+    WebhookEvent.archive_segment, WebhookEvent.archive_offset, WebhookEvent.archive_length
+)
+
+
+def _load_archived_export_rows(rows):
+    """Fill in archived payloads (as JSON text) and drop the pointer columns."""
+    width = len(WEBHOOK_EXPORT_COLUMNS)
+    payload_index = width - 1  # payload is the last export column
+    prepared = []
+    for row in rows:
+        values = list(row[:width])
+        segment, offset, length = row[width:]
+        if segment is not None:
+            try:
+                record = segment_reader.read(segment, offset, length)
+                values[payload_index] = json.dumps(record["payload"])
+            except ArchiveReadError as e:
+                # Exported with payload null, like the single-webhook endpoint
+                logger.error(f"Webhook {values[0]}: {str(e)}")
+        prepared.append(values)
+    return prepared
+
+
+SECURITY_LOG_EXPORT_COLUMNS = [
+    export.ExportColumn("id", "ID", SecurityLog.id),
+    export.ExportColumn("provider_name", "Provider", SecurityLog.provider_name),
+    export.ExportColumn("event_type", "Event Type", SecurityLog.event_type),
+    export.ExportColumn("ip_address", "Client IP", SecurityLog.ip_address),
+    export.ExportColumn("request_id", "Request ID", SecurityLog.request_id),
+    export.ExportColumn("created_at", "Created At", SecurityLog.created_at),
+    export.ExportColumn("details", "Details", cast(SecurityLog.details, Text), raw_json=True),
+]
+
+EXPORT_FORMAT_PATTERN = f"^({'|'.join(export.EXPORT_FORMATS)})$"
+
+
+async def _rollup_totals(
+    db: AsyncSession, provider_id: uuid.UUID | None = None, date_from=None, date_to=None
+):
+    """
+    Sum metric_rollups per outcome.
+
+    Reads one row per minute, provider and outcome; date_from and date_to
+    select whole one-minute buckets.
+
+    Returns:
+        Dict of outcome -> (count, latency_sum)
+    """
+    stmt = select(
+        MetricRollup.outcome,
+        func.sum(MetricRollup.count),
+        func.sum(MetricRollup.latency_sum)
+    ).group_by(MetricRollup.outcome)
+    if provider_id is not None:
+        stmt = stmt.where(MetricRollup.provider_id == provider_id)
+    if date_from is not None:
+        stmt = stmt.where(MetricRollup.bucket >= date_from.replace(second=0, microsecond=0))
+    if date_to is not None:
+        stmt = stmt.where(MetricRollup.bucket <= date_to)
+
+    result = await db.execute(stmt)
+    return {
+        outcome: (int(count), float(latency_sum))
+        for outcome, count, latency_sum in result.all()
+    }
+
+
+async def _webhook_aggregates(db: AsyncSession, provider_id: uuid.UUID | None = None):
+    """
+    Compute webhook counters in one aggregate query.
+
+    Only the status and timestamp columns are read (never payload or
+    headers); with ix_webhook_events_provider_received covering them this
+    is an index-only scan.
+
+    Returns:
+        Row with total, successful, failed, pending, avg_response_time
+        (seconds, None if nothing was forwarded) and last_webhook_at
+    """
+    forwarded = WebhookEvent.forwarded.is_(True)
+    stmt = select(
+        func.count().label("total"),
+        func.count().filter(
+            and_(forwarded, WebhookEvent.response_status.between(200, 299))
+        ).label("successful"),
+        func.count().filter(and_(forwarded, WebhookEvent.response_status >= 400)).label("failed"),
+        func.count().filter(WebhookEvent.forwarded.is_(False)).label("pending"),
+        # AVG skips rows without forwarded_at
+        func.avg(
+            func.extract("epoch", WebhookEvent.forwarded_at - WebhookEvent.received_at)
+        ).label("avg_response_time"),
+        func.max(WebhookEvent.received_at).label("last_webhook_at"),
+    )
+    if provider_id is not None:
+        stmt = stmt.where(WebhookEvent.provider_id == provider_id)
+
+    result = await db.execute(stmt)
+    return result.one()
+
+
 @router.get("/providers", response_model=List[ProviderResponse])
 async def list_providers(db: AsyncSession = Depends(get_db)):
     """List all webhook providers."""
@@ -48,6 +214,14 @@ async def create_provider(
         name=provider_data.name,
         secret_key=provider_data.secret_key,
         forwarding_url=provider_data.forwarding_url,
+        max_payload_size_bytes=provider_data.max_payload_size_bytes,
+        signature_scheme=provider_data.signature_scheme,
+        additional_secret_keys=provider_data.additional_secret_keys,
+        rate_limit_algorithm=provider_data.rate_limit_algorithm,
+        rate_limit_requests=provider_data.rate_limit_requests,
+        rate_limit_period_seconds=provider_data.rate_limit_period_seconds,
+        rate_limit_burst=provider_data.rate_limit_burst,
+        captured_headers=provider_data.captured_headers,
         is_active=True
     )
     
@@ -55,6 +229,10 @@ async def create_provider(
     await db.commit()
     await db.refresh(provider)
     
+    # A cached "not found" entry may exist for this name
+    from app.main import redis_client
+    await provider_registry.invalidate(redis_client, provider.name)
+
     return provider
 
 
@@ -101,10 +279,35 @@ async def update_provider(
         provider.forwarding_url = provider_data.forwarding_url
     if provider_data.is_active is not None:
         provider.is_active = provider_data.is_active
+    if provider_data.max_payload_size_bytes is not None:
+        provider.max_payload_size_bytes = provider_data.max_payload_size_bytes or None
+    if provider_data.signature_scheme:
+        provider.signature_scheme = provider_data.signature_scheme
+    if provider_data.additional_secret_keys is not None:
+        provider.additional_secret_keys = provider_data.additional_secret_keys
+    # Rate limit policy; every worker picks it up through the invalidation below.
+    # Fields sent as null (or "default" / 0) go back to the global defaults.
+    sent = provider_data.model_fields_set
+    if "rate_limit_algorithm" in sent:
+        algorithm = provider_data.rate_limit_algorithm
+        provider.rate_limit_algorithm = (
+            None if algorithm == RATE_LIMIT_ALGORITHM_DEFAULT else algorithm
+        )
+    if "rate_limit_requests" in sent:
+        provider.rate_limit_requests = provider_data.rate_limit_requests or None
+    if "rate_limit_period_seconds" in sent:
+        provider.rate_limit_period_seconds = provider_data.rate_limit_period_seconds or None
+    if "rate_limit_burst" in sent:
+        provider.rate_limit_burst = provider_data.rate_limit_burst or None
+    if provider_data.captured_headers is not None:
+        provider.captured_headers = provider_data.captured_headers or None
     
     await db.commit()
     await db.refresh(provider)
     
+    from app.main import redis_client
+    await provider_registry.invalidate(redis_client, provider_name)
+
     return provider
 
 
@@ -128,6 +331,8 @@ async def delete_provider(
     await db.execute(stmt)
     await db.commit()
 
+    from app.main import redis_client
+    await provider_registry.invalidate(redis_client, provider_name)
 
 
 @router.get("/providers/{provider_name}/stats")
@@ -147,33 +352,33 @@ async def get_provider_stats(
         )
     
     # Get webhook stats for this provider
-    stmt = select(WebhookEvent).where(WebhookEvent.provider_id == provider.id)
-    result = await db.execute(stmt)
-    webhooks = result.scalars().all()
-    
-    total = len(webhooks)
-    successful = sum(1 for w in webhooks if w.forwarded and w.response_status and 200 <= w.response_status < 300)
-    failed = sum(1 for w in webhooks if w.forwarded and w.response_status and w.response_status >= 400)
-    
-    last_webhook_at = max([w.received_at for w in webhooks], default=None)
+    stats = await _webhook_aggregates(db, provider.id)
     
     return {
-        "total_webhooks": total,
-        "successful_webhooks": successful,
-        "failed_webhooks": failed,
-        "last_webhook_at": last_webhook_at
+        "total_webhooks": stats.total,
+        "successful_webhooks": stats.successful,
+        "failed_webhooks": stats.failed,
+        "last_webhook_at": stats.last_webhook_at
     }
 
 
 # Webhook endpoints
 @router.get("/webhooks", response_model=List[WebhookEventResponse])
 async def list_webhooks(
+    response: Response,
     provider_name: str = Query(None),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str = Query(None, description="X-Next-Cursor from the previous page (replaces offset)"),
     db: AsyncSession = Depends(get_db)
 ):
-    """List webhook events with optional filtering."""
+    """
+    List webhook events with optional filtering.
+
+    Pages with either offset or cursor. With cursor, the page starts right
+    after the given (received_at, id) position, so deep pages cost the same
+    as the first one. The next page's cursor is returned in X-Next-Cursor.
+    """
     stmt = select(WebhookEvent)
     
     if provider_name:
@@ -183,9 +388,17 @@ async def list_webhooks(
         if provider:
             stmt = stmt.where(WebhookEvent.provider_id == provider.id)
     
-    stmt = stmt.order_by(WebhookEvent.received_at.desc()).limit(limit).offset(offset)
+    stmt = _paginate(stmt, WebhookEvent.received_at, WebhookEvent.id, cursor, limit, offset)
     result = await db.execute(stmt)
     webhooks = result.scalars().all()
+    for webhook in webhooks:
+        _load_archived_or_log(webhook)
+    await load_headers(db, webhooks)
+
+    if len(webhooks) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            webhooks[-1].received_at, webhooks[-1].id
+        )
     return [WebhookEventResponse.from_orm(w) for w in webhooks]
 
 
@@ -194,38 +407,77 @@ async def get_webhook_stats(
     provider_name: str = Query(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get webhook statistics."""
-    stmt = select(WebhookEvent)
+    """
+    Get webhook statistics.
+
+    Read from metric_rollups rather than webhook_events. Every webhook
+    counts once: successful or failed by its latest forwarding result,
+    pending while it has none. avg_response_time averages received ->
+    forwarded over every webhook with a result.
+    """
+    provider_id = None
     
     if provider_name:
-        provider_stmt = select(Provider).where(Provider.name == provider_name)
+        provider_stmt = select(Provider.id).where(Provider.name == provider_name)
         provider_result = await db.execute(provider_stmt)
-        provider = provider_result.scalars().first()
-        if provider:
-            stmt = stmt.where(WebhookEvent.provider_id == provider.id)
-    
-    result = await db.execute(stmt)
-    webhooks = result.scalars().all()
-    
-    total = len(webhooks)
-    successful = sum(1 for w in webhooks if w.forwarded and w.response_status and 200 <= w.response_status < 300)
-    failed = sum(1 for w in webhooks if w.forwarded and w.response_status and w.response_status >= 400)
-    pending = sum(1 for w in webhooks if not w.forwarded)
+        provider_id = provider_result.scalars().first()
     
-    avg_response_time = 0
-    if successful > 0:
-        response_times = [w.forwarded_at.timestamp() - w.received_at.timestamp() for w in webhooks if w.forwarded_at and w.received_at]
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+    totals = await _rollup_totals(db, provider_id)
+    total = totals.get(OUTCOME_RECEIVED, (0, 0.0))[0]
+    successful, ok_latency_sum = totals.get(OUTCOME_FORWARDED_OK, (0, 0.0))
+    failed, failed_latency_sum = totals.get(OUTCOME_FORWARDED_FAILED, (0, 0.0))
     
     return {
         "total": total,
         "successful": successful,
         "failed": failed,
-        "pending": pending,
-        "avg_response_time": avg_response_time
+        "pending": max(total - successful - failed, 0),
+        # Reported only once something has been forwarded successfully
+        "avg_response_time": (
+            (ok_latency_sum + failed_latency_sum) / (successful + failed) if successful else 0
+        )
     }
 
 
+@router.get("/webhooks/export")
+async def export_webhooks(
+    provider_name: str = Query(None),
+    date_from: str = Query(None),
+    date_to: str = Query(None),
+    export_format: str = Query(export.EXPORT_CSV, alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = Query(False),
+    limit: int = Query(None, ge=1)
+):
+    """
+    Export webhook events as CSV or NDJSON, newest first.
+
+    Streams from a server-side cursor, so there is no row cap and memory
+    use does not grow with the size of the export. Archived payloads are
+    read back from their segments.
+    """
+    from datetime import datetime
+
+    stmt = export.export_select(WEBHOOK_EXPORT_COLUMNS).add_columns(
+        *WEBHOOK_ARCHIVE_POINTER
+    ).join(
+        Provider, Provider.id == WebhookEvent.provider_id
+    )
+    if provider_name:
+        stmt = stmt.where(Provider.name == provider_name)
+    if date_from:
+        stmt = stmt.where(WebhookEvent.received_at >= datetime.fromisoformat(date_from))
+    if date_to:
+        stmt = stmt.where(WebhookEvent.received_at <= datetime.fromisoformat(date_to))
+
+    stmt = stmt.order_by(WebhookEvent.received_at.desc(), WebhookEvent.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return _export_response(
+        stmt, WEBHOOK_EXPORT_COLUMNS, "webhooks", export_format, gzip,
+        prepare_rows=_load_archived_export_rows
+    )
+
+
 @router.get("/webhooks/{webhook_id}")
 async def get_webhook(
     webhook_id: str,
@@ -250,6 +502,10 @@ async def get_webhook(
             detail=f"Webhook '{webhook_id}' not found"
         )
     
+    # Archived payloads are read back from their segment file, shared
+    # headers from header_sets
+    _load_archived_or_log(webhook)
+    await load_headers(db, [webhook])
     return WebhookEventResponse.from_orm(webhook)
 
 
@@ -258,9 +514,15 @@ async def retry_webhook(
     webhook_id: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """Retry a failed webhook."""
-    from app.core.forwarding import forward_webhook
-    import asyncio
+    """
+    Retry a failed webhook.
+
+    The body is re-encoded from the stored JSONB payload: the same JSON
+    document as the original delivery, but not byte-identical to it.
+    """
+    from app.core.forwarding import forwarding_pool, ForwardJob
+    from app.core.payload import encode_payload
+    from app.core.rollups import rollup_accumulator
     
     stmt = select(WebhookEvent).where(WebhookEvent.id == webhook_id)
     result = await db.execute(stmt)
@@ -272,6 +534,14 @@ async def retry_webhook(
             detail=f"Webhook '{webhook_id}' not found"
         )
     
+    try:
+        load_archived(webhook)
+    except ArchiveReadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Archived payload unavailable: {str(e)}"
+        )
+
     # Get provider to get forwarding URL
     provider_stmt = select(Provider).where(Provider.id == webhook.provider_id)
     provider_result = await db.execute(provider_stmt)
@@ -283,23 +553,49 @@ async def retry_webhook(
             detail="Provider not found"
         )
     
-    # Reset forwarding status and retry
+    if forwarding_pool.is_saturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Forwarding queue is full, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+    # Reset forwarding status and retry. With forwarded_at cleared the row
+    # is pending again, so PendingForwardSweeper picks it up if the job
+    # below is refused or lost.
+    from datetime import datetime
+
+    previous_result = (webhook.forwarded, webhook.received_at, webhook.forwarded_at)
     webhook.forwarded = False
     webhook.response_status = None
     webhook.response_body = None
     webhook.error_message = None
+    webhook.forwarded_at = None
+    webhook.queued_at = datetime.utcnow()
     await db.commit()
     
-    # Retry forwarding with new session
-    asyncio.create_task(
-        forward_webhook(
-            webhook.id,
-            webhook.payload,
-            webhook.request_id,
-            provider.forwarding_url,
-            settings.DATABASE_URL
+    # The rollups count one result per webhook; the new one replaces it
+    forwarded, received_at, forwarded_at = previous_result
+    if forwarded_at is not None:
+        rollup_accumulator.retract_forward_result(
+            provider.id, forwarded, received_at, forwarded_at
+        )
+
+    # Queue retry on the forwarding pool
+    if not forwarding_pool.submit(ForwardJob(
+        webhook_id=webhook.id,
+        body=encode_payload(webhook.payload),
+        request_id=webhook.request_id,
+        forwarding_url=provider.forwarding_url,
+        provider_id=provider.id,
+        provider_name=provider.name,
+        received_at=webhook.received_at
+    )):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Forwarding queue is full, retry later",
+            headers={"Retry-After": "1"}
         )
-    )
     
     return {
         "status": "accepted",
@@ -308,46 +604,142 @@ async def retry_webhook(
     }
 
 
+# Dashboard metrics
+@router.get("/stats/timeseries")
+async def get_stats_timeseries(
+    provider_name: str = Query(None),
+    outcome: str = Query(None),
+    date_from: str = Query(None),
+    date_to: str = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Per-minute counts from the metric_rollups table.
+
+    Outcomes: received, forwarded_ok, forwarded_failed and each security
+    event type. Defaults to the last hour. Reads one row per bucket,
+    provider and outcome rather than the raw events.
+    """
+    from datetime import datetime, timedelta
+
+    date_to_dt = datetime.fromisoformat(date_to) if date_to else datetime.utcnow()
+    date_from_dt = (
+        datetime.fromisoformat(date_from) if date_from else date_to_dt - timedelta(hours=1)
+    )
+
+    stmt = select(MetricRollup, Provider.name).join(
+        Provider, Provider.id == MetricRollup.provider_id
+    ).where(
+        MetricRollup.bucket >= date_from_dt,
+        MetricRollup.bucket <= date_to_dt
+    )
+    if provider_name:
+        stmt = stmt.where(Provider.name == provider_name)
+    if outcome:
+        stmt = stmt.where(MetricRollup.outcome == outcome)
+
+    stmt = stmt.order_by(MetricRollup.bucket, Provider.name, MetricRollup.outcome)
+    result = await db.execute(stmt)
+
+    return [
+        {
+            "bucket": row.bucket,
+            "provider_name": name,
+            "outcome": row.outcome,
+            "count": row.count,
+            "avg_latency": row.latency_sum / row.count if row.count else 0
+        }
+        for row, name in result.all()
+    ]
+
+
 # Security log endpoints
 @router.get("/logs/stats")
-async def get_security_stats(db: AsyncSession = Depends(get_db)):
-    """Get security statistics."""
-    stmt = select(SecurityLog)
-    result = await db.execute(stmt)
-    logs = result.scalars().all()
-    
-    total_events = len(logs)
-    invalid_signatures = sum(1 for l in logs if l.event_type == "invalid_signature")
-    rate_limit_events = sum(1 for l in logs if l.event_type == "rate_limit_exceeded")
-    replay_attempts = sum(1 for l in logs if l.event_type == "replay_attempt")
-    timestamp_errors = sum(1 for l in logs if l.event_type in ["timestamp_too_old", "timestamp_in_future"])
+async def get_security_stats(
+    provider_name: str = Query(None),
+    date_from: str = Query(None),
+    date_to: str = Query(None),
+    top_n: int = Query(10, ge=0, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get security statistics.
+    
+    Counts per event type are summed from metric_rollups (whole minutes,
+    events of existing providers only). Source IPs are not rolled up, so
+    the top_n IPs come from one GROUP BY over security_logs with the same
+    filters, all time by default like the counts; with provider_name the
+    scan can use ix_security_logs_provider_type_created. Pass top_n=0 to
+    skip it.
+    """
+    from datetime import datetime
+
+    date_from_dt = datetime.fromisoformat(date_from) if date_from else None
+    date_to_dt = datetime.fromisoformat(date_to) if date_to else None
+
+    provider_id = None
+    if provider_name:
+        provider_result = await db.execute(
+            select(Provider.id).where(Provider.name == provider_name)
+        )
+        provider_id = provider_result.scalars().first()
     
-    # Count events by type
     events_by_type = {}
-    for log in logs:
-        events_by_type[log.event_type] = events_by_type.get(log.event_type, 0) + 1
+    if not provider_name or provider_id is not None:
+        totals = await _rollup_totals(db, provider_id, date_from_dt, date_to_dt)
+        events_by_type = {
+            outcome: count for outcome, (count, _) in totals.items()
+            if outcome not in WEBHOOK_OUTCOMES
+        }
+
+    top_ip_counts = []
+    if top_n:
+        stmt = select(SecurityLog.ip_address, func.count())
+        if provider_name:
+            stmt = stmt.where(SecurityLog.provider_name == provider_name)
+        if date_from_dt:
+            stmt = stmt.where(SecurityLog.created_at >= date_from_dt)
+        if date_to_dt:
+            stmt = stmt.where(SecurityLog.created_at <= date_to_dt)
+        stmt = stmt.group_by(SecurityLog.ip_address).order_by(
+            func.count().desc(), SecurityLog.ip_address
+        ).limit(top_n)
+        result = await db.execute(stmt)
+        top_ip_counts = [
+            {"ip_address": ip_address, "count": count} for ip_address, count in result.all()
+        ]
     
     return {
-        "total_events": total_events,
-        "invalid_signatures": invalid_signatures,
-        "rate_limit_events": rate_limit_events,
-        "replay_attempts": replay_attempts,
-        "timestamp_errors": timestamp_errors,
-        "events_by_type": events_by_type
+        "total_events": sum(events_by_type.values()),
+        "invalid_signatures": events_by_type.get("invalid_signature", 0),
+        "rate_limit_events": events_by_type.get("rate_limit_exceeded", 0),
+        "replay_attempts": events_by_type.get("replay_attempt", 0),
+        "timestamp_errors": (
+            events_by_type.get("timestamp_too_old", 0)
+            + events_by_type.get("timestamp_in_future", 0)
+        ),
+        "events_by_type": events_by_type,
+        "top_ips": top_ip_counts
     }
 
 
 @router.get("/logs", response_model=List[SecurityLogResponse])
 async def list_security_logs(
+    response: Response,
     event_type: str = Query(None),
     provider_name: str = Query(None),
     date_from: str = Query(None),
     date_to: str = Query(None),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str = Query(None, description="X-Next-Cursor from the previous page (replaces offset)"),
     db: AsyncSession = Depends(get_db)
 ):
-    """List security logs with filtering."""
+    """
+    List security logs with filtering.
+
+    Supports offset or cursor paging on (created_at, id), like /webhooks.
+    """
     stmt = select(SecurityLog)
     
     if event_type:
@@ -363,28 +755,13 @@ async def list_security_logs(
         date_to_dt = datetime.fromisoformat(date_to)
         stmt = stmt.where(SecurityLog.created_at <= date_to_dt)
     
-    stmt = stmt.order_by(SecurityLog.created_at.desc()).limit(limit).offset(offset)
+    stmt = _paginate(stmt, SecurityLog.created_at, SecurityLog.id, cursor, limit, offset)
     result = await db.execute(stmt)
-    return result.scalars().all()
+    logs = result.scalars().all()
 
-
-@router.get("/logs/{log_id}", response_model=SecurityLogResponse)
-async def get_security_log(
-    log_id: str,
-    db: AsyncSession = Depends(get_db)
-):
-    """Get security log details."""
-    stmt = select(SecurityLog).where(SecurityLog.id == log_id)
-    result = await db.execute(stmt)
-    log = result.scalars().first()
-    
-    if not log:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Security log '{log_id}' not found"
-        )
-    
-    return log
+    if len(logs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].created_at, logs[-1].id)
+    return logs
 
 
 @router.get("/logs/export")
@@ -393,51 +770,47 @@ async def export_security_logs(
     provider_name: str = Query(None),
     date_from: str = Query(None),
     date_to: str = Query(None),
-    limit: int = Query(1000, ge=1, le=10000),
-    db: AsyncSession = Depends(get_db)
+    export_format: str = Query(export.EXPORT_CSV, alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = Query(False),
+    limit: int = Query(None, ge=1)
 ):
-    """Export security logs as CSV with pagination."""
-    from fastapi.responses import StreamingResponse
-    import csv
-    import io
+    """
+    Export security logs as CSV or NDJSON, newest first.
     
-    stmt = select(SecurityLog)
+    Streams from a server-side cursor like /webhooks/export; no row cap.
+    """
+    from datetime import datetime
     
+    stmt = export.export_select(SECURITY_LOG_EXPORT_COLUMNS)
     if event_type:
         stmt = stmt.where(SecurityLog.event_type == event_type)
     if provider_name:
         stmt = stmt.where(SecurityLog.provider_name == provider_name)
     if date_from:
-        from datetime import datetime
-        date_from_dt = datetime.fromisoformat(date_from)
-        stmt = stmt.where(SecurityLog.created_at >= date_from_dt)
+        stmt = stmt.where(SecurityLog.created_at >= datetime.fromisoformat(date_from))
     if date_to:
-        from datetime import datetime
-        date_to_dt = datetime.fromisoformat(date_to)
-        stmt = stmt.where(SecurityLog.created_at <= date_to_dt)
+        stmt = stmt.where(SecurityLog.created_at <= datetime.fromisoformat(date_to))
     
-    stmt = stmt.order_by(SecurityLog.created_at.desc()).limit(limit)
+    stmt = stmt.order_by(SecurityLog.created_at.desc(), SecurityLog.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return _export_response(stmt, SECURITY_LOG_EXPORT_COLUMNS, "security_logs", export_format, gzip)
+
+
+@router.get("/logs/{log_id}", response_model=SecurityLogResponse)
+async def get_security_log(
+    log_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get security log details."""
+    stmt = select(SecurityLog).where(SecurityLog.id == log_id)
     result = await db.execute(stmt)
-    logs = result.scalars().all()
+    log = result.scalars().first()
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Provider", "Event Type", "Client IP", "Request ID", "Created At"])
-    
-    for log in logs:
-        writer.writerow([
-            str(log.id),
-            log.provider_name,
-            log.event_type,
-            log.ip_address,
-            log.request_id or "",
-            log.created_at.isoformat()
-        ])
-    
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=security_logs.csv"}
-    )
+    if not log:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Security log '{log_id}' not found"
+        )
+
+    return log
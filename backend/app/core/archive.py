@@ -0,0 +1,367 @@
+"""
+Cold-tier archive for old webhook payloads.
+
+Payload and headers JSONB make up most of webhook_events. Once an event
+is older than ARCHIVE_AFTER_DAYS, the archiver moves both into
+append-only segment files under ARCHIVE_DIR and leaves a pointer in the
+row. Each pointer is (archive_segment, archive_offset, archive_length),
+and the payload and headers columns are set to NULL. The hot table then
+stops growing with history.
+
+Segment layout:
+- segment-NNNNNN.seg: zlib-compressed records back to back. Each record
+  is one event's {"payload": ..., "headers": ...} JSON, so any record
+  can be decompressed on its own from (offset, length).
+- segment-NNNNNN.idx: the offset index, fixed-size
+  (webhook id, offset, length) entries in write order. It lets a
+  segment be audited or re-linked without the database.
+
+Readers memory-map segments (segment_reader), so fetching an archived
+event is a slice of the page cache and not a file read per request.
+Segments live on local disk; with several API hosts, ARCHIVE_DIR must
+be a shared volume.
+
+Archiving can also be run by hand:
+
+    python -m app.core.archive run
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import OrderedDict
+from typing import cast
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import Table, select, update, bindparam, null, Text
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.models.webhook_event import WebhookEvent
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+_SEGMENT_NAME = re.compile(r"^segment-\d{6}$")
+
+# Index entry: webhook id (16 bytes), offset (u64), compressed length (u32)
+_INDEX_ENTRY = struct.Struct("<16sQI")
+
+
+class ArchiveReadError(Exception):
+    """Raised when an archived record cannot be read back."""
+
+
+def _segment_name(sequence: int) -> str:
+    return f"segment-{sequence:06d}"
+
+
+class SegmentWriter:
+    """
+    Appends compressed records to the newest segment, rolling over to a
+    new one once it reaches ARCHIVE_SEGMENT_MAX_BYTES.
+
+    Blocking file I/O: call from a thread. Records are fsynced (data, then
+    index) before append() returns, so pointers written to the database
+    afterwards always refer to durable bytes. A crash before the database
+    commit only leaves unreferenced bytes behind; the rows keep their
+    payload and are archived again on the next run.
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None):
+        self.directory = directory or settings.ARCHIVE_DIR
+        self.max_bytes = max_bytes or settings.ARCHIVE_SEGMENT_MAX_BYTES
+
+    def _current_segment(self) -> str:
+        sequences = [
+            int(name[len("segment-"):-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and _SEGMENT_NAME.match(name[:-len(SEGMENT_SUFFIX)])
+        ]
+        if not sequences:
+            return _segment_name(1)
+        name = _segment_name(max(sequences))
+        if os.path.getsize(os.path.join(self.directory, name + SEGMENT_SUFFIX)) >= self.max_bytes:
+            return _segment_name(max(sequences) + 1)
+        return name
+
+    def append(self, records: list[tuple[UUID, bytes]]) -> list[tuple[str, int, int]]:
+        """
+        Compress and append records.
+
+        Args:
+            records: (webhook id, uncompressed record bytes) pairs
+
+        Returns:
+            (segment, offset, length) for each record, in order
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        segment = self._current_segment()
+        path = os.path.join(self.directory, segment)
+
+        pointers = []
+        index = bytearray()
+        with open(path + SEGMENT_SUFFIX, "ab") as data_file:
+            offset = data_file.tell()
+            for webhook_id, record in records:
+                compressed = zlib.compress(record, settings.ARCHIVE_COMPRESSION_LEVEL)
+                data_file.write(compressed)
+                pointers.append((segment, offset, len(compressed)))
+                index += _INDEX_ENTRY.pack(webhook_id.bytes, offset, len(compressed))
+                offset += len(compressed)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+        with open(path + INDEX_SUFFIX, "ab") as index_file:
+            index_file.write(index)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+        return pointers
+
+
+class SegmentReader:
+    """
+    Memory-mapped random access to archived records.
+
+    Keeps up to max_open segments mapped (least recently used is unmapped
+    first). The newest segment can still grow; a read past the end of its
+    mapping remaps it.
+    """
+
+    def __init__(self, directory: str | None = None, max_open: int = 16):
+        self.directory = directory or settings.ARCHIVE_DIR
+        self.max_open = max_open
+        self._maps: OrderedDict[str, mmap.mmap] = OrderedDict()
+
+    def _map(self, segment: str) -> mmap.mmap:
+        if not _SEGMENT_NAME.match(segment):
+            raise ArchiveReadError(f"Invalid segment name: {segment}")
+        with open(os.path.join(self.directory, segment + SEGMENT_SUFFIX), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        old = self._maps.pop(segment, None)
+        if old is not None:
+            old.close()
+        self._maps[segment] = mapped
+        while len(self._maps) > self.max_open:
+            _, evicted = self._maps.popitem(last=False)
+            evicted.close()
+        return mapped
+
+    def read(self, segment: str, offset: int, length: int) -> dict:
+        """
+        Read one record.
+
+        Returns:
+            {"payload": ..., "headers": ...}
+
+        Raises:
+            ArchiveReadError: If the segment is missing or the record is corrupt
+        """
+        try:
+            mapped = self._maps.get(segment)
+            if mapped is None or offset + length > len(mapped):
+                mapped = self._map(segment)
+            else:
+                self._maps.move_to_end(segment)
+            if offset + length > len(mapped):
+                raise ArchiveReadError(
+                    f"Record at {segment}:{offset} is past the end of the segment"
+                )
+            record: dict = json.loads(zlib.decompress(mapped[offset:offset + length]))
+            return record
+        except ArchiveReadError:
+            raise
+        except (OSError, ValueError, zlib.error) as e:
+            raise ArchiveReadError(
+                f"Cannot read archived record {segment}:{offset}: {str(e)}"
+            ) from e
+
+    def close(self) -> None:
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+# Global reader shared by all routes in this worker
+segment_reader = SegmentReader()
+
+
+def load_archived(event: WebhookEvent) -> None:
+    """
+    Fill in payload and headers of an archived event from its segment.
+
+    The values are set as already-committed state, so the session never
+    writes them back to the row.
+
+    Raises:
+        ArchiveReadError: If the record cannot be read
+    """
+    segment, offset, length = event.archive_segment, event.archive_offset, event.archive_length
+    if segment is None or offset is None or length is None:
+        return
+    record = segment_reader.read(segment, offset, length)
+    set_committed_value(event, "payload", record["payload"])
+    set_committed_value(event, "headers", record["headers"])
+
+
+async def archive_batch(
+    writer: SegmentWriter, older_than: datetime, batch_size: int | None = None
+) -> int:
+    """
+    Archive up to batch_size events received before older_than, oldest first.
+
+    Returns:
+        Number of events archived
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    # JSONB as text, so records are built without decoding the payloads
+    stmt = select(
+        WebhookEvent.id,
+        WebhookEvent.received_at,
+        WebhookEvent.payload.cast(Text),
+        WebhookEvent.headers.cast(Text)
+    ).where(
+        WebhookEvent.received_at < older_than,
+        WebhookEvent.archive_segment.is_(None),
+        WebhookEvent.payload.is_not(None)
+    ).order_by(WebhookEvent.received_at).limit(batch_size)
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).all()
+    if not rows:
+        return 0
+
+    records = [
+        (webhook_id, f'{{"payload":{payload},"headers":{headers}}}'.encode("utf-8"))
+        for webhook_id, _, payload, headers in rows
+    ]
+    pointers = await asyncio.to_thread(writer.append, records)
+
+    # received_at in the WHERE clause keeps each UPDATE to one partition
+    table = cast(Table, WebhookEvent.__table__)
+    archive_stmt = update(table).where(
+        table.c.id == bindparam("b_id"),
+        table.c.received_at == bindparam("b_received_at")
+    ).values(
+        payload=null(),  # SQL NULL, not JSON null
+        headers=null(),
+        archive_segment=bindparam("b_segment"),
+        archive_offset=bindparam("b_offset"),
+        archive_length=bindparam("b_length")
+    )
+    async with engine.begin() as conn:
+        await conn.execute(archive_stmt, [
+            {
+                "b_id": webhook_id,
+                "b_received_at": received_at,
+                "b_segment": segment,
+                "b_offset": offset,
+                "b_length": length,
+            }
+            for (webhook_id, received_at, _, _), (segment, offset, length) in zip(rows, pointers)
+        ])
+    return len(rows)
+
+
+async def archive_old_payloads(now: datetime | None = None) -> int:
+    """
+    Archive every event older than ARCHIVE_AFTER_DAYS.
+
+    Holds an exclusive lock on ARCHIVE_DIR/.lock, so only one process per
+    archive directory appends to the segments; others skip the run.
+
+    Returns:
+        Number of events archived
+    """
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    older_than = (now or datetime.utcnow()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    writer = SegmentWriter()
+    os.makedirs(writer.directory, exist_ok=True)
+
+    with open(os.path.join(writer.directory, ".lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        total = 0
+        while True:
+            archived = await archive_batch(writer, older_than)
+            total += archived
+            if archived < settings.ARCHIVE_BATCH_SIZE:
+                break
+
+    if total:
+        logger.info(f"Archived {total} webhook payloads")
+    return total
+
+
+class Archiver:
+    """Runs archive_old_payloads every ARCHIVE_INTERVAL_SECONDS."""
+
+    def __init__(self, interval_seconds: float | None = None):
+        self.interval = (
+            interval_seconds if interval_seconds is not None
+            else settings.ARCHIVE_INTERVAL_SECONDS
+        )
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if settings.ARCHIVE_AFTER_DAYS <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await archive_old_payloads()
+            except Exception as e:
+                logger.error(f"Payload archiving failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+# Global archiver for this worker
+archiver = Archiver()
+
+
+def main() -> None:
+    from app.core.config import setup_logging
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="Archive payloads older than ARCHIVE_AFTER_DAYS")
+    parser.parse_args()
+
+    setup_logging()
+
+    async def run() -> None:
+        try:
+            await archive_old_payloads()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
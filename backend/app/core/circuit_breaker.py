@@ -0,0 +1,142 @@
+"""
+Circuit breaker for Redis calls on the webhook path.
+
+A slow Redis is worse than a dead one: every admission check waits for
+its timeout. Calls made through the breaker get a tight timeout, and after
+REDIS_BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens and
+further calls fail immediately. Callers then fall back to in-process
+admission (see rate_limit.check_admission). After
+REDIS_BREAKER_RESET_SECONDS a single probe call is let through
+(half-open); if it succeeds the breaker closes again.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import CIRCUIT_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Redis while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for awaitables.
+
+    Counters:
+        failures: calls that raised or timed out
+        rejected: calls refused because the breaker was open
+        opened: times the breaker tripped
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int | None = None,
+        reset_seconds: float | None = None,
+        call_timeout_ms: int | None = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.REDIS_BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = (
+            reset_seconds if reset_seconds is not None else settings.REDIS_BREAKER_RESET_SECONDS
+        )
+        self.call_timeout = (call_timeout_ms or settings.REDIS_CALL_TIMEOUT_MS) / 1000
+        self._state = BREAKER_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            return BREAKER_HALF_OPEN
+        return self._state
+
+    async def call(self, awaitable: Awaitable[T]) -> T:
+        """
+        Await a Redis call through the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker is open (the awaitable is discarded)
+            asyncio.TimeoutError: If the call took longer than the call timeout
+            Exception: Whatever the call itself raised
+        """
+        state = self.state
+        if state == BREAKER_OPEN or (state == BREAKER_HALF_OPEN and self._probe_in_flight):
+            self.rejected += 1
+            if hasattr(awaitable, "close"):
+                awaitable.close()
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        probing = state == BREAKER_HALF_OPEN
+        if probing:
+            self._probe_in_flight = True
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(awaitable, self.call_timeout)
+        except asyncio.TimeoutError:
+            CIRCUIT_CALL_SECONDS.observe(time.perf_counter() - started, self.name, "timeout")
+            self._record_failure(probing)
+            raise
+        except Exception:
+            CIRCUIT_CALL_SECONDS.observe(time.perf_counter() - started, self.name, "error")
+            self._record_failure(probing)
+            raise
+        finally:
+            if probing:
+                self._probe_in_flight = False
+
+        CIRCUIT_CALL_SECONDS.observe(time.perf_counter() - started, self.name, "ok")
+        self._record_success()
+        return result
+
+    def _record_success(self) -> None:
+        if self._state != BREAKER_CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self._state = BREAKER_CLOSED
+        self._consecutive_failures = 0
+
+    def _record_failure(self, probing: bool) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        tripped = (
+            self._state == BREAKER_CLOSED
+            and self._consecutive_failures >= self.failure_threshold
+        )
+        if probing or tripped:
+            if self._state == BREAKER_CLOSED:
+                self.opened += 1
+                logger.warning(
+                    f"{self.name} circuit opened after "
+                    f"{self._consecutive_failures} consecutive failures"
+                )
+            self._state = BREAKER_OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+# Breaker shared by every Redis call on the webhook path in this worker
+redis_breaker = CircuitBreaker("redis")
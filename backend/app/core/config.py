@@ -4,7 +4,7 @@ Application configuration using Pydantic Settings.
 Loads configuration from environment variables with type validation.
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Dict
 import logging
 from functools import lru_cache
 
@@ -27,6 +27,11 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    # Circuit breaker for Redis calls on the webhook path
+    REDIS_CALL_TIMEOUT_MS: int = 250
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 5
+    REDIS_BREAKER_RESET_SECONDS: int = 5
     
     # JWT Authentication
     JWT_SECRET_KEY: str
@@ -36,16 +41,110 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_MAX_REQUESTS: int = 100
     RATE_LIMIT_WINDOW_SECONDS: int = 60
+    # Default algorithm for providers without their own policy: fixed_window, sliding_window or gcra
+    RATE_LIMIT_ALGORITHM: str = "fixed_window"
+    # Lease mode: workers reserve blocks of tokens from Redis and spend them locally
+    RATE_LIMIT_LEASE_ENABLED: bool = False
+    RATE_LIMIT_LEASE_SIZE: int = 50
+    # Lease size cap as a fraction of the limit (max under-admission per worker)
+    RATE_LIMIT_LEASE_MAX_ERROR: float = 0.05
+    # Share of each provider's limit one worker enforces while Redis is unavailable
+    RATE_LIMIT_DEGRADED_SHARE: float = 1.0
     
+    # Provider cache
+    PROVIDER_CACHE_TTL_SECONDS: int = 60
+
     # Replay Protection
     REPLAY_PROTECTION_WINDOW_SECONDS: int = 300  # 5 minutes
+    # Per-worker front cache of recently admitted request IDs (Redis stays authoritative)
+    REPLAY_CACHE_MAX_ENTRIES: int = 10_000
+    REPLAY_BLOOM_ENABLED: bool = False
+    REPLAY_BLOOM_CAPACITY: int = 100_000  # Expected request IDs per replay window
+    REPLAY_BLOOM_ERROR_RATE: float = 0.01
     
+    # Webhook event writer (group commit)
+    WEBHOOK_WRITER_BATCH_SIZE: int = 200
+    WEBHOOK_WRITER_BATCH_WINDOW_MS: int = 5
+
+    # Security event logging
+    SECURITY_LOG_QUEUE_MAX_SIZE: int = 10_000
+    SECURITY_LOG_BATCH_SIZE: int = 500
+    SECURITY_LOG_FLUSH_INTERVAL_MS: int = 100
+
+    # Per-minute metric rollups
+    ROLLUP_FLUSH_INTERVAL_SECONDS: int = 10
+    # Rows kept in memory while the database is unavailable; counts beyond are dropped
+    ROLLUP_MAX_PENDING_ROWS: int = 100_000
+
+    # Daily partitions of webhook_events / security_logs
+    # Retention in days; older partitions are dropped whole (0 = keep forever)
+    WEBHOOK_EVENTS_RETENTION_DAYS: int = 0
+    SECURITY_LOGS_RETENTION_DAYS: int = 0
+    PARTITION_PRECREATE_DAYS: int = 7
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+
+    # Header capture
+    # Headers stored with each webhook when the provider has no allowlist (empty = all).
+    # Leave out proxy/tracing headers (cf-ray, x-amzn-trace-id, ...): each value is a new header set
+    HEADER_CAPTURE_ALLOWLIST: List[str] = [
+        "content-type", "content-length", "user-agent",
+        "x-signature", "x-timestamp", "x-request-id", "x-forwarded-for", "x-real-ip",
+    ]
+    # Headers that differ on every delivery; kept inline instead of in a shared header set
+    HEADER_CAPTURE_PER_REQUEST: List[str] = [
+        "x-signature", "x-timestamp", "x-request-id", "content-length",
+        "x-forwarded-for", "x-real-ip", "traceparent", "tracestate",
+    ]
+    HEADER_SET_CACHE_SIZE: int = 1024
+    # New header sets one worker may create per provider per minute (more are kept inline)
+    HEADER_SET_MAX_NEW_PER_MINUTE: int = 10
+
+    # Cold-tier archive of webhook payloads/headers (0 = disabled)
+    ARCHIVE_AFTER_DAYS: int = 0
+    ARCHIVE_DIR: str = "archive"  # Shared volume when running several hosts
+    ARCHIVE_SEGMENT_MAX_BYTES: int = 256 * 1024 * 1024
+    ARCHIVE_COMPRESSION_LEVEL: int = 6
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+
+    # Prometheus /metrics
+    # Directory shared by all workers for metric snapshots (empty = report this worker only)
+    METRICS_DIR: str = ""
+    METRICS_SNAPSHOT_INTERVAL_SECONDS: int = 5
+    METRICS_STALE_SECONDS: int = 60
+
+    # Streaming exports: rows fetched per server-side cursor round trip
+    EXPORT_BATCH_SIZE: int = 1000
+
     # Forwarding
     FORWARDING_TIMEOUT_SECONDS: int = 10
+    FORWARDING_QUEUE_MAX_SIZE: int = 10_000
+    FORWARDING_WORKERS: int = 20
+    FORWARDING_DRAIN_TIMEOUT_SECONDS: int = 30
+    FORWARDING_MAX_CONNECTIONS_PER_HOST: int = 100
+    FORWARDING_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    FORWARDING_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    FORWARDING_HTTP2: bool = False  # Requires the 'h2' package
+    # Per-forwarding-host max connections, e.g. {"http://orders:8000": 200}
+    FORWARDING_HOST_CONNECTION_LIMITS: Dict[str, int] = {}
+    # Re-queue webhooks left pending (queue full, drain timeout, crash)
+    FORWARDING_SWEEP_INTERVAL_SECONDS: int = 60
+    # Rows queued this long ago without an outcome are queued again; must exceed the longest a
+    # job can wait in a worker's queue, or it is delivered twice
+    FORWARDING_SWEEP_MIN_AGE_SECONDS: int = 600
+    FORWARDING_SWEEP_BATCH_SIZE: int = 500
     
     # Security
     MAX_PAYLOAD_SIZE_BYTES: int = 1_000_000  # 1MB
     
+    # Payloads this size or larger are HMAC-verified on a thread pool (0 = never)
+    HMAC_OFFLOAD_THRESHOLD_BYTES: int = 65_536
+    HMAC_OFFLOAD_WORKERS: int = 4
+
+    # Store and forward the original request bytes instead of re-serialized JSON
+    # (first delivery only; retries re-encode the normalised JSONB value)
+    PRESERVE_RAW_PAYLOAD: bool = True
+
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     
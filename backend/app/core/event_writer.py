@@ -0,0 +1,167 @@
+"""
+Group-commit writer for webhook events.
+
+Buffers WebhookEvent rows for a few milliseconds (or until a batch is full)
+and inserts them in a single multi-row INSERT, so a burst of N webhooks
+costs one transaction instead of N. Callers await write() and only resume
+once their row has been committed.
+
+Rows are inserted with ON CONFLICT DO NOTHING: a request_id already stored
+in that day's partition (a replay admitted twice while Redis was down) is
+skipped without failing the batch, and its writer gets DuplicateRequestId.
+"""
+import asyncio
+import logging
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.models.webhook_event import WebhookEvent
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateRequestId(Exception):
+    """The row was skipped: its request_id is already stored for that day."""
+
+
+class WebhookEventWriter:
+    """
+    Write-behind batch inserter for the webhook_events table.
+
+    A single background task drains the buffer. While one batch is being
+    committed, new rows keep accumulating and go out in the next batch.
+    """
+
+    def __init__(self, batch_size: int | None = None, batch_window_ms: int | None = None):
+        self.batch_size = batch_size or settings.WEBHOOK_WRITER_BATCH_SIZE
+        if batch_window_ms is None:
+            batch_window_ms = settings.WEBHOOK_WRITER_BATCH_WINDOW_MS
+        self.batch_window = batch_window_ms / 1000
+        # Replaced with fresh ones by start()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._batch_full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        """Number of rows waiting to be inserted."""
+        return self._queue.qsize()
+
+    async def write(self, values: dict) -> None:
+        """
+        Queue one row for insertion and wait until it is committed.
+
+        Args:
+            values: Column values for the WebhookEvent row (must include id)
+
+        Raises:
+            DuplicateRequestId: The request_id is already stored for that day
+            The database error if this particular row could not be inserted
+        """
+        if self._task is None:
+            # Writer not running (e.g. scripts, shutdown): insert directly
+            error = self._duplicate(values, await self._insert([values]))
+            if error is not None:
+                raise error
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((values, future))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_full.set()
+        await future
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        self._queue = asyncio.Queue()
+        self._batch_full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still buffered and stop the flush task."""
+        if self._task is None:
+            return
+        # New writes go straight to the database from here on
+        task, self._task = self._task, None
+        self._queue.put_nowait(None)
+        self._batch_full.set()
+        await task
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            # Give concurrent requests a short window to join this batch,
+            # unless a full batch is already waiting (backlog under load)
+            if self._queue.qsize() + 1 < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.batch_window)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_full.clear()
+
+            batch = [item]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list) -> None:
+        try:
+            inserted = await self._insert([values for values, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], e)
+                return
+            # One bad row (e.g. its provider was deleted meanwhile) must not
+            # fail the whole batch: retry each row in its own transaction.
+            logger.warning(
+                f"Batch insert of {len(batch)} webhook events failed, "
+                f"retrying individually: {str(e)}"
+            )
+            for values, future in batch:
+                try:
+                    inserted = await self._insert([values])
+                except Exception as row_error:
+                    self._resolve(future, row_error)
+                else:
+                    self._resolve(future, self._duplicate(values, inserted))
+            return
+
+        for values, future in batch:
+            self._resolve(future, self._duplicate(values, inserted))
+
+    @staticmethod
+    async def _insert(rows: list[dict]) -> set:
+        """Insert rows, skipping duplicate request IDs; returns the ids actually inserted."""
+        statement = insert(WebhookEvent).on_conflict_do_nothing().returning(WebhookEvent.id)
+        async with engine.begin() as conn:
+            result = await conn.execute(statement, rows)
+        return set(result.scalars())
+
+    @staticmethod
+    def _duplicate(values: dict, inserted: set) -> DuplicateRequestId | None:
+        if values["id"] in inserted:
+            return None
+        return DuplicateRequestId(values["request_id"])
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, error: Exception | None = None) -> None:
+        # The waiting request may have been cancelled (client disconnect)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+
+# Global writer instance shared by all routes in this worker
+webhook_event_writer = WebhookEventWriter()
@@ -0,0 +1,151 @@
+"""
+Streaming CSV / NDJSON export.
+
+Rows are read through a server-side cursor (AsyncSession.stream with
+yield_per) and encoded one batch at a time, so an export of millions of
+rows holds only EXPORT_BATCH_SIZE rows and one encoded chunk in memory.
+Output can optionally be gzip-compressed on the fly.
+
+Exports open their own session: the request-scoped session from get_db
+is closed before a StreamingResponse body is sent.
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from sqlalchemy import select, Select, SQLColumnExpression
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CSV = "csv"
+EXPORT_NDJSON = "ndjson"
+EXPORT_FORMATS = (EXPORT_CSV, EXPORT_NDJSON)
+
+_MEDIA_TYPES = {
+    EXPORT_CSV: "text/csv",
+    EXPORT_NDJSON: "application/x-ndjson",
+}
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """One exported field."""
+    key: str  # NDJSON key
+    header: str  # CSV header
+    expression: SQLColumnExpression[Any]  # Column or SQL expression to select
+    # The expression yields JSON text (e.g. a JSONB column cast to text); it
+    # is embedded as-is in NDJSON instead of being decoded and re-encoded
+    raw_json: bool = False
+
+
+def export_select(columns: Sequence[ExportColumn]) -> Select[Any]:
+    """SELECT the export columns (plain tuples, not ORM objects)."""
+    return select(*[column.expression for column in columns])
+
+
+def media_type(export_format: str, compress: bool = False) -> str:
+    return "application/gzip" if compress else _MEDIA_TYPES[export_format]
+
+
+def filename(name: str, export_format: str, compress: bool = False) -> str:
+    return f"{name}.{export_format}" + (".gz" if compress else "")
+
+
+def _scalar(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # UUIDs, datetimes
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _encode_csv(rows, buffer: io.StringIO, writer) -> str:
+    for row in rows:
+        writer.writerow(["" if value is None else _scalar(value) for value in row])
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _encode_ndjson(rows, keys: Sequence[str], raw_json: Sequence[bool]) -> str:
+    lines = []
+    for row in rows:
+        fields = []
+        for key, is_raw, value in zip(keys, raw_json, row):
+            if is_raw and value is not None:
+                fields.append(f"{key}:{value}")
+            else:
+                fields.append(f"{key}:{json.dumps(_scalar(value))}")
+        lines.append("{" + ",".join(fields) + "}\n")
+    return "".join(lines)
+
+
+async def stream_export(
+    stmt: Select,
+    columns: Sequence[ExportColumn],
+    export_format: str = EXPORT_CSV,
+    compress: bool = False,
+    batch_size: int | None = None,
+    prepare_rows: Callable[[Sequence[Any]], Sequence[Sequence[Any]]] | None = None
+) -> AsyncIterator[bytes]:
+    """
+    Yield the encoded result of stmt batch by batch.
+
+    Args:
+        stmt: SELECT of the columns' expressions, in the same order
+        columns: Column definitions (keys / headers)
+        export_format: EXPORT_CSV or EXPORT_NDJSON
+        compress: Gzip the output
+        batch_size: Rows fetched per cursor round trip (default EXPORT_BATCH_SIZE)
+        prepare_rows: Applied to each fetched batch before encoding; must
+            return rows with exactly the columns' values (stmt may select
+            extra trailing columns for it to use)
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    # wbits=31: gzip header and trailer, so the output is a regular .gz file
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if export_format == EXPORT_CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.header for column in columns])
+        header = encode(_encode_csv((), buffer, writer))
+        if header:
+            yield header
+    else:
+        keys = [json.dumps(column.key) for column in columns]
+        raw_json = [column.raw_json for column in columns]
+
+    rows_written = 0
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                batch = prepare_rows(rows) if prepare_rows is not None else rows
+                if export_format == EXPORT_CSV:
+                    chunk = _encode_csv(batch, buffer, writer)
+                else:
+                    chunk = _encode_ndjson(batch, keys, raw_json)
+                rows_written += len(rows)
+                data = encode(chunk)
+                # The compressor buffers internally; skip empty chunks
+                if data:
+                    yield data
+    except Exception as e:
+        # Headers are already sent, so the response can only be cut short
+        logger.error(f"Export failed after {rows_written} rows: {str(e)}")
+        raise
+
+    if compressor:
+        yield compressor.flush()
@@ -2,153 +2,445 @@
 Webhook forwarding utilities.
 
 Forwards validated webhooks to internal services with retry logic.
+Deliveries are queued on a bounded in-memory queue and processed by a
+fixed number of worker coroutines (see ForwardingPool).
+
+Every row records when its last forwarding job was queued (queued_at).
+A job that never produced an outcome (queue full, drain timeout on
+shutdown, worker crash) leaves the row with forwarded = false and
+forwarded_at NULL; once queued_at is FORWARDING_SWEEP_MIN_AGE_SECONDS
+old, PendingForwardSweeper queues it again, reading the payload back
+from the cold-tier archive if the row was archived meanwhile.
 """
 import httpx
-import json
 import asyncio
-from datetime import datetime
+import time
+from dataclasses import dataclass
+from typing import cast
+from datetime import datetime, timedelta
 from uuid import UUID
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Table, select, update, func
+from app.db.models.provider import Provider
 from app.db.models.webhook_event import WebhookEvent
+from app.db.session import engine
 from app.core.config import settings
+from app.core.archive import segment_reader, ArchiveReadError
+from app.core.http_clients import http_client_pool
+from app.core.metrics import FORWARD_SECONDS
+from app.core.payload import encode_payload
+from app.core.rollups import rollup_accumulator, OUTCOME_FORWARDED_OK, OUTCOME_FORWARDED_FAILED
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+async def _update_webhook_event(webhook_id: UUID, received_at: datetime | None, **values) -> bool:
+    """
+    Persist forwarding status with a single UPDATE ... WHERE id = ... statement.
+
+    Uses the shared engine from app.db.session, so forwarders draw from the
+    same connection pool as the request handlers. When received_at is known
+    it is added to the WHERE clause, so Postgres only touches the one
+    partition holding the row.
+
+    Returns:
+        True if the webhook row exists, False otherwise
+    """
+    stmt = update(WebhookEvent).where(WebhookEvent.id == webhook_id)
+    if received_at is not None:
+        stmt = stmt.where(WebhookEvent.received_at == received_at)
+    stmt = stmt.values(**values)
+    async with engine.begin() as conn:
+        result = await conn.execute(stmt)
+
+    if result.rowcount == 0:
+        logger.error(f"Webhook {webhook_id} not found in database")
+        return False
+    return True
+
+
 async def forward_webhook(
     webhook_id: UUID,
-    webhook_payload: dict,
+    webhook_body: bytes,
     webhook_request_id: str,
     forwarding_url: str,
-    db_url: str,
-    max_retries: int = 3
+    max_retries: int = 3,
+    received_at: datetime | None = None
 ) -> bool:
     """
     Forward webhook to internal service with retry logic and exponential backoff.
     
     Args:
         webhook_id: The webhook event ID
-        webhook_payload: The webhook payload to forward
+        webhook_body: The raw JSON payload to forward, sent unchanged
         webhook_request_id: The request ID for tracking
         forwarding_url: URL of internal service
-        db_url: Database URL for creating new session
         max_retries: Number of retry attempts
+        received_at: When the webhook was received (locates its partition)
     
     Returns:
         True if successful, False otherwise
     """
-    # Create a new database session for this async task
-    engine = create_async_engine(db_url, echo=False)
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # Shared keep-alive client for this forwarding host
+    client = http_client_pool.get(forwarding_url)
     
-    try:
-        async with httpx.AsyncClient(timeout=settings.FORWARDING_TIMEOUT_SECONDS) as client:
-            for attempt in range(max_retries):
-                try:
-                    # Forward the webhook payload
-                    response = await client.post(
-                        forwarding_url,
-                        json=webhook_payload,
-                        headers={
-                            "X-Webhook-ID": str(webhook_id),
-                            "X-Request-ID": webhook_request_id,
-                            "Content-Type": "application/json"
-                        }
-                    )
-                    
-                    # Create new session for database update
-                    async with async_session() as session:
-                        from sqlalchemy import select
-                        stmt = select(WebhookEvent).where(WebhookEvent.id == webhook_id)
-                        result = await session.execute(stmt)
-                        webhook_event = result.scalars().first()
-                        
-                        if not webhook_event:
-                            logger.error(f"Webhook {webhook_id} not found in database")
-                            return False
-                        
-                        # Check if successful (2xx status code)
-                        if 200 <= response.status_code < 300:
-                            webhook_event.forwarded = True
-                            webhook_event.response_status = response.status_code
-                            webhook_event.response_body = response.text[:1000]  # Limit response body
-                            webhook_event.forwarded_at = datetime.utcnow()
-                            await session.commit()
-                            logger.info(f"Webhook {webhook_id} forwarded successfully")
-                            return True
-                        
-                        # If 4xx error, don't retry (client error)
-                        if 400 <= response.status_code < 500:
-                            webhook_event.response_status = response.status_code
-                            webhook_event.response_body = response.text[:1000]
-                            webhook_event.error_message = f"Client error: {response.status_code}"
-                            webhook_event.forwarded_at = datetime.utcnow()
-                            await session.commit()
-                            logger.warning(f"Webhook {webhook_id} client error: {response.status_code}")
-                            return False
-                        
-                        # 5xx error - retry with exponential backoff
-                        if attempt < max_retries - 1:
-                            backoff = 2 ** attempt  # 1s, 2s, 4s
-                            logger.warning(f"Webhook {webhook_id} server error {response.status_code}, retrying in {backoff}s")
-                            await asyncio.sleep(backoff)
-                            continue
-                        
-                        # Last attempt failed
-                        webhook_event.response_status = response.status_code
-                        webhook_event.response_body = response.text[:1000]
-                        webhook_event.error_message = f"Server error after {max_retries} attempts"
-                        webhook_event.forwarded_at = datetime.utcnow()
-                        await session.commit()
-                        return False
-                    
-                except httpx.TimeoutException as e:
-                    logger.warning(f"Webhook {webhook_id} timeout on attempt {attempt + 1}/{max_retries}")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    
-                    async with async_session() as session:
-                        stmt = select(WebhookEvent).where(WebhookEvent.id == webhook_id)
-                        result = await session.execute(stmt)
-                        webhook_event = result.scalars().first()
-                        if webhook_event:
-                            webhook_event.error_message = f"Timeout after {max_retries} attempts"
-                            webhook_event.forwarded_at = datetime.utcnow()
-                            await session.commit()
-                    return False
-                    
-                except httpx.RequestError as e:
-                    logger.warning(f"Webhook {webhook_id} request error on attempt {attempt + 1}/{max_retries}: {str(e)}")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)
-                        continue
-                    
-                    async with async_session() as session:
-                        stmt = select(WebhookEvent).where(WebhookEvent.id == webhook_id)
-                        result = await session.execute(stmt)
-                        webhook_event = result.scalars().first()
-                        if webhook_event:
-                            webhook_event.error_message = f"Request error: {str(e)[:100]}"
-                            webhook_event.forwarded_at = datetime.utcnow()
-                            await session.commit()
-                    return False
-                    
-                except Exception as e:
-                    logger.error(f"Webhook {webhook_id} unexpected error: {str(e)}")
-                    async with async_session() as session:
-                        stmt = select(WebhookEvent).where(WebhookEvent.id == webhook_id)
-                        result = await session.execute(stmt)
-                        webhook_event = result.scalars().first()
-                        if webhook_event:
-                            webhook_event.error_message = f"Unexpected error: {str(e)[:100]}"
-                            webhook_event.forwarded_at = datetime.utcnow()
-                            await session.commit()
+    for attempt in range(max_retries):
+        try:
+            # Forward the webhook payload
+            response = await client.post(
+                forwarding_url,
+                content=webhook_body,
+                headers={
+                    "X-Webhook-ID": str(webhook_id),
+                    "X-Request-ID": webhook_request_id,
+                    "Content-Type": "application/json"
+                }
+            )
+
+            # Check if successful (2xx status code)
+            if 200 <= response.status_code < 300:
+                if not await _update_webhook_event(
+                    webhook_id,
+                    received_at,
+                    forwarded=True,
+                    response_status=response.status_code,
+                    response_body=response.text[:1000],  # Limit response body
+                    error_message=None,  # Clears the error of an earlier attempt
+                    forwarded_at=datetime.utcnow()
+                ):
                     return False
-        
-        return False
-        
-    finally:
-        await engine.dispose()
+                logger.info(f"Webhook {webhook_id} forwarded successfully")
+                return True
+
+            # If 4xx error, don't retry (client error)
+            if 400 <= response.status_code < 500:
+                await _update_webhook_event(
+                    webhook_id,
+                    received_at,
+                    response_status=response.status_code,
+                    response_body=response.text[:1000],
+                    error_message=f"Client error: {response.status_code}",
+                    forwarded_at=datetime.utcnow()
+                )
+                logger.warning(f"Webhook {webhook_id} client error: {response.status_code}")
+                return False
+
+            # 5xx error - retry with exponential backoff
+            if attempt < max_retries - 1:
+                backoff = 2 ** attempt  # 1s, 2s, 4s
+                logger.warning(
+                    f"Webhook {webhook_id} server error {response.status_code}, "
+                    f"retrying in {backoff}s"
+                )
+                await asyncio.sleep(backoff)
+                continue
+
+            # Last attempt failed
+            await _update_webhook_event(
+                webhook_id,
+                received_at,
+                response_status=response.status_code,
+                response_body=response.text[:1000],
+                error_message=f"Server error after {max_retries} attempts",
+                forwarded_at=datetime.utcnow()
+            )
+            return False
+
+        except httpx.TimeoutException:
+            logger.warning(f"Webhook {webhook_id} timeout on attempt {attempt + 1}/{max_retries}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            await _update_webhook_event(
+                webhook_id,
+                received_at,
+                error_message=f"Timeout after {max_retries} attempts",
+                forwarded_at=datetime.utcnow()
+            )
+            return False
+
+        except httpx.RequestError as e:
+            logger.warning(
+                f"Webhook {webhook_id} request error on attempt "
+                f"{attempt + 1}/{max_retries}: {str(e)}"
+            )
+            if attempt < max_retries - 1:
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            await _update_webhook_event(
+                webhook_id,
+                received_at,
+                error_message=f"Request error: {str(e)[:100]}",
+                forwarded_at=datetime.utcnow()
+            )
+            return False
+
+        except Exception as e:
+            logger.error(f"Webhook {webhook_id} unexpected error: {str(e)}")
+            await _update_webhook_event(
+                webhook_id,
+                received_at,
+                error_message=f"Unexpected error: {str(e)[:100]}",
+                forwarded_at=datetime.utcnow()
+            )
+            return False
+
+    return False
+
+
+@dataclass(frozen=True)
+class ForwardJob:
+    """A validated webhook waiting to be forwarded."""
+    webhook_id: UUID
+    body: bytes  # Exact bytes to send downstream
+    request_id: str
+    forwarding_url: str
+    # For the per-minute rollups and metrics
+    provider_id: UUID | None = None
+    provider_name: str | None = None
+    received_at: datetime | None = None
+
+
+class ForwardingPool:
+    """
+    Bounded queue of forward jobs drained by a fixed set of workers.
+
+    Replaces fire-and-forget asyncio.create_task calls so that a traffic
+    spike cannot create an unbounded number of concurrent deliveries, and
+    so that queued deliveries are drained on shutdown instead of being lost.
+    """
+
+    def __init__(self, max_queue_size: int | None = None, workers: int | None = None):
+        self.max_queue_size = max_queue_size or settings.FORWARDING_QUEUE_MAX_SIZE
+        self.worker_count = workers or settings.FORWARDING_WORKERS
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def is_saturated(self) -> bool:
+        """True when the queue is full and new webhooks should be refused."""
+        return self._queue is not None and self._queue.full()
+
+    def submit(self, job: ForwardJob) -> bool:
+        """
+        Queue a job without waiting.
+
+        Returns:
+            True if queued, False if the queue is full or the pool is stopped.
+            A refused job stays pending in the database and is queued again
+            by PendingForwardSweeper.
+        """
+        if self._queue is None:
+            logger.warning(f"Forwarding pool not running, webhook {job.webhook_id} left pending")
+            return False
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Forwarding queue full, webhook {job.webhook_id} left pending")
+            return False
+
+    def start(self) -> None:
+        """Start the worker coroutines."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(self._queue))
+            for _ in range(self.worker_count)
+        ]
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop accepting jobs, wait for queued ones to finish, then stop workers.
+
+        Args:
+            timeout: Max seconds to wait for the queue to drain
+                     (default FORWARDING_DRAIN_TIMEOUT_SECONDS)
+        """
+        if self._queue is None:
+            return
+        if timeout is None:
+            timeout = settings.FORWARDING_DRAIN_TIMEOUT_SECONDS
+
+        queue, self._queue = self._queue, None
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Forwarding drain timed out, {queue.qsize()} webhooks left pending")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        # The queue is passed in because stop() clears self._queue while we drain
+        while True:
+            job = await queue.get()
+            started = time.perf_counter()
+            try:
+                forwarded = await forward_webhook(
+                    job.webhook_id,
+                    job.body,
+                    job.request_id,
+                    job.forwarding_url,
+                    received_at=job.received_at
+                )
+                FORWARD_SECONDS.observe(
+                    time.perf_counter() - started,
+                    job.provider_name or "",
+                    "ok" if forwarded else "failed"
+                )
+                if job.provider_id is not None:
+                    rollup_accumulator.record(
+                        job.provider_id,
+                        OUTCOME_FORWARDED_OK if forwarded else OUTCOME_FORWARDED_FAILED,
+                        latency=(
+                            (datetime.utcnow() - job.received_at).total_seconds()
+                            if job.received_at else 0.0
+                        )
+                    )
+            except Exception as e:
+                logger.error(f"Webhook {job.webhook_id} forwarding worker error: {str(e)}")
+            finally:
+                queue.task_done()
+
+
+# Global forwarding pool shared by all routes in this worker
+forwarding_pool = ForwardingPool()
+
+
+async def sweep_pending_forwards(now: datetime | None = None) -> int:
+    """
+    Queue webhooks whose forwarding job was lost.
+
+    A row is pending while forwarded = false and forwarded_at is NULL.
+    Pending rows whose job was queued (queued_at, or received_at for rows
+    stored before it existed) at least FORWARDING_SWEEP_MIN_AGE_SECONDS
+    ago are claimed by moving queued_at to now, with FOR UPDATE SKIP
+    LOCKED so concurrent sweepers in other workers take different rows.
+    A claim is a lease: if this worker dies before the job finishes, the
+    row becomes eligible again once the new queued_at is as old. The
+    setting must therefore exceed the longest time a job can wait in a
+    worker's queue, or a slow job is delivered twice. Claims are bounded
+    by free queue space; a claimed row the pool refuses anyway is
+    released again.
+
+    The body is re-encoded from the stored JSONB (or the archived record),
+    so it is not byte-identical to the original request (see
+    app.core.payload). A row whose archived record cannot be read keeps
+    its claim and is tried again once it expires.
+
+    Returns:
+        Number of webhooks queued
+    """
+    free = forwarding_pool.max_queue_size - forwarding_pool.depth
+    limit = min(settings.FORWARDING_SWEEP_BATCH_SIZE, free // 2)
+    if limit <= 0:
+        return 0
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.FORWARDING_SWEEP_MIN_AGE_SECONDS)
+
+    table = cast(Table, WebhookEvent.__table__)
+    pending = select(table.c.id, table.c.received_at).where(
+        table.c.forwarded.is_(False),
+        table.c.forwarded_at.is_(None),
+        # queued_at is never before received_at; this bound lets the
+        # received_at index narrow the scan
+        table.c.received_at < cutoff,
+        func.coalesce(table.c.queued_at, table.c.received_at) < cutoff
+    ).order_by(table.c.received_at).limit(limit).with_for_update(skip_locked=True).cte("pending")
+    claim = update(table).where(
+        table.c.id == pending.c.id,
+        table.c.received_at == pending.c.received_at
+    ).values(
+        queued_at=now
+    ).returning(
+        table.c.id, table.c.received_at, table.c.request_id, table.c.payload, table.c.provider_id,
+        table.c.archive_segment, table.c.archive_offset, table.c.archive_length
+    )
+
+    async with engine.begin() as conn:
+        rows = (await conn.execute(claim)).all()
+        if not rows:
+            return 0
+        providers = {
+            provider_id: (name, forwarding_url)
+            for provider_id, name, forwarding_url in await conn.execute(
+                select(Provider.id, Provider.name, Provider.forwarding_url)
+                .where(Provider.id.in_({row.provider_id for row in rows}))
+            )
+        }
+
+    queued = 0
+    for index, row in enumerate(rows):
+        provider_name, forwarding_url = providers[row.provider_id]
+        payload = row.payload
+        if row.archive_segment is not None:
+            try:
+                payload = segment_reader.read(
+                    row.archive_segment, row.archive_offset, row.archive_length
+                )["payload"]
+            except ArchiveReadError as e:
+                logger.error(f"Cannot re-queue webhook {row.id}: {str(e)}")
+                continue
+        if not forwarding_pool.submit(ForwardJob(
+            webhook_id=row.id,
+            body=encode_payload(payload),
+            request_id=row.request_id,
+            forwarding_url=forwarding_url,
+            provider_id=row.provider_id,
+            provider_name=provider_name,
+            received_at=row.received_at
+        )):
+            # Release the rest for the next sweep
+            for released in rows[index:]:
+                await _update_webhook_event(released.id, released.received_at, queued_at=None)
+            break
+        queued += 1
+
+    if queued:
+        logger.info(f"Re-queued {queued} pending webhooks for forwarding")
+    return queued
+
+
+class PendingForwardSweeper:
+    """Runs sweep_pending_forwards every FORWARDING_SWEEP_INTERVAL_SECONDS."""
+
+    def __init__(self, interval_seconds: float | None = None):
+        self.interval = (
+            interval_seconds if interval_seconds is not None
+            else settings.FORWARDING_SWEEP_INTERVAL_SECONDS
+        )
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await sweep_pending_forwards()
+            except Exception as e:
+                logger.error(f"Pending forward sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+# Global sweeper for this worker
+pending_forward_sweeper = PendingForwardSweeper()
@@ -0,0 +1,184 @@
+"""
+Header capture and dictionary encoding.
+
+At capture, a webhook's request headers are filtered through the
+provider's allowlist (captured_headers, else HEADER_CAPTURE_ALLOWLIST)
+and split in two:
+- per-request headers (HEADER_CAPTURE_PER_REQUEST: signature, timestamp,
+  ...) stay inline in webhook_events.headers;
+- everything else is the same on most deliveries. It is stored once in
+  header_sets and referenced by webhook_events.header_set_id.
+
+Resolving a set to its id is served from a per-worker LRU, so the
+ingest path only touches header_sets the first time a worker sees a set.
+A header that varies per delivery but is not listed as per-request would
+make every webhook a new set (an insert on the ingest path and a row per
+webhook), so each worker creates at most HEADER_SET_MAX_NEW_PER_MINUTE
+sets per provider per minute; beyond that, resolve() returns None and the
+caller keeps the headers inline. Readers merge both halves back with
+load_headers().
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Mapping
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.models.header_set import HeaderSet
+from app.db.models.webhook_event import WebhookEvent
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+_PER_REQUEST_HEADERS = frozenset(name.lower() for name in settings.HEADER_CAPTURE_PER_REQUEST)
+
+
+def capture_headers(
+    headers: Mapping[str, str],
+    allowlist: frozenset | None
+) -> tuple[dict, dict]:
+    """
+    Filter request headers and split them into (shared, per-request).
+
+    Args:
+        headers: Request headers (starlette lowercases the names)
+        allowlist: Lowercase header names to keep, or None to keep all
+
+    Returns:
+        (headers for the shared header set, headers kept inline on the row)
+    """
+    shared, per_request = {}, {}
+    for name, value in headers.items():
+        name = name.lower()
+        if allowlist is not None and name not in allowlist:
+            continue
+        if name in _PER_REQUEST_HEADERS:
+            per_request[name] = value
+        else:
+            shared[name] = value
+    return shared, per_request
+
+
+def header_digest(headers: dict) -> str:
+    """SHA-256 of the canonical (sorted, compact) JSON encoding."""
+    canonical = json.dumps(headers, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class HeaderSetRegistry:
+    """
+    Maps header sets to header_sets ids, inserting unseen sets.
+
+    Counters:
+        hits: sets resolved from the in-process cache
+        misses: sets resolved against the database
+        capped: unseen sets not stored because the provider hit its cap
+    """
+
+    def __init__(self, max_entries: int | None = None, max_new_per_minute: int | None = None):
+        self.max_entries = max_entries or settings.HEADER_SET_CACHE_SIZE
+        self.max_new_per_minute = (
+            max_new_per_minute if max_new_per_minute is not None
+            else settings.HEADER_SET_MAX_NEW_PER_MINUTE
+        )
+        # digest -> header_sets.id, least recently used first
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        # provider id -> [minute window start (monotonic), sets resolved against the database]
+        self._new_sets: dict[uuid.UUID, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.capped = 0
+
+    def _allow_new(self, provider_id: uuid.UUID) -> bool:
+        now = time.monotonic()
+        window = self._new_sets.get(provider_id)
+        if window is None or now - window[0] >= 60:
+            window = self._new_sets[provider_id] = [now, 0]
+        if window[1] >= self.max_new_per_minute:
+            return False
+        window[1] += 1
+        return True
+
+    async def resolve(self, headers: dict, provider_id: uuid.UUID) -> int | None:
+        """
+        Return the id of the stored copy of headers, creating it if needed.
+
+        Args:
+            headers: Shared headers of one webhook
+            provider_id: Provider the webhook belongs to (for the new-set cap)
+
+        Returns:
+            header_sets.id, or None for an empty set or when the provider
+            is over its new-set cap (store the headers inline instead)
+        """
+        if not headers:
+            return None
+        digest = header_digest(headers)
+        header_set_id = self._ids.get(digest)
+        if header_set_id is not None:
+            self._ids.move_to_end(digest)
+            self.hits += 1
+            return header_set_id
+
+        if not self._allow_new(provider_id):
+            self.capped += 1
+            return None
+        self.misses += 1
+        # DO UPDATE (a no-op) rather than DO NOTHING so RETURNING always
+        # yields the id, including when another worker inserted it first
+        insert_stmt = insert(HeaderSet).values(digest=digest, headers=headers)
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[HeaderSet.digest],
+            set_={"digest": insert_stmt.excluded.digest}
+        ).returning(HeaderSet.id)
+        async with engine.begin() as conn:
+            header_set_id = (await conn.execute(stmt)).scalar_one()
+
+        self._ids[digest] = header_set_id
+        while len(self._ids) > self.max_entries:
+            self._ids.popitem(last=False)
+        return header_set_id
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "capped": self.capped,
+        }
+
+
+# Global registry shared by all routes in this worker
+header_set_registry = HeaderSetRegistry()
+
+
+async def load_headers(db: AsyncSession, events: Iterable[WebhookEvent]) -> None:
+    """
+    Merge each event's shared header set back into event.headers.
+
+    One query for all distinct sets. The merged value is set as
+    already-committed state, so it is never written back to the row.
+    Call after load_archived() for archived events.
+    """
+    events = [event for event in events if event.header_set_id is not None]
+    if not events:
+        return
+    ids = {event.header_set_id for event in events}
+    result = await db.execute(
+        select(HeaderSet.id, HeaderSet.headers).where(HeaderSet.id.in_(ids))
+    )
+    header_sets = {header_set_id: shared for header_set_id, shared in result.all()}
+    for event in events:
+        shared = header_sets.get(event.header_set_id)
+        if shared is None:
+            logger.error(f"Webhook {event.id}: header set {event.header_set_id} not found")
+            continue
+        set_committed_value(event, "headers", {**shared, **(event.headers or {})})
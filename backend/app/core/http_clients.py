@@ -0,0 +1,93 @@
+"""
+Shared HTTP client pool for webhook forwarding.
+
+Keeps one long-lived httpx.AsyncClient per downstream origin so forwards
+reuse keep-alive connections instead of opening a new TCP/TLS connection
+per webhook. Each origin gets its own connection limits, which can be
+overridden per forwarding host in FORWARDING_HOST_CONNECTION_LIMITS.
+"""
+import logging
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional 'h2' package."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HTTPClientPool:
+    """
+    Application-lifetime httpx clients keyed by origin (scheme://host:port).
+
+    Created lazily on first use and closed in the lifespan shutdown.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._host_limits: dict[str, int] = {}
+        self._http2 = False
+
+    def start(self) -> None:
+        """Resolve pool-wide options. Clients themselves are created on demand."""
+        self._host_limits = {
+            self._origin(url): limit
+            for url, limit in settings.FORWARDING_HOST_CONNECTION_LIMITS.items()
+        }
+        self._http2 = settings.FORWARDING_HTTP2
+        if self._http2 and not _http2_available():
+            logger.warning("FORWARDING_HTTP2 is enabled but 'h2' is not installed, using HTTP/1.1")
+            self._http2 = False
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """Return the shared client for the origin of url."""
+        origin = self._origin(url)
+        client = self._clients.get(origin)
+        if client is None:
+            client = self._create_client(origin)
+            self._clients[origin] = client
+        return client
+
+    async def close(self) -> None:
+        """Close every client and its pooled connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client: {str(e)}")
+
+    def _create_client(self, origin: str) -> httpx.AsyncClient:
+        max_connections = self._host_limits.get(
+            origin, settings.FORWARDING_MAX_CONNECTIONS_PER_HOST
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(
+                settings.FORWARDING_MAX_KEEPALIVE_CONNECTIONS, max_connections
+            ),
+            keepalive_expiry=settings.FORWARDING_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        return httpx.AsyncClient(
+            timeout=settings.FORWARDING_TIMEOUT_SECONDS,
+            limits=limits,
+            http2=self._http2,
+        )
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+# Global client pool shared by all forwarding workers in this worker process
+http_client_pool = HTTPClientPool()
@@ -0,0 +1,434 @@
+"""
+Webhook ingestion pipeline.
+
+receive_webhook runs every request through an ordered list of stages.
+Stages are ordered by cost - pure CPU checks first, then the provider
+lookup (in-process cache, database only on a miss), the body read, Redis,
+and finally the database insert - so malformed, stale or forged requests
+are rejected before any network I/O is spent on them.
+
+Each stage is a plain async function taking an IngestContext. A stage
+rejects a request by raising IngestRejected; the runner logs the matching
+security event and records how long every stage took.
+
+Security events are only recorded for providers that exist. The timestamp
+check runs before the provider lookup because it is cheap. When it
+rejects a request, the runner resolves the provider first and drops the
+event for unknown names, so made-up provider names cannot fill the
+security log.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from fastapi import Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.event_writer import DuplicateRequestId, webhook_event_writer
+from app.core.forwarding import forwarding_pool, ForwardJob
+from app.core.header_sets import capture_headers, header_set_registry
+from app.core.intake import read_body_limited, PayloadTooLargeError
+from app.core.metrics import INGEST_STAGE_SECONDS, INGEST_RESULTS
+from app.core.payload import validate_json, encode_payload
+from app.core.provider_cache import provider_registry, CachedProvider
+from app.core.rate_limit import (
+    check_admission,
+    ADMISSION_RATE_LIMITED,
+    ADMISSION_REPLAY,
+    ADMISSION_UNVERIFIED,
+)
+from app.core.replay_cache import replay_cache, REPLAY_SEEN, REPLAY_SUSPECT
+from app.core.rollups import rollup_accumulator, OUTCOME_RECEIVED
+from app.core.security_logger import log_security_event
+
+logger = logging.getLogger(__name__)
+
+
+class IngestRejected(Exception):
+    """
+    Raised by a stage to reject the request.
+
+    If event_type is set, the rejection is also recorded as a security event.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        detail: str,
+        event_type: str | None = None,
+        details: dict | None = None,
+        headers: dict | None = None
+    ):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.event_type = event_type
+        self.details = details
+        self.headers = headers
+
+
+class IngestContext:
+    """State shared by the stages while processing one webhook."""
+
+    def __init__(
+        self,
+        provider_name: str,
+        request: Request,
+        db: AsyncSession,
+        redis_client: redis.Redis
+    ):
+        self.provider_name = provider_name
+        self.request = request
+        self.db = db
+        self.redis_client = redis_client
+        self.client_ip = request.client.host if request.client else "unknown"
+
+        # Filled in by the stages, in order; empty until the stage has run
+        self.signature = ""
+        self.timestamp = ""
+        self.request_id = ""
+        self.provider: CachedProvider | None = None
+        self.body = b""
+        self.payload: Any = None
+        self.forward_body = b""
+        self.webhook_id: uuid.UUID | None = None
+        # False if the forwarding queue refused the job (the sweeper retries it)
+        self.forward_queued = False
+
+        # Seconds spent in each stage that ran
+        self.timings: dict[str, float] = {}
+
+    @property
+    def known_provider(self) -> CachedProvider:
+        """The provider, for the stages after lookup_provider."""
+        assert self.provider is not None, "lookup_provider has not run"
+        return self.provider
+
+
+# --- CPU stages -------------------------------------------------------------
+
+async def check_capacity(ctx: IngestContext) -> None:
+    """Refuse new work while the forwarding queue is full (backpressure)."""
+    if forwarding_pool.is_saturated:
+        raise IngestRejected(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Webhook gateway is overloaded, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def check_headers(ctx: IngestContext) -> None:
+    """Require the signature, timestamp and request ID headers."""
+    headers = ctx.request.headers
+    ctx.signature = headers.get("X-Signature", "")
+    ctx.timestamp = headers.get("X-Timestamp", "")
+    ctx.request_id = headers.get("X-Request-ID", "")
+
+    if not ctx.signature or not ctx.timestamp:
+        raise IngestRejected(
+            status.HTTP_400_BAD_REQUEST, "Missing X-Signature or X-Timestamp header"
+        )
+    if not ctx.request_id:
+        raise IngestRejected(status.HTTP_400_BAD_REQUEST, "Missing X-Request-ID header")
+
+
+async def check_timestamp(ctx: IngestContext) -> None:
+    """Reject timestamps that are malformed, too old or in the future."""
+    try:
+        webhook_timestamp = datetime.fromisoformat(ctx.timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        raise IngestRejected(
+            status.HTTP_400_BAD_REQUEST,
+            "Invalid timestamp format",
+            event_type="invalid_timestamp",
+            details={"timestamp": ctx.timestamp}
+        )
+
+    now = datetime.now(webhook_timestamp.tzinfo)
+    time_diff = (now - webhook_timestamp).total_seconds()
+
+    if time_diff > settings.REPLAY_PROTECTION_WINDOW_SECONDS:
+        raise IngestRejected(
+            status.HTTP_400_BAD_REQUEST,
+            "Webhook timestamp too old (replay protection)",
+            event_type="timestamp_too_old",
+            details={
+                "time_diff": time_diff,
+                "max_allowed": settings.REPLAY_PROTECTION_WINDOW_SECONDS
+            }
+        )
+
+    if time_diff < 0:
+        raise IngestRejected(
+            status.HTTP_400_BAD_REQUEST,
+            "Webhook timestamp is in the future",
+            event_type="timestamp_in_future",
+            details={"time_diff": time_diff}
+        )
+
+
+# --- Provider lookup and body read ------------------------------------------
+
+async def lookup_provider(ctx: IngestContext) -> None:
+    """Resolve the provider (in-process registry, database on a miss)."""
+    ctx.provider = await provider_registry.get(ctx.db, ctx.provider_name)
+    if not ctx.provider:
+        raise IngestRejected(
+            status.HTTP_404_NOT_FOUND, f"Provider '{ctx.provider_name}' not found"
+        )
+
+
+async def read_body(ctx: IngestContext) -> None:
+    """Read the raw body, enforcing the provider's size limit while streaming."""
+    try:
+        ctx.body = await read_body_limited(
+            ctx.request, ctx.known_provider.max_payload_size_bytes
+        )
+    except PayloadTooLargeError as e:
+        raise IngestRejected(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Payload size exceeds maximum of {e.max_allowed} bytes",
+            event_type="payload_too_large",
+            details={"size": e.size, "max_allowed": e.max_allowed}
+        )
+
+
+async def verify_signature(ctx: IngestContext) -> None:
+    """
+    Verify the signature with the provider's pre-keyed verifier.
+
+    Large bodies are hashed on a thread pool (see SignatureVerifier.verify_async).
+    """
+    if not await ctx.known_provider.verifier.verify_async(ctx.body, ctx.signature):
+        raise IngestRejected(
+            status.HTTP_401_UNAUTHORIZED,
+            "Invalid webhook signature",
+            event_type="invalid_signature",
+            details={"signature": ctx.signature[:20] + "..."}
+        )
+
+
+async def validate_payload(ctx: IngestContext) -> None:
+    """
+    Check the body is valid JSON.
+
+    In raw mode the verified bytes are kept as-is for storage and
+    forwarding instead of being decoded and re-encoded.
+    """
+    if settings.PRESERVE_RAW_PAYLOAD:
+        ctx.payload = validate_json(ctx.body)
+        ctx.forward_body = ctx.body
+    else:
+        try:
+            ctx.payload = json.loads(ctx.body)
+        except json.JSONDecodeError:
+            ctx.payload = None
+        if ctx.payload is not None:
+            ctx.forward_body = encode_payload(ctx.payload)
+
+    if ctx.payload is None:
+        raise IngestRejected(status.HTTP_400_BAD_REQUEST, "Invalid JSON payload")
+
+
+# --- Redis stage -------------------------------------------------------------
+
+async def admit(ctx: IngestContext) -> None:
+    """
+    Rate limit + replay guard in a single atomic Redis round trip.
+
+    Request IDs this worker admitted recently are rejected from the local
+    replay cache without touching Redis. While Redis is unavailable,
+    check_admission falls back to in-process limits (degraded mode).
+    """
+    provider = ctx.known_provider
+    replay_key = _replay_key(ctx)
+    local = replay_cache.check(replay_key)
+    if local == REPLAY_SEEN:
+        raise _replay_rejection(replay_key)
+
+    outcome, rate_info = await check_admission(
+        ctx.redis_client,
+        str(provider.id),
+        replay_key,
+        max_requests=provider.rate_limit_requests,
+        window_seconds=provider.rate_limit_period_seconds,
+        algorithm=provider.rate_limit_algorithm,
+        burst=provider.rate_limit_burst
+    )
+
+    if outcome == ADMISSION_RATE_LIMITED:
+        raise IngestRejected(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            f"Rate limit exceeded. Reset in {rate_info['reset_at']} seconds",
+            event_type="rate_limit_exceeded",
+            details={"limit": rate_info["limit"], "reset_at": rate_info["reset_at"]}
+        )
+
+    if outcome == ADMISSION_UNVERIFIED:
+        # Redis is down and the local Bloom filter has seen this ID: let the
+        # provider retry once it can be checked properly
+        raise IngestRejected(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Replay check unavailable, retry later",
+            headers={"Retry-After": str(settings.REDIS_BREAKER_RESET_SECONDS)}
+        )
+
+    if local == REPLAY_SUSPECT:
+        replay_cache.record_suspect_result(outcome == ADMISSION_REPLAY)
+
+    if outcome == ADMISSION_REPLAY:
+        raise _replay_rejection(replay_key)
+
+    replay_cache.add(replay_key)
+
+
+def _replay_key(ctx: IngestContext) -> str:
+    return f"webhook:{ctx.provider_name}:{ctx.request_id}"
+
+
+def _replay_rejection(replay_key: str) -> IngestRejected:
+    return IngestRejected(
+        status.HTTP_409_CONFLICT,
+        "Webhook already processed (replay detected)",
+        event_type="replay_attempt",
+        details={"replay_key": replay_key}
+    )
+
+
+# --- Database stage ----------------------------------------------------------
+
+async def persist(ctx: IngestContext) -> None:
+    """Store the event (group-committed) and queue it for forwarding."""
+    provider = ctx.known_provider
+    ctx.webhook_id = uuid.uuid4()
+    received_at = datetime.utcnow()
+    # Allowlisted headers; the repeated part is stored once in header_sets
+    shared_headers, per_request_headers = capture_headers(
+        ctx.request.headers, provider.captured_headers
+    )
+    header_set_id = await header_set_registry.resolve(shared_headers, provider.id)
+    if header_set_id is None:
+        per_request_headers = {**shared_headers, **per_request_headers}
+    try:
+        await webhook_event_writer.write({
+            "id": ctx.webhook_id,
+            "provider_id": provider.id,
+            "request_id": ctx.request_id,
+            "payload": ctx.payload,
+            "headers": per_request_headers,
+            "header_set_id": header_set_id,
+            "signature_valid": True,
+            "forwarded": False,
+            "received_at": received_at,
+            # Submitted right below; the sweeper leaves the row alone until
+            # this is FORWARDING_SWEEP_MIN_AGE_SECONDS old
+            "queued_at": received_at
+        })
+    except DuplicateRequestId:
+        # Got past the Redis check (degraded mode, expired key): stored row wins
+        raise _replay_rejection(_replay_key(ctx))
+    rollup_accumulator.record(provider.id, OUTCOME_RECEIVED, at=received_at)
+
+    # Forwarding happens in the background; don't wait for it. If the queue
+    # filled up since check_capacity, the row stays pending and
+    # PendingForwardSweeper queues it once queued_at has aged. The client
+    # still gets 202: the event is stored and its request ID is spent, so
+    # a provider retry would only be rejected as a replay.
+    ctx.forward_queued = forwarding_pool.submit(ForwardJob(
+        webhook_id=ctx.webhook_id,
+        body=ctx.forward_body,
+        request_id=ctx.request_id,
+        forwarding_url=provider.forwarding_url,
+        provider_id=provider.id,
+        provider_name=ctx.provider_name,
+        received_at=received_at
+    ))
+
+
+async def _provider_exists(ctx: IngestContext) -> bool:
+    """True if the request names an existing provider (resolving it if needed)."""
+    if ctx.provider is None:
+        try:
+            ctx.provider = await provider_registry.get(ctx.db, ctx.provider_name)
+        except Exception as e:
+            logger.error(f"Provider lookup for security event failed: {str(e)}")
+            return False
+    return ctx.provider is not None
+
+
+Stage = Callable[[IngestContext], Awaitable[None]]
+
+# Ordered cheapest first: CPU < provider lookup / body read < Redis < DB
+INGEST_STAGES: list[tuple[str, Stage]] = [
+    ("capacity", check_capacity),
+    ("headers", check_headers),
+    ("timestamp", check_timestamp),
+    ("provider_lookup", lookup_provider),
+    ("body_read", read_body),
+    ("hmac", verify_signature),
+    ("payload", validate_payload),
+    # Rate limit and replay check: one atomic Redis round trip, timed as one
+    ("admission", admit),
+    ("persist", persist),
+]
+
+# INGEST_RESULTS label for a stage that raised something other than IngestRejected
+INGEST_RESULT_ERROR = "error"
+
+
+def _finish_stage(ctx: IngestContext, name: str, started: float) -> None:
+    elapsed = ctx.timings[name] = time.perf_counter() - started
+    INGEST_STAGE_SECONDS.observe(elapsed, name)
+
+
+async def run_ingest_pipeline(
+    ctx: IngestContext, stages: list[tuple[str, Stage]] | None = None
+) -> None:
+    """
+    Run ctx through every stage in order, timing each one.
+
+    A stage's time covers only the stage itself, not the security event
+    logged when it rejects. The "admission" stage covers both the rate
+    limit and the replay check, which share a single Redis round trip.
+    Every request is counted in INGEST_RESULTS: "accepted", the rejecting
+    status code, or INGEST_RESULT_ERROR for an unexpected exception.
+
+    Raises:
+        IngestRejected: From the first stage that rejects the request
+                        (after its security event has been logged, if the
+                        provider exists)
+    """
+    for name, stage in stages or INGEST_STAGES:
+        started = time.perf_counter()
+        try:
+            await stage(ctx)
+        except IngestRejected as e:
+            _finish_stage(ctx, name, started)
+            INGEST_RESULTS.inc(str(e.status_code))
+            if e.event_type and await _provider_exists(ctx):
+                log_security_event(
+                    ctx.provider_name,
+                    e.event_type,
+                    ctx.client_ip,
+                    request_id=ctx.request_id or None,
+                    details=e.details,
+                    provider_id=ctx.known_provider.id
+                )
+            raise
+        except Exception:
+            _finish_stage(ctx, name, started)
+            INGEST_RESULTS.inc(INGEST_RESULT_ERROR)
+            raise
+        _finish_stage(ctx, name, started)
+    INGEST_RESULTS.inc("accepted")
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"Webhook {ctx.webhook_id} stage timings (ms): "
+            + ", ".join(f"{name}={seconds * 1000:.2f}" for name, seconds in ctx.timings.items())
+        )
@@ -0,0 +1,46 @@
+"""
+Request body intake with streaming size enforcement.
+
+Rejects oversized webhooks without buffering them: a declared
+Content-Length above the limit is refused before any body is read, and
+chunked bodies are aborted as soon as the running total passes the limit.
+"""
+from fastapi import Request
+
+
+class PayloadTooLargeError(Exception):
+    """Raised when a request body exceeds the allowed size."""
+
+    def __init__(self, size: int, max_allowed: int):
+        super().__init__(f"Payload size {size} exceeds maximum of {max_allowed} bytes")
+        self.size = size  # Declared size, or bytes received before aborting
+        self.max_allowed = max_allowed
+
+
+async def read_body_limited(request: Request, max_bytes: int) -> bytes:
+    """
+    Read the request body, enforcing max_bytes while streaming.
+
+    Args:
+        request: FastAPI request object
+        max_bytes: Maximum allowed body size in bytes
+
+    Returns:
+        The raw body bytes
+
+    Raises:
+        PayloadTooLargeError: If the body is (or is declared to be) too large
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise PayloadTooLargeError(int(content_length), max_bytes)
+
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise PayloadTooLargeError(received, max_bytes)
+        chunks.append(chunk)
+
+    return b"".join(chunks)
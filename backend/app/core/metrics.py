@@ -0,0 +1,427 @@
+"""
+Prometheus metrics.
+
+A small in-process registry of counters, histograms and callback metrics,
+rendered in the Prometheus text exposition format by GET /metrics.
+Recording a sample is a dict lookup and a few integer adds on the event
+loop. Each worker owns its registry and the event loop is single-threaded,
+so there are no locks on the hot path.
+
+With several workers (uvicorn --workers N), set METRICS_DIR to a
+directory shared by them. Every worker writes a snapshot of its registry
+there every METRICS_SNAPSHOT_INTERVAL_SECONDS (written to a temp file
+and renamed into place). The worker that serves a scrape merges all
+snapshots:
+- counters and histograms are summed;
+- gauges are summed, or maxed where marked.
+When a worker exits, or its snapshot is not refreshed for
+METRICS_STALE_SECONDS and its process is gone, its counters and
+histograms are added to archive.json in the same directory and its
+snapshot is deleted, so the merged totals never go down; its gauges are
+dropped. This mirrors the prometheus_client multiprocess mode. A lock
+file (fcntl.flock) serializes archive updates and keeps scrapes from
+reading one half-way.
+"""
+import asyncio
+import bisect
+import fcntl
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond stages up to slow forwards
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+MERGE_SUM = "sum"
+MERGE_MAX = "max"
+
+# In METRICS_DIR: totals of exited workers, and the lock guarding it
+ARCHIVE_FILE = "archive.json"
+LOCK_FILE = "metrics.lock"
+
+
+class _Metric:
+    type: str | None = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "labels": list(self.labels),
+            "samples": self._samples(),
+        }
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+    type = COUNTER
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self) -> list:
+        return [[list(key), value] for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram.
+
+    Per label set: a count per bucket (not cumulative; rendering makes
+    them cumulative), then the sum and the total count.
+    """
+    type = HISTOGRAM
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        entry = self._values.get(label_values)
+        if entry is None:
+            # One slot per bucket, one for +Inf, then sum and count
+            entry = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+    def _samples(self) -> list:
+        return [[list(key), list(entry)] for key, entry in self._values.items()]
+
+
+class CallbackGauge(_Metric):
+    """
+    Gauge read at snapshot time.
+
+    callback returns a number, or a {label values tuple: number} dict.
+    """
+    type = GAUGE
+
+    def __init__(
+        self, name: str, help: str, callback: Callable, labels: tuple = (), merge: str = MERGE_SUM
+    ):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self.merge = merge
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot["merge"] = self.merge
+        return snapshot
+
+    def _samples(self) -> list:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.error(f"Metric {self.name} callback failed: {str(e)}")
+            return []
+        if isinstance(value, dict):
+            return [[list(key), float(v)] for key, v in value.items()]
+        return [[[], float(value)]]
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter kept by a component (e.g. a stats() field), read at snapshot time."""
+    type = COUNTER
+
+    def __init__(self, name: str, help: str, callback: Callable, labels: tuple = ()):
+        super().__init__(name, help, callback, labels, MERGE_SUM)
+
+
+_MetricT = TypeVar("_MetricT", bound=_Metric)
+
+
+class MetricsRegistry:
+    """Named metrics of one worker, plus multi-worker snapshot merging."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._task: asyncio.Task | None = None
+
+    def _register(self, metric: _MetricT) -> _MetricT:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(
+        self, name: str, help: str, callback: Callable, labels: tuple = (), merge: str = MERGE_SUM
+    ) -> CallbackGauge:
+        return self._register(CallbackGauge(name, help, callback, labels, merge))
+
+    def callback_counter(
+        self, name: str, help: str, callback: Callable, labels: tuple = ()
+    ) -> CallbackCounter:
+        return self._register(CallbackCounter(name, help, callback, labels))
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    # --- Multi-worker snapshots ---------------------------------------------
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(settings.METRICS_DIR, f"worker-{os.getpid()}.json")
+
+    def write_snapshot(self) -> None:
+        """Atomically replace this worker's snapshot file."""
+        path = self._snapshot_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"time": time.time(), "metrics": self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def _other_snapshots(self):
+        """(path, snapshot file contents) of the other workers."""
+        own = os.path.basename(self._snapshot_path())
+        for name in os.listdir(settings.METRICS_DIR):
+            if not (name.startswith("worker-") and name.endswith(".json")) or name == own:
+                continue
+            path = os.path.join(settings.METRICS_DIR, name)
+            data = _load_json(path)
+            if data is not None:  # None: being replaced or removed right now
+                yield path, data
+
+    def _read_snapshots(self) -> list[dict]:
+        """Archived totals plus every live worker's metrics; this worker's are taken fresh."""
+        cutoff = time.time() - settings.METRICS_STALE_SECONDS
+        for path, data in list(self._other_snapshots()):
+            # A stale snapshot of a running (e.g. blocked) worker is still its total
+            if data["time"] < cutoff and not _process_alive(path):
+                _retire_snapshot(path)
+
+        snapshots = [self.snapshot()]
+        with _metrics_lock(fcntl.LOCK_SH):
+            archive = _load_json(os.path.join(settings.METRICS_DIR, ARCHIVE_FILE))
+            if archive is not None:
+                snapshots.append(archive)
+            snapshots.extend(data["metrics"] for _, data in self._other_snapshots())
+        return snapshots
+
+    def render(self) -> str:
+        """This worker's metrics (or every worker's, with METRICS_DIR) in text format."""
+        snapshots = self._read_snapshots() if settings.METRICS_DIR else [self.snapshot()]
+        return _render(_merge(snapshots))
+
+    def start(self) -> None:
+        """Start writing snapshots (only with METRICS_DIR)."""
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        # Left by an exited process that had our pid; ours would overwrite it
+        if os.path.exists(self._snapshot_path()):
+            _retire_snapshot(self._snapshot_path())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Hand our final counts over to the archive
+        try:
+            self.write_snapshot()
+            _retire_snapshot(self._snapshot_path())
+        except OSError as e:
+            logger.error(f"Failed to archive metrics snapshot: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.error(f"Failed to write metrics snapshot: {str(e)}")
+            await asyncio.sleep(settings.METRICS_SNAPSHOT_INTERVAL_SECONDS)
+
+
+def _load_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _process_alive(snapshot_path: str) -> bool:
+    """Whether the worker that wrote snapshot_path (worker-<pid>.json) is still running."""
+    try:
+        pid = int(os.path.basename(snapshot_path)[len("worker-"):-len(".json")])
+        os.kill(pid, 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+@contextmanager
+def _metrics_lock(mode: int):
+    """flock on LOCK_FILE: exclusive to change the archive, shared to read it with the snapshots."""
+    with open(os.path.join(settings.METRICS_DIR, LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, mode)
+        yield  # Closing the file releases the lock
+
+
+def _retire_snapshot(path: str) -> None:
+    """Add an exited worker's counters and histograms to the archive and delete its snapshot."""
+    with _metrics_lock(fcntl.LOCK_EX):
+        data = _load_json(path)
+        if data is None:
+            return  # Retired by another worker already
+        archive_path = os.path.join(settings.METRICS_DIR, ARCHIVE_FILE)
+        totals = {
+            name: metric for name, metric in data["metrics"].items()
+            if metric["type"] != GAUGE
+        }
+        archive = _merge([_load_json(archive_path) or {}, totals])
+        tmp_path = f"{archive_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_unmerge(archive), f)
+        os.replace(tmp_path, archive_path)
+        os.remove(path)
+
+
+def _merge(snapshots: list[dict]) -> dict:
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "samples": {}}
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif metric["type"] == HISTOGRAM:
+                    samples[key] = [a + b for a, b in zip(current, value)]
+                elif metric.get("merge") == MERGE_MAX:
+                    samples[key] = max(current, value)
+                else:
+                    samples[key] = current + value
+    return merged
+
+
+def _unmerge(merged: dict) -> dict:
+    """Turn _merge output back into snapshot form."""
+    return {
+        name: {
+            **metric,
+            "samples": [[list(key), value] for key, value in metric["samples"].items()],
+        }
+        for name, metric in merged.items()
+    }
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _render(merged: dict) -> str:
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        label_names = metric["labels"]
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["type"] == HISTOGRAM:
+                cumulative = 0
+                bounds = [*metric["buckets"], math.inf]
+                for bound, count in zip(bounds, value[:len(bounds)]):
+                    cumulative += count
+                    le = f'le="{_format_value(float(bound))}"'
+                    bucket_labels = _format_labels(label_names, labels, le)
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                sample_labels = _format_labels(label_names, labels)
+                lines.append(f"{name}_sum{sample_labels} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{sample_labels} {value[-1]}")
+            else:
+                lines.append(f"{name}{_format_labels(label_names, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Global registry for this worker
+metrics_registry = MetricsRegistry()
+
+# Metrics recorded on the request and forwarding paths
+INGEST_STAGE_SECONDS = metrics_registry.histogram(
+    "webhook_ingest_stage_duration_seconds",
+    "Time spent in each webhook ingest stage",
+    labels=("stage",)
+)
+INGEST_RESULTS = metrics_registry.counter(
+    "webhook_ingest_total",
+    "Webhook requests by result (accepted, the rejecting status code, or error)",
+    labels=("result",)
+)
+FORWARD_SECONDS = metrics_registry.histogram(
+    "webhook_forward_duration_seconds",
+    "Time to forward a webhook, including retries",
+    labels=("provider", "outcome")
+)
+CIRCUIT_CALL_SECONDS = metrics_registry.histogram(
+    "circuit_call_duration_seconds",
+    "Latency of calls made through a circuit breaker (Redis)",
+    labels=("circuit", "outcome")
+)
@@ -0,0 +1,56 @@
+"""
+Keyset (cursor) pagination helpers.
+
+List endpoints order by (timestamp DESC, id DESC). A cursor encodes the
+last row of a page; the next page is everything strictly after it, which
+Postgres answers from the timestamp index without scanning skipped rows
+the way OFFSET does.
+
+Cursors are opaque to clients: URL-safe base64 of "<iso timestamp>|<uuid>".
+"""
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from sqlalchemy import tuple_, Select
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Raises:
+        InvalidCursorError: If the cursor was not produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def apply_keyset(
+    stmt: Select, timestamp_column, id_column, cursor: str | None = None
+) -> Select:
+    """
+    Order stmt newest first and, given a cursor, start right after it.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(timestamp_column, id_column) < (timestamp, row_id))
+    return stmt.order_by(timestamp_column.desc(), id_column.desc())
@@ -0,0 +1,324 @@
+"""
+Partition maintenance for webhook_events and security_logs.
+
+Both tables are range-partitioned by day on their timestamp column. A
+background task (one per worker, serialized by an advisory lock) keeps
+PARTITION_PRECREATE_DAYS of future partitions in place and drops whole
+partitions once they fall out of the table's retention window, so
+retention never runs row-by-row DELETEs or leaves dead tuples to vacuum.
+
+Rows that fall outside every daily partition (e.g. maintenance has not
+run for longer than the pre-create horizon) land in <table>_default.
+Postgres refuses to create a partition while the default one holds rows
+for its range, so those rows are moved into the new partition as it is
+created. Past days found in the default partition get their partition
+the same way, or are deleted by date range once they are past retention.
+Every partition is created or dropped in its own transaction:
+one that fails (lock timeout, ...) is retried on the next run without
+holding back the others.
+
+Maintenance can also be run by hand:
+
+    python -m app.core.partitions maintain
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> name of its retention setting
+PARTITIONED_TABLES = {
+    "webhook_events": "WEBHOOK_EVENTS_RETENTION_DAYS",
+    "security_logs": "SECURITY_LOGS_RETENTION_DAYS",
+}
+
+# Partitioned table -> partition key column
+PARTITION_COLUMNS = {
+    "webhook_events": "received_at",
+    "security_logs": "created_at",
+}
+
+# Partitioned table -> column unique within each partition. A unique
+# constraint on the parent would have to include the partition key, so
+# request_id is unique per day instead (the event writer skips conflicts)
+PARTITION_UNIQUE_COLUMNS = {
+    "webhook_events": "request_id",
+}
+
+# pg_advisory_xact_lock key, so concurrent workers don't race on DDL
+PARTITION_LOCK_ID = 7_316_052
+
+# Don't let a DROP queue behind long queries and stall inserts behind it
+PARTITION_LOCK_TIMEOUT = "5s"
+
+
+def partition_name(table: str, day: date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def partition_day(table: str, name: str) -> date | None:
+    """Day covered by a daily partition, or None for anything else (e.g. the default partition)."""
+    prefix = f"{table}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def is_partition(name: str) -> bool:
+    """Whether name is a partition of one of PARTITIONED_TABLES."""
+    return any(
+        name == f"{table}_default" or partition_day(table, name) is not None
+        for table in PARTITIONED_TABLES
+    )
+
+
+async def _existing_partitions(conn, table: str) -> list[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table}
+    )
+    return [row[0] for row in result]
+
+
+async def _lock(conn) -> None:
+    """Serialize DDL across workers and bound lock waits (transaction-scoped)."""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+    await conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+
+
+async def _columns(conn, table: str) -> list[str]:
+    result = await conn.execute(
+        text(
+            "SELECT attname FROM pg_attribute "
+            "WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped "
+            "ORDER BY attnum"
+        ),
+        {"table": table}
+    )
+    return [row[0] for row in result]
+
+
+async def _create_unique_index(conn, table: str, name: str) -> None:
+    column = PARTITION_UNIQUE_COLUMNS.get(table)
+    if column is not None:
+        await conn.execute(text(f"CREATE UNIQUE INDEX {name}_{column}_key ON {name} ({column})"))
+
+
+async def _default_partition_days(conn, table: str, before: date) -> list[date]:
+    """Days before `before` that have rows in <table>_default."""
+    column = PARTITION_COLUMNS[table]
+    result = await conn.execute(text(
+        f"SELECT DISTINCT CAST({column} AS date) FROM {table}_default "
+        f"WHERE {column} < '{before.isoformat()}' ORDER BY 1"
+    ))
+    return [row[0] for row in result]
+
+
+async def create_partition(conn, table: str, day: date) -> int:
+    """
+    Create the partition of table for day.
+
+    If <table>_default already holds rows for that day, the partition is
+    built as a plain table, the rows are moved into it, and it is then
+    attached (which also creates its indexes and foreign keys).
+
+    Args:
+        conn: Connection inside a transaction
+        table: Partitioned table name
+        day: Day the partition covers
+
+    Returns:
+        Number of rows moved out of the default partition
+    """
+    name = partition_name(table, day)
+    column = PARTITION_COLUMNS[table]
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    bounds = f"FROM ('{start}') TO ('{end}')"
+    in_range = f"{column} >= '{start}' AND {column} < '{end}'"
+
+    stray = await conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {in_range})")
+    )
+    if not stray.scalar():
+        await conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        await _create_unique_index(conn, table, name)
+        return 0
+
+    columns = ", ".join(await _columns(conn, table))
+    await conn.execute(
+        text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    )
+    moved = await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE {in_range} RETURNING {columns}) "
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+    ))
+    await _create_unique_index(conn, table, name)
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return int(moved.rowcount)
+
+
+async def maintain_table(
+    table: str, retention_days: int, today: date | None = None
+) -> tuple[int, int]:
+    """
+    Create upcoming partitions of table and drop expired ones.
+
+    Past days left in the default partition get their own partition too,
+    unless they are past retention, in which case their rows are deleted.
+    Each partition is created or dropped in its own transaction; failures
+    are logged and left for the next run.
+
+    Args:
+        table: Partitioned table name
+        retention_days: Keep partitions newer than this many days (0 = keep all)
+        today: Reference day (default today, UTC)
+
+    Returns:
+        (partitions created, partitions dropped)
+    """
+    today = today or datetime.utcnow().date()
+    async with engine.connect() as conn:
+        existing = set(await _existing_partitions(conn, table))
+        stray_days: list[date] = []
+        if f"{table}_default" in existing:
+            stray_days = await _default_partition_days(conn, table, today)
+
+    # A partition is dropped once its whole day is older than the window
+    cutoff = today - timedelta(days=retention_days) if retention_days > 0 else None
+    days = [day for day in stray_days if cutoff is None or day >= cutoff]
+    days += [
+        today + timedelta(days=offset)
+        for offset in range(settings.PARTITION_PRECREATE_DAYS + 1)
+    ]
+
+    created = 0
+    for day in days:
+        name = partition_name(table, day)
+        if name in existing:
+            continue
+        try:
+            async with engine.begin() as conn:
+                await _lock(conn)
+                # Another worker may have created it since we listed
+                if name in await _existing_partitions(conn, table):
+                    continue
+                moved = await create_partition(conn, table, day)
+            created += 1
+            if moved:
+                logger.info(f"Moved {moved} rows of {table} from the default partition into {name}")
+        except Exception as e:
+            logger.error(f"Failed to create partition {name}: {str(e)}")
+
+    dropped = 0
+    if cutoff is not None:
+        if any(day < cutoff for day in stray_days):
+            column = PARTITION_COLUMNS[table]
+            try:
+                async with engine.begin() as conn:
+                    await _lock(conn)
+                    deleted = await conn.execute(text(
+                        f"DELETE FROM {table}_default WHERE {column} < '{cutoff.isoformat()}'"
+                    ))
+                logger.info(
+                    f"Deleted {deleted.rowcount} expired rows of {table} from the default partition"
+                )
+            except Exception as e:
+                logger.error(f"Failed to delete expired rows from {table}_default: {str(e)}")
+
+        for name in sorted(existing):
+            covered = partition_day(table, name)
+            if covered is None or covered >= cutoff:
+                continue
+            try:
+                async with engine.begin() as conn:
+                    await _lock(conn)
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped += 1
+            except Exception as e:
+                logger.error(f"Failed to drop partition {name}: {str(e)}")
+
+    return created, dropped
+
+
+async def maintain_partitions(today: date | None = None) -> None:
+    """Run maintain_table for every partitioned table."""
+    for table, retention_setting in PARTITIONED_TABLES.items():
+        try:
+            created, dropped = await maintain_table(
+                table, getattr(settings, retention_setting), today
+            )
+            if created or dropped:
+                logger.info(f"Partitions of {table}: {created} created, {dropped} dropped")
+        except Exception as e:
+            logger.error(f"Partition maintenance for {table} failed: {str(e)}")
+
+
+class PartitionMaintainer:
+    """Runs maintain_partitions at startup and then every PARTITION_MAINTENANCE_INTERVAL_SECONDS."""
+
+    def __init__(self, interval_seconds: float | None = None):
+        self.interval = (
+            interval_seconds if interval_seconds is not None
+            else settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS
+        )
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await maintain_partitions()
+            await asyncio.sleep(self.interval)
+
+
+# Global maintainer for this worker
+partition_maintainer = PartitionMaintainer()
+
+
+def main() -> None:
+    from app.core.config import setup_logging
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="Create upcoming partitions and drop expired ones")
+    parser.parse_args()
+
+    setup_logging()
+
+    async def run() -> None:
+        try:
+            await maintain_partitions()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Raw webhook payload handling.
+
+Lets the ingestion path keep the verified request bytes as they are: the
+JSON text is stored in the JSONB column without a Python decode/encode
+round trip and forwarded downstream byte-for-byte, so the internal
+service receives exactly what the provider signed.
+
+Only the first delivery is byte-exact. JSONB does not keep the original
+text (key order, whitespace, number formatting and duplicate keys are
+normalised), so admin retries and pending-forward sweeps send
+encode_payload() of the stored value: the same JSON document, but not
+the same bytes.
+"""
+import json
+
+try:
+    # Optional: orjson validates JSON several times faster than the stdlib
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class RawJSON(str):
+    """JSON text that is written to JSON/JSONB columns unchanged."""
+
+
+def json_serializer(value) -> str:
+    """
+    Engine-wide JSON serializer.
+
+    RawJSON values are already valid JSON text and pass straight through;
+    everything else is encoded with json.dumps as before.
+    """
+    if isinstance(value, RawJSON):
+        return value
+    return json.dumps(value)
+
+
+def validate_json(body: bytes) -> RawJSON | None:
+    """
+    Check that body is UTF-8 encoded JSON in a single parsing pass.
+
+    The parsed value is discarded; only the original text is kept.
+
+    Returns:
+        The body as RawJSON, or None if it is not valid JSON
+    """
+    try:
+        text = body.decode("utf-8")
+        _loads(body)
+    except ValueError:  # UnicodeDecodeError and JSONDecodeError both subclass it
+        return None
+    return RawJSON(text)
+
+
+def encode_payload(payload) -> bytes:
+    """
+    Encode a stored (decoded) payload for forwarding, e.g. on admin retry.
+
+    Not byte-identical to the original request body (see module docstring).
+    """
+    return json.dumps(payload).encode("utf-8")
@@ -0,0 +1,191 @@
+"""
+In-process provider registry.
+
+Caches the provider fields needed on the webhook ingestion path so that
+receive_webhook does not query Postgres on every request. Entries expire
+after PROVIDER_CACHE_TTL_SECONDS and are invalidated across all workers
+through a Redis pub/sub channel whenever an admin route changes a provider.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.circuit_breaker import redis_breaker
+from app.core.config import settings
+from app.core.security import SignatureVerifier
+from app.db.models.provider import Provider
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel used to broadcast provider changes to every worker.
+# The message body is the provider name, or "*" to flush everything.
+INVALIDATION_CHANNEL = "providers:invalidate"
+INVALIDATE_ALL = "*"
+
+
+def _header_allowlist(captured_headers: list | None) -> frozenset | None:
+    names = captured_headers if captured_headers is not None else settings.HEADER_CAPTURE_ALLOWLIST
+    return frozenset(name.lower() for name in names) if names else None
+
+
+@dataclass(frozen=True)
+class CachedProvider:
+    """
+    Immutable snapshot of the provider fields used during ingestion.
+
+    Carries a pre-keyed SignatureVerifier, so HMAC key setup happens once
+    per cache load rather than once per request.
+    """
+    id: uuid.UUID
+    name: str
+    secret_key: str
+    forwarding_url: str
+    is_active: bool
+    max_payload_size_bytes: int
+    verifier: SignatureVerifier
+    rate_limit_algorithm: str
+    rate_limit_requests: int
+    rate_limit_period_seconds: int
+    rate_limit_burst: int
+    # Lowercase header names stored with each event; None = all
+    captured_headers: frozenset | None = None
+
+    @classmethod
+    def from_model(cls, provider: Provider) -> "CachedProvider":
+        rate_limit_requests = provider.rate_limit_requests or settings.RATE_LIMIT_MAX_REQUESTS
+        return cls(
+            id=provider.id,
+            name=provider.name,
+            secret_key=provider.secret_key,
+            forwarding_url=provider.forwarding_url,
+            is_active=provider.is_active,
+            max_payload_size_bytes=(
+                provider.max_payload_size_bytes or settings.MAX_PAYLOAD_SIZE_BYTES
+            ),
+            verifier=SignatureVerifier(
+                [provider.secret_key, *provider.additional_secret_keys],
+                provider.signature_scheme
+            ),
+            rate_limit_algorithm=provider.rate_limit_algorithm or settings.RATE_LIMIT_ALGORITHM,
+            rate_limit_requests=rate_limit_requests,
+            rate_limit_period_seconds=(
+                provider.rate_limit_period_seconds or settings.RATE_LIMIT_WINDOW_SECONDS
+            ),
+            rate_limit_burst=provider.rate_limit_burst or rate_limit_requests,
+            captured_headers=_header_allowlist(provider.captured_headers),
+        )
+
+
+class ProviderRegistry:
+    """
+    TTL cache of providers keyed by name.
+
+    Unknown names are cached as well (as None) so that a flood of
+    requests for a non-existent provider does not reach the database.
+    """
+
+    def __init__(self, ttl_seconds: int | None = None):
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else settings.PROVIDER_CACHE_TTL_SECONDS
+        )
+        self._entries: dict[str, tuple[float, CachedProvider | None]] = {}
+        # Bumped on every invalidation so that a lookup that raced with an
+        # admin update does not store the stale row it read.
+        self._generation = 0
+        self._listener: asyncio.Task | None = None
+
+    async def get(self, db: AsyncSession, provider_name: str) -> CachedProvider | None:
+        """
+        Return the provider called provider_name, loading it on a miss.
+
+        Args:
+            db: Database session used only when the entry is missing or expired
+            provider_name: Provider name from the webhook URL
+
+        Returns:
+            CachedProvider, or None if no such provider exists
+        """
+        entry = self._entries.get(provider_name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        generation = self._generation
+        stmt = select(Provider).where(Provider.name == provider_name)
+        result = await db.execute(stmt)
+        provider = result.scalars().first()
+        cached = CachedProvider.from_model(provider) if provider else None
+
+        if generation == self._generation:
+            self._entries[provider_name] = (time.monotonic() + self.ttl_seconds, cached)
+        return cached
+
+    def evict(self, provider_name: str = INVALIDATE_ALL) -> None:
+        """Drop one provider (or every provider) from this worker's cache."""
+        self._generation += 1
+        if provider_name == INVALIDATE_ALL:
+            self._entries.clear()
+        else:
+            self._entries.pop(provider_name, None)
+
+    async def invalidate(self, redis_client: redis.Redis, provider_name: str) -> None:
+        """
+        Evict a provider locally and tell every other worker to do the same.
+
+        Called by the admin routes after a provider is created, updated or deleted.
+        Publishing is best effort: if Redis is unavailable the other workers
+        pick up the change when their entry expires.
+        """
+        self.evict(provider_name)
+        if redis_client is None:
+            return
+        try:
+            await redis_breaker.call(redis_client.publish(INVALIDATION_CHANNEL, provider_name))
+        except Exception as e:
+            logger.error(f"Provider invalidation publish failed: {str(e) or type(e).__name__}")
+
+    def start(self, redis_client: redis.Redis) -> None:
+        """Start listening for invalidations from other workers."""
+        self._listener = asyncio.create_task(self._listen(redis_client))
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener."""
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+    async def _listen(self, redis_client: redis.Redis) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were not subscribed is lost,
+                # so start from an empty cache after every (re)subscribe.
+                self.evict()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.evict(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Provider invalidation listener error, resubscribing: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+# Global registry instance shared by all routes in this worker
+provider_registry = ProviderRegistry()
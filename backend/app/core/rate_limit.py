@@ -1,90 +1,557 @@
 """
 Rate limiting utilities using Redis.
 
-Implements token bucket algorithm for rate limiting with atomic operations.
+Implements token bucket algorithm for rate limiting with atomic operations,
+and a combined admission check (rate limit + replay guard) in one round trip.
+
+Providers choose the algorithm (fixed window, sliding window counter or
+GCRA) and its limits; see Provider.rate_limit_*.
+
+With RATE_LIMIT_LEASE_ENABLED, each worker instead leases blocks of tokens
+from the provider's Redis bucket and spends them locally (LeasedRateLimiter),
+so the rate limit costs one Redis call per lease rather than per request.
+
+Redis calls go through the Redis circuit breaker. When a call fails, times
+out or is refused by the open breaker, admission falls back to an
+in-process rate limiter and the local replay cache instead of failing open.
 """
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, cast
+
 import redis.asyncio as redis
+from app.core.circuit_breaker import redis_breaker, CircuitOpenError
 from app.core.config import settings
+from app.core.replay_cache import replay_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Admission outcomes returned by check_admission
+ADMISSION_ALLOWED = "allowed"
+ADMISSION_RATE_LIMITED = "rate_limited"
+ADMISSION_REPLAY = "replay"
+# Degraded mode only: the local Bloom filter may have seen the request ID
+# and Redis cannot confirm, so the provider should retry later
+ADMISSION_UNVERIFIED = "unverified"
+
+# Rate limit algorithms a provider can use (Provider.rate_limit_algorithm)
+RATE_LIMIT_FIXED_WINDOW = "fixed_window"
+RATE_LIMIT_SLIDING_WINDOW = "sliding_window"
+RATE_LIMIT_GCRA = "gcra"
+RATE_LIMIT_ALGORITHMS = (RATE_LIMIT_FIXED_WINDOW, RATE_LIMIT_SLIDING_WINDOW, RATE_LIMIT_GCRA)
+
+# Each algorithm keeps O(1) state in a single Redis key. The key name
+# includes the algorithm, so switching a provider's policy starts from
+# fresh state instead of misreading another algorithm's key.
+RATE_LIMIT_KEY_PREFIXES = {
+    RATE_LIMIT_FIXED_WINDOW: "rate_limit",
+    RATE_LIMIT_SLIDING_WINDOW: "rate_limit:sliding",
+    RATE_LIMIT_GCRA: "rate_limit:gcra",
+}
+
+
+def rate_limit_key(provider_id: str, algorithm: str = RATE_LIMIT_FIXED_WINDOW) -> str:
+    return f"{RATE_LIMIT_KEY_PREFIXES[algorithm]}:{provider_id}"
+
+
+# Rate limit snippets for the admission script. Each "check" part either
+# returns {0, retry_after_seconds} or sets `remaining` (tokens left after
+# this request); the "commit" part records the request.
+
+# Fixed window: counter reset by SETEX
+_FIXED_WINDOW_CHECK = """
+local current = tonumber(redis.call('GET', rate_key) or '0')
+if current >= max_requests then
+    local ttl = redis.call('TTL', rate_key)
+    return {0, ttl > 0 and ttl or window_seconds}
+end
+local remaining = max_requests - current - 1
+"""
+_FIXED_WINDOW_COMMIT = """
+redis.call('SETEX', rate_key, window_seconds, current + 1)
+"""
+
+# Sliding window counter: the previous window's count is weighted by how
+# much of it still overlaps the sliding window. One hash: start, cur, prev.
+_SLIDING_WINDOW_CHECK = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local window_start = tonumber(clock[1]) - tonumber(clock[1]) % window_seconds
+local state = redis.call('HMGET', rate_key, 'start', 'cur', 'prev')
+local start = tonumber(state[1])
+local cur = tonumber(state[2]) or 0
+local prev = tonumber(state[3]) or 0
+if start ~= window_start then
+    if start == window_start - window_seconds then prev = cur else prev = 0 end
+    cur = 0
+end
+local elapsed = now - window_start
+local estimated = prev * (1 - elapsed / window_seconds) + cur
+if estimated + 1 > max_requests then
+    local retry_after = window_seconds - elapsed
+    if cur + 1 <= max_requests and prev > 0 then
+        retry_after = (estimated + 1 - max_requests) * window_seconds / prev
+    end
+    return {0, math.max(1, math.ceil(retry_after))}
+end
+local remaining = math.floor(max_requests - estimated - 1)
+"""
+_SLIDING_WINDOW_COMMIT = """
+redis.call('HSET', rate_key, 'start', window_start, 'cur', cur + 1, 'prev', prev)
+redis.call('EXPIRE', rate_key, window_seconds * 2)
+"""
+
+# GCRA: one key holding the theoretical arrival time (TAT) in milliseconds.
+# Requests are spaced window/max apart, with up to `burst` allowed at once.
+_GCRA_CHECK = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + tonumber(clock[2]) / 1000
+local interval = window_seconds * 1000 / max_requests
+local tolerance = interval * burst
+local tat = tonumber(redis.call('GET', rate_key) or '0')
+if tat < now then tat = now end
+local new_tat = tat + interval
+if new_tat - now > tolerance then
+    return {0, math.max(1, math.ceil((new_tat - now - tolerance) / 1000))}
+end
+local remaining = math.floor((tolerance - (new_tat - now)) / interval)
+"""
+_GCRA_COMMIT = """
+redis.call('SET', rate_key, string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+"""
+
+
+def _admission_script(check: str, commit: str) -> str:
+    # KEYS[1] = rate limit key, KEYS[2] = replay key
+    # ARGV[1] = max requests, ARGV[2] = window seconds, ARGV[3] = replay TTL seconds,
+    # ARGV[4] = burst (GCRA only)
+    #
+    # Order matters: a rate-limited request must not claim its request ID (so the
+    # provider can retry it later), and a replayed request must not consume a token.
+    return (
+        """
+local rate_key = KEYS[1]
+local replay_key = KEYS[2]
+local max_requests = tonumber(ARGV[1])
+local window_seconds = tonumber(ARGV[2])
+local replay_ttl = tonumber(ARGV[3])
+local burst = tonumber(ARGV[4])
+"""
+        + check
+        + """
+if not redis.call('SET', replay_key, 'processed', 'NX', 'EX', replay_ttl) then
+    return {2, remaining + 1}
+end
+"""
+        + commit
+        + """
+return {1, remaining}
+"""
+    )
+
+
+# Lua scripts for the combined admission check, one per algorithm
+ADMISSION_SCRIPTS = {
+    RATE_LIMIT_FIXED_WINDOW: _admission_script(_FIXED_WINDOW_CHECK, _FIXED_WINDOW_COMMIT),
+    RATE_LIMIT_SLIDING_WINDOW: _admission_script(_SLIDING_WINDOW_CHECK, _SLIDING_WINDOW_COMMIT),
+    RATE_LIMIT_GCRA: _admission_script(_GCRA_CHECK, _GCRA_COMMIT),
+}
+ADMISSION_SCRIPT = ADMISSION_SCRIPTS[RATE_LIMIT_FIXED_WINDOW]
+
+
+# Lua script that leases a block of tokens from a provider's window.
+# KEYS[1] = rate limit key
+# ARGV[1] = max requests, ARGV[2] = window seconds, ARGV[3] = tokens wanted
+# Returns {granted, remaining window in ms}; granted is 0 when the window is used up.
+LEASE_SCRIPT = """
+local key = KEYS[1]
+local max_requests = tonumber(ARGV[1])
+local window_seconds = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+
+local current = tonumber(redis.call('GET', key) or '0')
+-- Milliseconds: TTL rounds down to 0 in the last second of a window
+local pttl = redis.call('PTTL', key)
+
+if pttl <= 0 then
+    -- No key, no expiry, or expiring right now: start a new window
+    current = 0
+    pttl = window_seconds * 1000
+end
+
+local granted = math.min(wanted, max_requests - current)
+if granted <= 0 then
+    return {0, pttl}
+end
+
+if current == 0 then
+    redis.call('SET', key, granted, 'PX', pttl)
+else
+    redis.call('INCRBY', key, granted)
+end
+
+return {granted, pttl}
+"""
+
+
+class LocalRateLimiter:
+    """
+    Per-worker fixed window limiter used while Redis is unavailable.
+
+    Each worker enforces RATE_LIMIT_DEGRADED_SHARE of the provider's limit;
+    set it to 1 / number of workers to keep the global limit while degraded.
+    """
+
+    def __init__(self, share: float | None = None):
+        self.share = share if share is not None else settings.RATE_LIMIT_DEGRADED_SHARE
+        # rate limit key -> [monotonic window end, requests counted]
+        self._windows: dict[str, list] = {}
+
+    def acquire(self, key: str, max_requests: int, window_seconds: int) -> tuple[bool, dict]:
+        limit = max(1, int(max_requests * self.share))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or window[0] <= now:
+            window = self._windows[key] = [now + window_seconds, 0]
+
+        if window[1] >= limit:
+            return False, {
+                "remaining_requests": 0,
+                "reset_at": max(1, math.ceil(window[0] - now)),
+                "limit": max_requests
+            }
+
+        window[1] += 1
+        return True, {
+            "remaining_requests": limit - window[1],
+            "reset_at": window_seconds,
+            "limit": max_requests
+        }
+
+
+# Global fallback limiter shared by all routes in this worker
+local_rate_limiter = LocalRateLimiter()
+
+
+class _Lease:
+    """Tokens one worker holds for one provider."""
+
+    def __init__(self):
+        # [tokens, monotonic expiry] per grant, oldest first. Tokens are only
+        # spent before the window they were taken from ends, so a worker
+        # never carries tokens over into the next window.
+        self.grants: deque[list] = deque()
+        self.exhausted_until = 0.0
+        self.refill: asyncio.Task | None = None
+
+    def available(self, now: float) -> int:
+        while self.grants and self.grants[0][1] <= now:
+            self.grants.popleft()
+        return sum(grant[0] for grant in self.grants)
+
+    def take(self, now: float) -> bool:
+        if self.available(now) == 0:
+            return False
+        grant = self.grants[0]
+        grant[0] -= 1
+        if grant[0] == 0:
+            self.grants.popleft()
+        return True
+
+
+class LeasedRateLimiter:
+    """
+    Per-worker token leases on top of the shared Redis rate limit key.
+
+    The Redis counter records tokens handed out, not requests served, so
+    the global limit is never exceeded. The error is on the other side:
+    tokens a worker leased but did not spend before the window ended are
+    lost, so each worker can under-admit by at most one lease per window.
+    The lease size is capped at RATE_LIMIT_LEASE_MAX_ERROR of the limit to
+    keep that bound small for low-limit providers.
+    """
+
+    def __init__(self, lease_size: int | None = None, max_error: float | None = None):
+        self.lease_size = lease_size or settings.RATE_LIMIT_LEASE_SIZE
+        self.max_error = (
+            max_error if max_error is not None else settings.RATE_LIMIT_LEASE_MAX_ERROR
+        )
+        self._leases: dict[str, _Lease] = {}
+        self.redis_calls = 0
+
+    def lease_size_for(self, max_requests: int) -> int:
+        return max(1, min(self.lease_size, int(max_requests * self.max_error)))
+
+    async def acquire(
+        self,
+        redis_client: redis.Redis,
+        provider_id: str,
+        max_requests: int | None = None,
+        window_seconds: int | None = None
+    ) -> tuple[bool, dict]:
+        """
+        Spend one token from this worker's lease, leasing more when needed.
+
+        Refills start in the background once a lease drops to a quarter of
+        its size, so most requests never wait on Redis.
+
+        Returns:
+            Tuple of (allowed: bool, info: dict);
+            info has remaining_requests, reset_at, limit
+        """
+        if max_requests is None:
+            max_requests = settings.RATE_LIMIT_MAX_REQUESTS
+        if window_seconds is None:
+            window_seconds = settings.RATE_LIMIT_WINDOW_SECONDS
+
+        key = rate_limit_key(provider_id)
+        lease = self._leases.setdefault(key, _Lease())
+        size = self.lease_size_for(max_requests)
+        now = time.monotonic()
+
+        # Concurrent requests may drain a fresh lease before this one gets a
+        # token, so keep leasing until a token is taken or the window is used up
+        while not lease.take(now):
+            if lease.exhausted_until > now:
+                return False, {
+                    "remaining_requests": 0,
+                    "reset_at": max(1, math.ceil(lease.exhausted_until - now)),
+                    "limit": max_requests
+                }
+            if not await self._wait_refill(
+                redis_client, key, lease, max_requests, window_seconds, size
+            ):
+                # Redis unavailable: enforce the limit in-process instead
+                return local_rate_limiter.acquire(key, max_requests, window_seconds)
+            now = time.monotonic()
+
+        remaining = lease.available(now)
+        if remaining <= size // 4 and lease.refill is None:
+            lease.refill = asyncio.create_task(
+                self._refill(redis_client, key, lease, max_requests, window_seconds, size)
+            )
+
+        return True, {
+            "remaining_requests": remaining,
+            "reset_at": window_seconds,
+            "limit": max_requests
+        }
 
+    def release(self, provider_id: str) -> None:
+        """Give back a token taken by acquire() for a request that was not admitted."""
+        lease = self._leases.get(rate_limit_key(provider_id))
+        if lease is not None and lease.grants:
+            lease.grants[0][0] += 1
 
-async def check_rate_limit(
+    async def _wait_refill(
+        self, redis_client, key, lease, max_requests, window_seconds, size
+    ) -> bool:
+        if lease.refill is None:
+            lease.refill = asyncio.create_task(
+                self._refill(redis_client, key, lease, max_requests, window_seconds, size)
+            )
+        # Shielded: one cancelled request must not cancel a refill others wait on
+        return await asyncio.shield(lease.refill)
+
+    async def _refill(self, redis_client, key, lease, max_requests, window_seconds, size) -> bool:
+        try:
+            self.redis_calls += 1
+            granted, ttl_ms = await redis_breaker.call(redis_client.eval(
+                LEASE_SCRIPT,
+                1,
+                key,
+                max_requests,
+                window_seconds,
+                size
+            ))
+        except Exception as e:
+            logger.error(f"Rate limit lease failed: {str(e)}")
+            return False
+        finally:
+            lease.refill = None
+
+        # Both bounded by the key's real remaining TTL
+        expires = time.monotonic() + int(ttl_ms) / 1000
+        if granted > 0:
+            lease.grants.append([int(granted), expires])
+        else:
+            # Window used up by all workers: don't ask again until it resets
+            lease.exhausted_until = expires
+        return True
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "providers": len(self._leases),
+            "tokens_held": sum(lease.available(now) for lease in self._leases.values()),
+            "redis_calls": self.redis_calls,
+        }
+
+
+# Global limiter shared by all routes in this worker (used in lease mode)
+leased_rate_limiter = LeasedRateLimiter()
+
+
+def _eval_script(
+    redis_client: redis.Redis, script: str, keys: list[str], args: list[int]
+) -> Awaitable[Any]:
+    """
+    EVAL script with keys and args.
+
+    redis-py's type hints cover sync and async clients at once and type
+    each of eval()'s *keys_and_args as a list, so the call is typed here.
+    """
+    keys_and_args: list[Any] = [*keys, *args]
+    return cast(Awaitable[Any], redis_client.eval(script, len(keys), *keys_and_args))
+
+
+async def check_admission(
     redis_client: redis.Redis,
     provider_id: str,
-    max_requests: int = None,
-    window_seconds: int = None
-) -> tuple[bool, dict]:
+    replay_key: str,
+    max_requests: int | None = None,
+    window_seconds: int | None = None,
+    replay_ttl_seconds: int | None = None,
+    algorithm: str | None = None,
+    burst: int | None = None
+) -> tuple[str, dict]:
     """
-    Check if a provider has exceeded rate limit using atomic Redis operations.
-    
-    Uses token bucket algorithm with Lua script for atomicity:
-    - Each provider gets max_requests tokens per window_seconds
-    - Each request consumes 1 token
-    - Tokens refill after window expires
-    
+    Run the rate limit check and the replay guard in a single Redis round trip.
+
+    The replay key is claimed with SET NX semantics inside the same script,
+    so two concurrent deliveries of the same request ID cannot both be admitted.
+    In lease mode the token comes from the worker's local lease and only
+    the SET NX goes to Redis (fixed window providers only).
+
     Args:
         redis_client: Redis connection
         provider_id: Provider UUID
+        replay_key: Key identifying this delivery (provider + request ID)
         max_requests: Max requests allowed (default from settings)
         window_seconds: Time window in seconds (default from settings)
-    
+        replay_ttl_seconds: How long the request ID is remembered (default from settings)
+        algorithm: One of RATE_LIMIT_ALGORITHMS (default from settings)
+        burst: Requests GCRA allows back to back (default: max_requests)
+
     Returns:
-        Tuple of (allowed: bool, info: dict)
+        Tuple of (outcome: str, info: dict)
+        outcome is one of ADMISSION_ALLOWED, ADMISSION_RATE_LIMITED, ADMISSION_REPLAY,
+        or ADMISSION_UNVERIFIED (degraded mode only)
         info contains: remaining_requests, reset_at, limit
     """
     if max_requests is None:
         max_requests = settings.RATE_LIMIT_MAX_REQUESTS
     if window_seconds is None:
         window_seconds = settings.RATE_LIMIT_WINDOW_SECONDS
-    
-    # Create rate limit key
-    rate_limit_key = f"rate_limit:{provider_id}"
-    
-    # Lua script for atomic rate limit check and increment
-    # This prevents race conditions between check and set
-    lua_script = """
-    local key = KEYS[1]
-    local max_requests = tonumber(ARGV[1])
-    local window_seconds = tonumber(ARGV[2])
-    
-    local current = redis.call('GET', key)
-    local current_count = current and tonumber(current) or 0
-    
-    if current_count >= max_requests then
-        local ttl = redis.call('TTL', key)
-        return {0, ttl > 0 and ttl or window_seconds}
-    end
-    
-    local new_count = current_count + 1
-    redis.call('SETEX', key, window_seconds, new_count)
-    
-    return {1, max_requests - new_count}
-    """
-    
-    try:
-        result = await redis_client.eval(
-            lua_script,
-            1,
-            rate_limit_key,
+    if replay_ttl_seconds is None:
+        replay_ttl_seconds = settings.REPLAY_PROTECTION_WINDOW_SECONDS
+    if algorithm is None:
+        algorithm = settings.RATE_LIMIT_ALGORITHM
+    if burst is None:
+        burst = max_requests
+
+    if settings.RATE_LIMIT_LEASE_ENABLED and algorithm == RATE_LIMIT_FIXED_WINDOW:
+        return await _check_admission_leased(
+            redis_client,
+            provider_id,
+            replay_key,
             max_requests,
-            window_seconds
+            window_seconds,
+            replay_ttl_seconds
         )
-        
-        allowed = result[0] == 1
-        remaining = result[1] if allowed else 0
-        reset_at = result[1] if not allowed else window_seconds
-        
-        return allowed, {
-            "remaining_requests": remaining,
-            "reset_at": reset_at,
-            "limit": max_requests
-        }
+
+    try:
+        result = await redis_breaker.call(_eval_script(
+            redis_client,
+            ADMISSION_SCRIPTS[algorithm],
+            [rate_limit_key(provider_id, algorithm), replay_key],
+            [max_requests, window_seconds, replay_ttl_seconds, burst]
+        ))
     except Exception as e:
-        # If Redis fails, allow request but log error
-        # This prevents Redis outage from blocking webhooks
-        import logging
-        logging.error(f"Rate limit check failed: {str(e)}")
-        return True, {
-            "remaining_requests": max_requests,
-            "reset_at": window_seconds,
+        # A Redis outage must not block webhooks, but must not lift the limits either
+        _log_redis_failure("Admission check", e)
+        return _check_admission_local(provider_id, replay_key, max_requests, window_seconds)
+
+    code = result[0]
+    if code == 0:
+        return ADMISSION_RATE_LIMITED, {
+            "remaining_requests": 0,
+            "reset_at": result[1],
             "limit": max_requests
         }
+
+    return ADMISSION_ALLOWED if code == 1 else ADMISSION_REPLAY, {
+        "remaining_requests": result[1],
+        "reset_at": window_seconds,
+        "limit": max_requests
+    }
+
+
+async def _check_admission_leased(
+    redis_client: redis.Redis,
+    provider_id: str,
+    replay_key: str,
+    max_requests: int,
+    window_seconds: int,
+    replay_ttl_seconds: int
+) -> tuple[str, dict]:
+    allowed, info = await leased_rate_limiter.acquire(
+        redis_client,
+        provider_id,
+        max_requests,
+        window_seconds
+    )
+    # A rate-limited request must not claim its request ID
+    if not allowed:
+        return ADMISSION_RATE_LIMITED, info
+
+    try:
+        claimed = await redis_breaker.call(
+            redis_client.set(replay_key, "processed", nx=True, ex=replay_ttl_seconds)
+        )
+    except Exception as e:
+        _log_redis_failure("Replay check", e)
+        return _check_replay_local(replay_key), info
+
+    if not claimed:
+        # ...and a replayed request must not consume a token
+        leased_rate_limiter.release(provider_id)
+        return ADMISSION_REPLAY, info
+
+    return ADMISSION_ALLOWED, info
+
+
+def _check_admission_local(
+    provider_id: str,
+    replay_key: str,
+    max_requests: int,
+    window_seconds: int
+) -> tuple[str, dict]:
+    """Degraded admission: in-process rate limit and replay cache only."""
+    allowed, info = local_rate_limiter.acquire(
+        rate_limit_key(provider_id), max_requests, window_seconds
+    )
+    if not allowed:
+        return ADMISSION_RATE_LIMITED, info
+    return _check_replay_local(replay_key), info
+
+
+def _check_replay_local(replay_key: str) -> str:
+    # Certain duplicates (local LRU hits) were already rejected by the caller.
+    # A Bloom hit cannot be confirmed without Redis; rejecting it as a replay
+    # would make the provider drop a possibly new webhook, so ask for a retry.
+    if replay_cache.bloom_contains(replay_key):
+        return ADMISSION_UNVERIFIED
+    return ADMISSION_ALLOWED
+
+
+def _log_redis_failure(operation: str, error: Exception) -> None:
+    # The open breaker rejects every call; don't log each one as an error
+    if isinstance(error, CircuitOpenError):
+        logger.debug(f"{operation} skipped, Redis circuit open")
+    else:
+        logger.error(f"{operation} failed: {str(error) or type(error).__name__}")
@@ -0,0 +1,204 @@
+"""
+Per-process replay-protection front cache.
+
+Sits in front of the Redis replay guard (the webhook:{provider}:{request_id}
+keys claimed by check_admission). Redis stays the authoritative store; this
+cache only remembers deliveries this worker has already admitted, so that a
+provider retrying the same request ID a few seconds later is rejected
+without a Redis round trip.
+
+Two structures are kept:
+- a bounded LRU of recently admitted replay keys. A hit is a certain
+  duplicate and is rejected locally.
+- an optional time-bucketed Bloom filter covering the whole replay window.
+  It can report false positives, so a Bloom hit is never rejected on its
+  own: it is confirmed against Redis and counted as a false positive if
+  Redis disagrees.
+
+While Redis is unavailable (see app.core.circuit_breaker) this cache is
+the only replay guard this worker has.
+"""
+import hashlib
+import math
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+# Results of ReplayCache.check
+REPLAY_MISS = "miss"
+REPLAY_SEEN = "seen"          # LRU hit: definitely a duplicate
+REPLAY_SUSPECT = "suspect"    # Bloom hit only: ask Redis
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over str keys."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        # Standard sizing: m = -n ln p / (ln 2)^2, k = (m / n) ln 2
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class TimeBucketedBloomFilter:
+    """
+    Two Bloom filters that rotate every window_seconds.
+
+    Keys are added to the current filter and looked up in both, so a key is
+    remembered for at least window_seconds (and at most twice that) while
+    memory stays bounded.
+    """
+
+    def __init__(self, window_seconds: int, capacity: int, error_rate: float):
+        self.window_seconds = window_seconds
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotate_at = time.monotonic() + window_seconds
+
+    def _maybe_rotate(self) -> None:
+        now = time.monotonic()
+        if now < self._rotate_at:
+            return
+        if now >= self._rotate_at + self.window_seconds:
+            # Idle for more than a full window: both buckets are stale
+            self._previous = BloomFilter(self._capacity, self._error_rate)
+        else:
+            self._previous = self._current
+        self._current = BloomFilter(self._capacity, self._error_rate)
+        self._rotate_at = now + self.window_seconds
+
+    def add(self, key: str) -> None:
+        self._maybe_rotate()
+        self._current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        self._maybe_rotate()
+        return key in self._current or key in self._previous
+
+
+class ReplayCache:
+    """
+    Bounded LRU (+ optional Bloom filter) of replay keys admitted by this worker.
+
+    Counters:
+        lookups: keys checked
+        lru_hits: duplicates rejected without Redis
+        bloom_hits: Bloom hits that Redis confirmed as duplicates
+        bloom_false_positives: Bloom hits that Redis admitted
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: int | None = None,
+        bloom_enabled: bool | None = None,
+        bloom_capacity: int | None = None,
+        bloom_error_rate: float | None = None
+    ):
+        self.max_entries = (
+            max_entries if max_entries is not None else settings.REPLAY_CACHE_MAX_ENTRIES
+        )
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else settings.REPLAY_PROTECTION_WINDOW_SECONDS
+        )
+        if bloom_enabled is None:
+            bloom_enabled = settings.REPLAY_BLOOM_ENABLED
+
+        # replay key -> monotonic expiry, oldest first
+        self._recent: OrderedDict[str, float] = OrderedDict()
+        self._bloom: TimeBucketedBloomFilter | None = None
+        if bloom_enabled:
+            self._bloom = TimeBucketedBloomFilter(
+                self.ttl_seconds,
+                bloom_capacity or settings.REPLAY_BLOOM_CAPACITY,
+                bloom_error_rate or settings.REPLAY_BLOOM_ERROR_RATE
+            )
+
+        self.lookups = 0
+        self.lru_hits = 0
+        self.bloom_hits = 0
+        self.bloom_false_positives = 0
+
+    @property
+    def bloom_enabled(self) -> bool:
+        return self._bloom is not None
+
+    def check(self, replay_key: str) -> str:
+        """
+        Look a replay key up locally.
+
+        Returns:
+            REPLAY_SEEN if this worker admitted the key within the replay window,
+            REPLAY_SUSPECT if only the Bloom filter matched, else REPLAY_MISS
+        """
+        self.lookups += 1
+
+        expires_at = self._recent.get(replay_key)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                self._recent.move_to_end(replay_key)
+                self.lru_hits += 1
+                return REPLAY_SEEN
+            del self._recent[replay_key]
+
+        if self._bloom is not None and replay_key in self._bloom:
+            return REPLAY_SUSPECT
+        return REPLAY_MISS
+
+    def bloom_contains(self, replay_key: str) -> bool:
+        """Bloom-only lookup (not counted); used while Redis is unavailable."""
+        return self._bloom is not None and replay_key in self._bloom
+
+    def add(self, replay_key: str) -> None:
+        """Remember a replay key once admission has accepted it."""
+        self._recent[replay_key] = time.monotonic() + self.ttl_seconds
+        self._recent.move_to_end(replay_key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+        if self._bloom is not None:
+            self._bloom.add(replay_key)
+
+    def record_suspect_result(self, was_replay: bool) -> None:
+        """Record what Redis said about a REPLAY_SUSPECT key."""
+        if was_replay:
+            self.bloom_hits += 1
+        else:
+            self.bloom_false_positives += 1
+
+    def stats(self) -> dict:
+        lookups = self.lookups or 1
+        suspects = (self.bloom_hits + self.bloom_false_positives) or 1
+        return {
+            "entries": len(self._recent),
+            "capacity": self.max_entries,
+            "lookups": self.lookups,
+            "lru_hits": self.lru_hits,
+            "lru_hit_rate": round(self.lru_hits / lookups, 4),
+            "bloom_enabled": self.bloom_enabled,
+            "bloom_hits": self.bloom_hits,
+            "bloom_false_positives": self.bloom_false_positives,
+            "bloom_false_positive_rate": round(self.bloom_false_positives / suspects, 4),
+        }
+
+
+# Global cache shared by all routes in this worker
+replay_cache = ReplayCache()
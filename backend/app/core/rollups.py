@@ -0,0 +1,295 @@
+"""
+Per-minute metric rollups.
+
+The ingest pipeline, the forwarding workers and the security event sink
+call rollup_accumulator.record(); counts are summed in memory per
+(minute, provider, outcome) and merged into metric_rollups with an UPSERT
+every ROLLUP_FLUSH_INTERVAL_SECONDS, so the hot path never waits on the
+database. Callers pass the id of a resolved provider, never a name taken
+from the request, so the number of keys stays bounded.
+
+Webhook outcomes are counted per webhook, like the raw table: received
+once in the minute it arrived, and forwarded_ok / forwarded_failed once
+for its latest forwarding result, in the minute of forwarded_at. A retry
+of a webhook that already has a result takes that result back
+(retract_forward_result) before the new one is recorded, so the live
+counts and a backfill agree.
+
+Rollups for data that predates them (or after an outage) can be rebuilt
+from the raw tables:
+
+    python -m app.core.rollups backfill --since 2026-10-01T00:00:00
+"""
+import argparse
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import String, select, delete, func, literal, literal_column, and_
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.models.metric_rollup import MetricRollup
+from app.db.models.provider import Provider
+from app.db.models.security_log import SecurityLog
+from app.db.models.webhook_event import WebhookEvent
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Webhook outcomes (security outcomes use the event type as-is)
+OUTCOME_RECEIVED = "received"
+OUTCOME_FORWARDED_OK = "forwarded_ok"
+OUTCOME_FORWARDED_FAILED = "forwarded_failed"
+WEBHOOK_OUTCOMES = (OUTCOME_RECEIVED, OUTCOME_FORWARDED_OK, OUTCOME_FORWARDED_FAILED)
+
+
+def _minute(at: datetime) -> datetime:
+    return at.replace(second=0, microsecond=0)
+
+
+class RollupAccumulator:
+    """
+    In-memory per-minute counters, flushed to metric_rollups in the background.
+
+    Flushes add to the stored counts (count = count + EXCLUDED.count), so
+    every worker can flush its own share of the same bucket.
+    """
+
+    def __init__(self, flush_interval_seconds: float | None = None):
+        self.flush_interval = (
+            flush_interval_seconds if flush_interval_seconds is not None
+            else settings.ROLLUP_FLUSH_INTERVAL_SECONDS
+        )
+        # (bucket, provider_id, outcome) -> [count, latency_sum]
+        self._pending: dict[tuple[datetime, uuid.UUID, str], list] = {}
+        self._task: asyncio.Task | None = None
+        # Rows kept in memory across failed flushes before counts are dropped
+        self.max_pending = settings.ROLLUP_MAX_PENDING_ROWS
+        # Rollup rows dropped because the database stayed unavailable
+        self.failed = 0
+
+    def record(
+        self,
+        provider_id: uuid.UUID,
+        outcome: str,
+        latency: float = 0.0,
+        at: datetime | None = None,
+        count: int = 1
+    ) -> None:
+        """
+        Count one event. Never blocks.
+
+        Args:
+            provider_id: ID of an existing provider
+            outcome: OUTCOME_* constant or a security event type
+            latency: Seconds to add to the bucket's latency sum
+            at: When the event happened (default now, UTC)
+            count: Events to add (negative to take a count back)
+        """
+        if not self._add((_minute(at or datetime.utcnow()), provider_id, outcome), count, latency):
+            self.failed += 1
+
+    def retract_forward_result(
+        self, provider_id: uuid.UUID, forwarded: bool, received_at: datetime, forwarded_at: datetime
+    ) -> None:
+        """Take back a webhook's recorded forwarding result before it is forwarded again."""
+        self.record(
+            provider_id,
+            OUTCOME_FORWARDED_OK if forwarded else OUTCOME_FORWARDED_FAILED,
+            latency=-(forwarded_at - received_at).total_seconds(),
+            at=forwarded_at,
+            count=-1
+        )
+
+    def _add(self, key: tuple[datetime, uuid.UUID, str], count: int, latency: float) -> bool:
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry[0] += count
+            entry[1] += latency
+        elif len(self._pending) < self.max_pending:
+            self._pending[key] = [count, latency]
+        else:
+            return False
+        return True
+
+    def start(self) -> None:
+        """Start the periodic flush task."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Merge the pending counters into metric_rollups."""
+        if not self._pending:
+            return
+        # Swap before awaiting so records made during the flush are kept
+        pending, self._pending = self._pending, {}
+        rows = [
+            {
+                "bucket": bucket,
+                "provider_id": provider_id,
+                "outcome": outcome,
+                "count": count,
+                "latency_sum": latency_sum,
+            }
+            for (bucket, provider_id, outcome), (count, latency_sum) in pending.items()
+        ]
+        stmt = insert(MetricRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MetricRollup.bucket, MetricRollup.provider_id, MetricRollup.outcome],
+            set_={
+                "count": MetricRollup.count + stmt.excluded.count,
+                "latency_sum": MetricRollup.latency_sum + stmt.excluded.latency_sum,
+            }
+        )
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(stmt, rows)
+        except Exception as e:
+            # Merge back into what was recorded meanwhile and try again on
+            # the next flush; past max_pending rows the counts are dropped
+            dropped = 0
+            for key, (count, latency_sum) in pending.items():
+                if not self._add(key, count, latency_sum):
+                    dropped += 1
+            self.failed += dropped
+            logger.error(
+                f"Failed to flush {len(rows)} metric rollups ({dropped} dropped): {str(e)}"
+            )
+
+
+# Global accumulator shared by all routes in this worker
+rollup_accumulator = RollupAccumulator()
+
+
+async def backfill(since: datetime | None = None, until: datetime | None = None) -> None:
+    """
+    Rebuild metric_rollups from webhook_events and security_logs.
+
+    Rollups in [since, until) are deleted and rebuilt from the raw rows in
+    one transaction, so running it twice gives the same result and buckets
+    with no raw rows left (e.g. after a partition was dropped) are cleared
+    too. Run it for ranges the live accumulator has not written (before
+    rollups were deployed, or after an outage); a bucket that is still
+    receiving live counts would end up with the raw count plus whatever
+    was not yet flushed.
+
+    Args:
+        since: First minute to rebuild (default: everything)
+        until: End of the range, exclusive (default: now)
+    """
+    since = _minute(since) if since else None
+    until = _minute(until or datetime.utcnow())
+
+    def in_range(column):
+        conditions = [column < until]
+        if since is not None:
+            conditions.append(column >= since)
+        return and_(*conditions)
+
+    # Inline 'minute' so the SELECT and GROUP BY expressions match exactly
+    minute = literal_column("'minute'", String())
+    latency = func.extract("epoch", WebhookEvent.forwarded_at - WebhookEvent.received_at)
+    received_bucket = func.date_trunc(minute, WebhookEvent.received_at)
+    forwarded_bucket = func.date_trunc(minute, WebhookEvent.forwarded_at)
+    security_bucket = func.date_trunc(minute, SecurityLog.created_at)
+
+    queries = [
+        select(
+            received_bucket, WebhookEvent.provider_id, literal(OUTCOME_RECEIVED),
+            func.count(), literal(0.0)
+        ).where(in_range(WebhookEvent.received_at))
+        .group_by(received_bucket, WebhookEvent.provider_id),
+
+        # Same unit as the live counts: one result per webhook, in the
+        # minute of forwarded_at (forwarded, or not forwarded with
+        # forwarded_at set); pending rows have no forwarded_at
+        select(
+            forwarded_bucket, WebhookEvent.provider_id, literal(OUTCOME_FORWARDED_OK),
+            func.count(), func.sum(latency)
+        ).where(WebhookEvent.forwarded.is_(True), in_range(WebhookEvent.forwarded_at))
+        .group_by(forwarded_bucket, WebhookEvent.provider_id),
+
+        select(
+            forwarded_bucket, WebhookEvent.provider_id, literal(OUTCOME_FORWARDED_FAILED),
+            func.count(), func.sum(latency)
+        ).where(WebhookEvent.forwarded.is_(False), in_range(WebhookEvent.forwarded_at))
+        .group_by(forwarded_bucket, WebhookEvent.provider_id),
+
+        # security_logs keeps the name; only names of existing providers count
+        select(
+            security_bucket, Provider.id, SecurityLog.event_type, func.count(), literal(0.0)
+        ).join(Provider, Provider.name == SecurityLog.provider_name)
+        .where(in_range(SecurityLog.created_at))
+        .group_by(security_bucket, Provider.id, SecurityLog.event_type),
+    ]
+
+    columns = ["bucket", "provider_id", "outcome", "count", "latency_sum"]
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            delete(MetricRollup).where(in_range(MetricRollup.bucket))
+        )
+        logger.info(f"Cleared {result.rowcount} rollup rows")
+        for query in queries:
+            stmt = insert(MetricRollup).from_select(columns, query)
+            # Adds to anything a live flush wrote since the delete
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    MetricRollup.bucket, MetricRollup.provider_id, MetricRollup.outcome
+                ],
+                set_={
+                    "count": MetricRollup.count + stmt.excluded.count,
+                    "latency_sum": MetricRollup.latency_sum + stmt.excluded.latency_sum,
+                }
+            )
+            result = await conn.execute(stmt)
+            logger.info(f"Backfilled {result.rowcount} rollup rows")
+
+
+def main() -> None:
+    from app.core.config import setup_logging
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = commands.add_parser("backfill", help="Rebuild rollups from the raw tables")
+    backfill_parser.add_argument(
+        "--since", type=datetime.fromisoformat, help="ISO 8601 start (UTC)"
+    )
+    backfill_parser.add_argument(
+        "--until", type=datetime.fromisoformat, help="ISO 8601 end, exclusive (UTC)"
+    )
+    backfill_parser.add_argument("--days", type=int, help="Shortcut for --since <now - days>")
+    args = parser.parse_args()
+
+    setup_logging()
+    since = args.since
+    if since is None and args.days:
+        since = datetime.utcnow() - timedelta(days=args.days)
+
+    async def run() -> None:
+        try:
+            await backfill(since, args.until)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
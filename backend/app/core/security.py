@@ -1,38 +1,169 @@
 """
 Security utilities for webhook verification.
 
-Includes HMAC signature verification and constant-time comparison.
+Includes pre-keyed HMAC signature verification with constant-time comparison.
+Large payloads can be hashed on a thread pool instead of the event loop.
 """
+import asyncio
+import base64
 import hmac
 import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 
+from app.core.config import settings
 
-def verify_hmac_signature(
-    payload: bytes,
-    secret_key: str,
-    received_signature: str
-) -> bool:
+
+# Supported signature schemes:
+# - sha256-hex / sha512-hex: hex digest of HMAC(body)
+# - sha256-base64 / sha512-base64: base64 digest of HMAC(body)
+# - timestamped-sha256: Stripe-style header "t=<unix>,v1=<hex>[,v1=<hex>...]"
+#   where the signed string is "<unix>.<body>"; t must be within
+#   REPLAY_PROTECTION_WINDOW_SECONDS of now
+SIGNATURE_SCHEMES = (
+    "sha256-hex",
+    "sha512-hex",
+    "sha256-base64",
+    "sha512-base64",
+    "timestamped-sha256",
+)
+DEFAULT_SIGNATURE_SCHEME = "sha256-hex"
+
+# Thread pool for hashing large payloads off the event loop. OpenSSL-backed
+# HMAC releases the GIL while hashing large buffers, so these threads run
+# on other cores while the loop keeps serving small webhooks.
+_hash_executor: ThreadPoolExecutor | None = None
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.HMAC_OFFLOAD_WORKERS,
+            thread_name_prefix="hmac"
+        )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    """Stop the hashing thread pool (called on application shutdown)."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+
+class SignatureVerifier:
     """
-    Verify HMAC SHA256 signature using constant-time comparison.
-    
-    Args:
-        payload: The webhook payload (raw bytes)
-        secret_key: The shared secret key from the provider
-        received_signature: The signature from the webhook header
-    
-    Returns:
-        True if signature is valid, False otherwise
-    
-    Why constant-time comparison?
-    - Prevents timing attacks where attackers measure response time
-    - hmac.compare_digest() always takes the same time regardless of match
+    Pre-keyed HMAC verifier for one provider.
+
+    The HMAC key schedule is computed once per secret when the verifier is
+    built; each verification only copies that state and feeds it the body.
+    Several secrets can be active at once so a provider can rotate keys
+    without rejecting webhooks signed with the previous one.
     """
-    # Calculate expected signature
-    expected_signature = hmac.new(
-        secret_key.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
-    
-    # Use constant-time comparison (safe against timing attacks)
-    return hmac.compare_digest(received_signature, expected_signature)
+
+    def __init__(self, secret_keys: list[str], scheme: str = DEFAULT_SIGNATURE_SCHEME):
+        if scheme not in SIGNATURE_SCHEMES:
+            raise ValueError(f"Unknown signature scheme '{scheme}'")
+
+        self.scheme = scheme
+        self._timestamped = scheme == "timestamped-sha256"
+        self._base64 = scheme.endswith("-base64")
+        digestmod = hashlib.sha512 if scheme.startswith("sha512") else hashlib.sha256
+        self._keyed = [
+            hmac.new(secret_key.encode(), digestmod=digestmod)
+            for secret_key in secret_keys
+        ]
+
+    def verify(self, payload: bytes, received_signature: str) -> bool:
+        """
+        Check received_signature against every active secret.
+
+        Args:
+            payload: The webhook payload (raw bytes)
+            received_signature: The signature header value
+
+        Returns:
+            True if any active secret produces a matching signature (and,
+            for timestamped-sha256, the signed timestamp is fresh)
+        """
+        if self._timestamped:
+            return self._verify_timestamped(payload, received_signature)
+
+        # compare_digest only accepts ASCII strings
+        if not received_signature.isascii():
+            return False
+        matched = False
+        for keyed in self._keyed:
+            mac = keyed.copy()
+            mac.update(payload)
+            # Check every secret so timing does not reveal which one matched
+            matched |= hmac.compare_digest(received_signature, self._encode(mac.digest()))
+        return matched
+
+    def _verify_timestamped(self, payload: bytes, header: str) -> bool:
+        timestamp = None
+        for key, value in self._header_fields(header):
+            if key == "t":
+                timestamp = value
+        if timestamp is None:
+            return False
+        # t is signed, unlike X-Timestamp: an old body and signature cannot
+        # be replayed by pairing them with fresh headers
+        try:
+            age = time.time() - int(timestamp)
+        except ValueError:
+            return False
+        if abs(age) > settings.REPLAY_PROTECTION_WINDOW_SECONDS:
+            return False
+
+        matched = False
+        for keyed in self._keyed:
+            mac = keyed.copy()
+            mac.update(timestamp.encode())
+            mac.update(b".")
+            mac.update(payload)
+            expected = self._encode(mac.digest())
+            # Check every candidate so timing does not reveal which one matched
+            for key, value in self._header_fields(header):
+                if key == "v1" and value.isascii():  # compare_digest needs ASCII
+                    matched |= hmac.compare_digest(value, expected)
+        return matched
+
+    async def verify_async(self, payload: bytes, received_signature: str) -> bool:
+        """
+        Same as verify(), but payloads of HMAC_OFFLOAD_THRESHOLD_BYTES or more
+        are hashed on the thread pool so the event loop is not stalled.
+        """
+        threshold = settings.HMAC_OFFLOAD_THRESHOLD_BYTES
+        if threshold <= 0 or len(payload) < threshold:
+            return self.verify(payload, received_signature)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _get_hash_executor(),
+            self.verify,
+            payload,
+            received_signature
+        )
+
+    def _encode(self, digest: bytes) -> str:
+        if self._base64:
+            return base64.b64encode(digest).decode()
+        return digest.hex()
+
+    @staticmethod
+    def _header_fields(header: str) -> Iterator[tuple[str, str]]:
+        """Yield the key=value items of a timestamped header, scanning it in place."""
+        end = len(header)
+        start = 0
+        while start <= end:
+            comma = header.find(",", start)
+            if comma == -1:
+                comma = end
+            equals = header.find("=", start, comma)
+            if equals != -1:
+                yield header[start:equals].strip(), header[equals + 1:comma].strip()
+            start = comma + 1
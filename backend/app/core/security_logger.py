@@ -2,46 +2,205 @@
 Security event logging utilities.
 
 Logs security violations for monitoring and alerting.
+
+Events are handed to a bounded in-memory queue and written in batches by a
+background task, so rejecting a request never waits on the database. Under
+a flood the queue may fill up; further events are dropped and counted
+rather than slowing down the rejection path.
+
+Fields taken from the request (provider name from the path, request ID
+from a header) are cut to their column lengths before queueing, so one
+oversized request cannot fail the batch it is written with.
 """
+import asyncio
+import logging
+import uuid
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.rollups import rollup_accumulator
 from app.db.models.security_log import SecurityLog
-import uuid
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+class SecurityEventSink:
+    """
+    Non-blocking, batched writer for SecurityLog rows.
+
+    Counters:
+        written: rows committed to the database
+        dropped: events discarded because the queue was full
+        failed: rows that could not be inserted, even on their own
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int | None = None,
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None
+    ):
+        self.batch_size = batch_size or settings.SECURITY_LOG_BATCH_SIZE
+        if flush_interval_ms is None:
+            flush_interval_ms = settings.SECURITY_LOG_FLUSH_INTERVAL_MS
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_queue_size or settings.SECURITY_LOG_QUEUE_MAX_SIZE
+        )
+        self._task: asyncio.Task | None = None
+        self._inflight: asyncio.Future | None = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of events waiting to be written."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
 
+    def emit(self, row: dict) -> bool:
+        """
+        Queue a SecurityLog row without waiting.
 
-async def log_security_event(
-    db: AsyncSession,
+        Returns:
+            True if queued, False if it was dropped because the queue is full
+        """
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # A batch that was mid-insert when we cancelled is still running
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        while not self._queue.empty():
+            await self._flush(self._take_batch())
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            try:
+                # Let a burst accumulate so it goes out as one INSERT
+                if self._queue.qsize() < self.batch_size - 1:
+                    await asyncio.sleep(self.flush_interval)
+            finally:
+                # Also runs when stop() cancels the sleep, so the event
+                # already taken off the queue is written, not lost
+                batch = [first] + self._take_batch(self.batch_size - 1)
+                # Not cancelled by stop(), which waits for it instead
+                self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    def _take_batch(self, limit: int | None = None) -> list[dict]:
+        limit = self.batch_size if limit is None else limit
+        batch: list[dict] = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _flush(self, batch: list[dict]) -> None:
+        if not batch:
+            return
+        try:
+            await self._insert(batch)
+            self.written += len(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.error(f"Failed to write security event: {str(e)}")
+                return
+            # One bad row must not take the rest of the batch with it:
+            # retry each row in its own transaction
+            logger.warning(
+                f"Batch insert of {len(batch)} security events failed, "
+                f"retrying individually: {str(e)}"
+            )
+        for row in batch:
+            try:
+                await self._insert([row])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to write security event: {str(e)}")
+
+    @staticmethod
+    async def _insert(rows: list[dict]) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(insert(SecurityLog), rows)
+
+
+# Global sink shared by all routes in this worker
+security_event_sink = SecurityEventSink()
+
+
+def _clip(value: str | None, column) -> str | None:
+    """Cut value to the length of a String column."""
+    if value is None:
+        return None
+    return value[:column.type.length]
+
+
+def log_security_event(
     provider_name: str,
     event_type: str,
     ip_address: str,
-    request_id: str = None,
-    details: dict = None
-) -> SecurityLog:
+    request_id: str | None = None,
+    details: dict | None = None,
+    provider_id: uuid.UUID | None = None
+) -> None:
     """
-    Log a security event to the database.
-    
+    Log a security event without blocking the caller.
+
+    The event is queued on the security event sink and written to the
+    database in the background. Events of a known provider (provider_id
+    given) are also counted in the per-minute rollups.
+
     Args:
-        db: Database session
         provider_name: Name of the provider
         event_type: Type of security event (e.g., "invalid_signature", "rate_limit_exceeded")
         ip_address: Source IP address
         request_id: Request ID if available
         details: Additional context (dict)
-    
-    Returns:
-        Created SecurityLog entry
+        provider_id: ID of the provider, if provider_name names an existing one
     """
-    security_log = SecurityLog(
-        id=uuid.uuid4(),
-        provider_name=provider_name,
-        event_type=event_type,
-        ip_address=ip_address,
-        request_id=request_id,
-        details=details or {},
-        created_at=datetime.utcnow()
-    )
-    
-    db.add(security_log)
-    await db.commit()
-    
-    return security_log
+    created_at = datetime.utcnow()
+    security_event_sink.emit({
+        "id": uuid.uuid4(),
+        "provider_name": _clip(provider_name, SecurityLog.provider_name),
+        "event_type": _clip(event_type, SecurityLog.event_type),
+        "ip_address": _clip(ip_address, SecurityLog.ip_address),
+        "request_id": _clip(request_id, SecurityLog.request_id),
+        "details": details or {},
+        "created_at": created_at,
+    })
+    if provider_id is not None:
+        rollup_accumulator.record(provider_id, event_type, at=created_at)
@@ -20,5 +20,7 @@ def _import_models():
     from app.db.models import provider  # noqa: F401
     from app.db.models import webhook_event  # noqa: F401
     from app.db.models import security_log  # noqa: F401
+    from app.db.models import metric_rollup  # noqa: F401
+    from app.db.models import header_set  # noqa: F401
 
 _import_models()
@@ -0,0 +1,50 @@
+"""
+HeaderSet model - dictionary of captured request header sets.
+
+Most headers a provider sends (user-agent, accept, content-type, ...) are
+the same on every delivery. Each distinct set is stored once here and
+webhook_events rows reference it by id; only the per-request headers
+(signature, timestamp, ...) stay inline on the event row.
+"""
+from datetime import datetime
+from sqlalchemy import String, BigInteger, DateTime, Identity
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class HeaderSet(Base):
+    """One distinct set of captured headers, shared by many webhook events."""
+    __tablename__ = "header_sets"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(),
+        primary_key=True,
+        comment="Header set identifier"
+    )
+
+    # sha256 of the canonical JSON encoding (sorted keys)
+    digest: Mapped[str] = mapped_column(
+        String(64),
+        unique=True,
+        nullable=False,
+        index=True,
+        comment="SHA-256 of the canonical header JSON"
+    )
+
+    headers: Mapped[dict] = mapped_column(
+        JSONB,
+        nullable=False,
+        comment="Header names (lowercase) and values"
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        comment="When this header set was first seen"
+    )
+
+    def __repr__(self) -> str:
+        return f"<HeaderSet(id={self.id}, headers={len(self.headers)})>"
@@ -0,0 +1,75 @@
+"""
+MetricRollup model - per-minute dashboard counters.
+
+One row per (minute, provider, outcome). Outcomes are:
+- received: webhook accepted by the ingest pipeline
+- forwarded_ok / forwarded_failed: latest forwarding result of a webhook
+  (one per webhook, in the minute of forwarded_at)
+- every security event type (invalid_signature, rate_limit_exceeded, ...)
+
+Rows are maintained incrementally by app.core.rollups, so dashboards read
+O(buckets) rows instead of scanning webhook_events and security_logs.
+Only events of existing providers are counted, so the table grows with
+providers x outcomes x minutes, never with what clients put in the URL.
+"""
+import uuid
+from datetime import datetime
+from sqlalchemy import String, DateTime, BigInteger, Float, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class MetricRollup(Base):
+    """Count (and latency sum) of one outcome for one provider in one minute."""
+    __tablename__ = "metric_rollups"
+
+    # Start of the minute (UTC, truncated)
+    bucket: Mapped[datetime] = mapped_column(
+        DateTime,
+        primary_key=True,
+        comment="Start of the one-minute bucket (UTC)"
+    )
+
+    # No foreign key: a flush must not fail because a provider was deleted
+    # since the event was counted; reads join providers
+    provider_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        comment="Provider the events belong to"
+    )
+
+    outcome: Mapped[str] = mapped_column(
+        String(50),
+        primary_key=True,
+        comment="received, forwarded_ok, forwarded_failed or a security event type"
+    )
+
+    count: Mapped[int] = mapped_column(
+        BigInteger,
+        default=0,
+        nullable=False,
+        comment="Number of events in this bucket"
+    )
+
+    # Forwarding outcomes only: sum of (forwarded_at - received_at)
+    latency_sum: Mapped[float] = mapped_column(
+        Float,
+        default=0,
+        nullable=False,
+        comment="Sum of latencies in seconds (forwarding outcomes)"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<MetricRollup(bucket='{self.bucket}', provider_id='{self.provider_id}', "
+            f"outcome='{self.outcome}', count={self.count})>"
+        )
+
+
+# Per-provider time-range reads (the primary key leads with bucket)
+Index(
+    "ix_metric_rollups_provider_bucket",
+    MetricRollup.provider_id,
+    MetricRollup.bucket
+)
@@ -3,13 +3,16 @@ Provider model - stores webhook provider configurations.
 
 Each provider (Stripe, GitHub, etc.) has:
 - A unique name
-- A secret key for HMAC verification
+- A secret key for HMAC verification (plus extra keys during rotation)
+- A signature scheme
 - A forwarding URL where validated webhooks are sent
 - Active/inactive status
+- Optional per-provider limits (payload size, rate limit policy)
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Boolean, DateTime, Index
+from sqlalchemy import String, Boolean, Integer, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
@@ -47,6 +50,31 @@ class Provider(Base):
         comment="HMAC secret key for signature verification"
     )
     
+    # Additional secrets accepted alongside secret_key (used during key rotation)
+    additional_secret_keys: Mapped[list] = mapped_column(
+        JSONB,
+        default=list,
+        server_default="[]",
+        nullable=False,
+        comment="Extra HMAC secret keys accepted during rotation"
+    )
+
+    # Request headers stored with each event (lowercase names); NULL = HEADER_CAPTURE_ALLOWLIST
+    captured_headers: Mapped[list | None] = mapped_column(
+        JSONB,
+        nullable=True,
+        comment="Header names to store with each webhook (null = global allowlist)"
+    )
+
+    # How the signature header is computed (see app.core.security.SIGNATURE_SCHEMES)
+    signature_scheme: Mapped[str] = mapped_column(
+        String(32),
+        default="sha256-hex",
+        server_default="sha256-hex",
+        nullable=False,
+        comment="Signature scheme (e.g., 'sha256-hex', 'timestamped-sha256')"
+    )
+
     # Where to forward validated webhooks
     forwarding_url: Mapped[str] = mapped_column(
         String(500),
@@ -62,6 +90,38 @@ class Provider(Base):
         comment="Whether this provider is currently active"
     )
     
+    # Max accepted webhook body size; NULL means use MAX_PAYLOAD_SIZE_BYTES
+    max_payload_size_bytes: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="Per-provider max payload size in bytes (NULL = global default)"
+    )
+
+    # Rate limit policy; NULL columns fall back to the RATE_LIMIT_* settings
+    rate_limit_algorithm: Mapped[str | None] = mapped_column(
+        String(32),
+        nullable=True,
+        comment="Rate limit algorithm: fixed_window, sliding_window or gcra (NULL = global default)"
+    )
+
+    rate_limit_requests: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="Requests allowed per rate limit period (NULL = global default)"
+    )
+
+    rate_limit_period_seconds: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="Rate limit period in seconds (NULL = global default)"
+    )
+
+    rate_limit_burst: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="Requests GCRA allows back to back (NULL = rate_limit_requests)"
+    )
+
     # Timestamps for audit trail
     created_at: Mapped[datetime] = mapped_column(
         DateTime,
@@ -7,6 +7,9 @@ Logs:
 - Rate limit violations
 - Invalid timestamps
 - Other security events
+
+The table is range-partitioned by created_at into daily partitions (see
+app.core.partitions), so the primary key includes created_at.
 """
 import uuid
 from datetime import datetime
@@ -23,8 +26,9 @@ class SecurityLog(Base):
     Used to detect patterns of attacks and suspicious behavior.
     """
     __tablename__ = "security_logs"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
-    # Primary key
+    # Primary key (together with created_at, the partition key)
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
@@ -75,6 +79,7 @@ class SecurityLog(Base):
     # Timestamp
     created_at: Mapped[datetime] = mapped_column(
         DateTime,
+        primary_key=True,  # Partition key
         default=datetime.utcnow,
         nullable=False,
         index=True,  # For time-range queries
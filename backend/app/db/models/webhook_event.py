@@ -6,10 +6,16 @@ Stores:
 - Verification results
 - Forwarding status
 - Timing information
+
+Payloads and headers older than ARCHIVE_AFTER_DAYS are moved to segment
+files by app.core.archive; the row then keeps only a pointer.
+
+The table is range-partitioned by received_at into daily partitions
+(see app.core.partitions), so the primary key includes received_at.
 """
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Boolean, Integer, Text, DateTime, ForeignKey, Index
+from sqlalchemy import String, Boolean, Integer, BigInteger, Text, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
@@ -22,8 +28,9 @@ class WebhookEvent(Base):
     Every webhook attempt (valid or invalid) is logged here.
     """
     __tablename__ = "webhook_events"
+    __table_args__ = {"postgresql_partition_by": "RANGE (received_at)"}
     
-    # Primary key
+    # Primary key (together with received_at, the partition key)
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
@@ -40,29 +47,58 @@ class WebhookEvent(Base):
     )
     
     # Idempotency key from webhook headers
-    # Used for replay protection - must be unique
+    # Replay protection is enforced in Redis (check_admission). A unique
+    # constraint here would have to include the partition key, so each
+    # partition carries its own unique index instead (app.core.partitions)
     request_id: Mapped[str] = mapped_column(
         String(255),
-        unique=True,
         nullable=False,
-        index=True,  # Critical for replay protection lookups
+        index=True,
         comment="Unique request ID for idempotency"
     )
     
     # The actual webhook payload (stored as JSONB for efficient querying)
-    payload: Mapped[dict] = mapped_column(
+    # NULL once archived (see archive_segment)
+    payload: Mapped[dict | None] = mapped_column(
         JSONB,
-        nullable=False,
+        nullable=True,
         comment="Webhook payload (JSON)"
     )
     
-    # Request headers (useful for debugging)
-    headers: Mapped[dict] = mapped_column(
+    # Request headers (useful for debugging), split in two by app.core.header_sets:
+    # the per-request ones inline here, the rest shared through header_set_id
+    headers: Mapped[dict | None] = mapped_column(
         JSONB,
-        nullable=False,
+        nullable=True,
         comment="Request headers (JSON)"
     )
     
+    header_set_id: Mapped[int | None] = mapped_column(
+        BigInteger,
+        ForeignKey("header_sets.id", ondelete="RESTRICT"),
+        nullable=True,
+        comment="Shared header set (merged with headers when read)"
+    )
+
+    # Where payload and headers went once archived
+    archive_segment: Mapped[str | None] = mapped_column(
+        String(64),
+        nullable=True,
+        comment="Archive segment holding payload and headers"
+    )
+
+    archive_offset: Mapped[int | None] = mapped_column(
+        BigInteger,
+        nullable=True,
+        comment="Byte offset of the record in the segment"
+    )
+
+    archive_length: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="Compressed length of the record"
+    )
+
     # Security verification result
     signature_valid: Mapped[bool] = mapped_column(
         Boolean,
@@ -102,6 +138,7 @@ class WebhookEvent(Base):
     # Timestamps
     received_at: Mapped[datetime] = mapped_column(
         DateTime,
+        primary_key=True,  # Partition key
         default=datetime.utcnow,
         nullable=False,
         index=True,  # Indexed for time-range queries in analytics
@@ -113,18 +150,33 @@ class WebhookEvent(Base):
         nullable=True,
         comment="When webhook was forwarded"
     )
-    
+
+    # Set whenever a forwarding job is queued for the row (ingest, retry,
+    # pending-forward sweep); a job without an outcome long after this was
+    # lost and is queued again by the sweeper
+    queued_at: Mapped[datetime | None] = mapped_column(
+        DateTime,
+        nullable=True,
+        comment="When the last forwarding job was queued"
+    )
+
     # Relationship to provider (optional, for easier querying)
     # provider = relationship("Provider", back_populates="webhook_events")
     
+    @property
+    def archived(self) -> bool:
+        return self.archive_segment is not None
+
     def __repr__(self) -> str:
         return f"<WebhookEvent(id='{self.id}', provider_id='{self.provider_id}', valid={self.signature_valid})>"
 
 
 # Composite index for provider-specific time-range queries
 # Example: "Show me all Stripe webhooks from the last 24 hours"
+# The INCLUDE columns make the stats aggregates index-only scans.
 Index(
     "ix_webhook_events_provider_received",
     WebhookEvent.provider_id,
-    WebhookEvent.received_at
+    WebhookEvent.received_at,
+    postgresql_include=["forwarded", "response_status", "forwarded_at"]
 )
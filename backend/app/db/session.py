@@ -5,6 +5,7 @@ Creates async SQLAlchemy engine and session factory.
 """
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from app.core.config import settings
+from app.core.payload import json_serializer
 
 
 # Create async engine
@@ -15,6 +16,7 @@ engine = create_async_engine(
     pool_pre_ping=True,  # Verify connections before using them
     pool_size=10,  # Number of connections to keep in pool
     max_overflow=20,  # Additional connections if pool is exhausted
+    json_serializer=json_serializer,  # Writes raw webhook JSON without re-encoding
 )
 
 # Session factory
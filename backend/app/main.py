@@ -3,12 +3,28 @@ FastAPI application entry point.
 """
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.pool import QueuePool
 import redis.asyncio as redis
 import logging
 
 from app.core.config import settings, setup_logging
 from app.db.session import engine
+from app.core.provider_cache import provider_registry
+from app.core.event_writer import webhook_event_writer
+from app.core.forwarding import forwarding_pool, pending_forward_sweeper
+from app.core.http_clients import http_client_pool
+from app.core.security_logger import security_event_sink
+from app.core.security import shutdown_hash_executor
+from app.core.replay_cache import replay_cache
+from app.core.circuit_breaker import redis_breaker, BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN
+from app.core.rollups import rollup_accumulator
+from app.core.partitions import partition_maintainer
+from app.core.archive import archiver, segment_reader
+from app.core.header_sets import header_set_registry
+from app.core.metrics import metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, MERGE_MAX
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.api.routes.webhook import router as webhooks_router
 from app.api.routes.admin import router as admin_router
 
@@ -18,6 +34,79 @@ logger = logging.getLogger(__name__)
 
 redis_client: redis.Redis = None
 
+# Read from the running components when /metrics is scraped
+_BREAKER_STATE_VALUES = {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 1, BREAKER_OPEN: 2}
+
+
+def _db_pool_checked_out() -> int:
+    pool = engine.sync_engine.pool
+    # Only queue pools (the default, incl. the async adapter) track checkouts
+    return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+
+metrics_registry.gauge(
+    "webhook_queue_depth",
+    "Items waiting in each in-process queue",
+    lambda: {
+        ("forwarding",): forwarding_pool.depth,
+        ("event_writer",): webhook_event_writer.depth,
+        ("security_log",): security_event_sink.depth,
+    },
+    labels=("queue",)
+)
+metrics_registry.gauge(
+    "db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+    _db_pool_checked_out
+)
+metrics_registry.gauge(
+    "circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open); worst worker wins",
+    lambda: {("redis",): _BREAKER_STATE_VALUES[redis_breaker.state]},
+    labels=("circuit",),
+    merge=MERGE_MAX
+)
+metrics_registry.callback_counter(
+    "circuit_rejected_calls_total",
+    "Calls refused while the circuit was open",
+    lambda: {("redis",): redis_breaker.rejected},
+    labels=("circuit",)
+)
+metrics_registry.gauge(
+    "replay_cache_entries",
+    "Request ids held in the in-process replay cache",
+    lambda: replay_cache.stats()["entries"]
+)
+metrics_registry.callback_counter(
+    "replay_cache_lookups_total",
+    "Replay keys checked against the in-process replay cache",
+    lambda: replay_cache.lookups
+)
+metrics_registry.callback_counter(
+    "replay_cache_hits_total",
+    "Duplicates caught locally: LRU hits, and Bloom suspects Redis confirmed",
+    lambda: {
+        ("lru",): replay_cache.lru_hits,
+        ("bloom",): replay_cache.bloom_hits,
+    },
+    labels=("kind",)
+)
+metrics_registry.callback_counter(
+    "replay_cache_bloom_false_positives_total",
+    "Bloom suspects that Redis admitted",
+    lambda: replay_cache.bloom_false_positives
+)
+metrics_registry.callback_counter(
+    "header_set_cache_lookups_total",
+    "Header set id lookups by result",
+    lambda: {
+        ("hit",): header_set_registry.hits,
+        ("miss",): header_set_registry.misses,
+        ("capped",): header_set_registry.capped,
+    },
+    labels=("result",)
+)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,16 +121,22 @@ async def lifespan(app: FastAPI):
     # Initialize Redis connection
     global redis_client
     try:
+        # Per-call timeouts are applied by redis_breaker rather than
+        # socket_timeout, which would also cut off the idle pub/sub listener
         redis_client = redis.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
-            decode_responses=True
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS
         )
         logger.info("✓ Redis connected successfully")
     except Exception as e:
         logger.error(f"✗ Redis connection failed: {e}")
         raise
     
+    # Listen for provider changes made by other workers
+    provider_registry.start(redis_client)
+
     # Test database connection
     try:
         async with engine.begin() as conn:
@@ -50,6 +145,30 @@ async def lifespan(app: FastAPI):
         logger.error(f"✗ Database connection failed: {e}")
         raise
     
+    # Start group-commit writer for webhook events
+    webhook_event_writer.start()
+
+    # Start background writer for security events
+    security_event_sink.start()
+
+    # Start periodic flush of per-minute metric rollups
+    rollup_accumulator.start()
+
+    # Keep future partitions created and drop expired ones
+    partition_maintainer.start()
+
+    # Move old payloads to the cold-tier archive (if ARCHIVE_AFTER_DAYS is set)
+    archiver.start()
+
+    # Publish this worker's metrics for /metrics scrapes served by other workers
+    metrics_registry.start()
+
+    # Start forwarding workers and their shared HTTP clients
+    http_client_pool.start()
+    forwarding_pool.start()
+    # Re-queue webhooks left pending by a full queue or an earlier shutdown
+    pending_forward_sweeper.start()
+
     logger.info("✅ Webhook Gateway is ready!")
     
     yield  # Application runs here
@@ -57,6 +176,43 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("🔴 Shutting down Webhook Gateway...")
     
+    await provider_registry.stop()
+    await pending_forward_sweeper.stop()
+    await metrics_registry.stop()
+    await partition_maintainer.stop()
+    await archiver.stop()
+    segment_reader.close()
+
+    # Drain queued forwards before tearing anything else down
+    try:
+        await forwarding_pool.stop()
+        logger.info("✓ Forwarding queue drained")
+    except Exception as e:
+        logger.error(f"✗ Error draining forwarding queue: {e}")
+
+    await http_client_pool.close()
+
+    # Flush buffered webhook events before closing the database
+    try:
+        await webhook_event_writer.stop()
+        logger.info("✓ Webhook event writer flushed")
+    except Exception as e:
+        logger.error(f"✗ Error flushing webhook event writer: {e}")
+
+    try:
+        await security_event_sink.stop()
+        logger.info("✓ Security event sink flushed")
+    except Exception as e:
+        logger.error(f"✗ Error flushing security event sink: {e}")
+
+    try:
+        await rollup_accumulator.stop()
+        logger.info("✓ Metric rollups flushed")
+    except Exception as e:
+        logger.error(f"✗ Error flushing metric rollups: {e}")
+
+    shutdown_hash_executor()
+
     # Close Redis connection
     try:
         await redis_client.close()
@@ -87,6 +243,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Lets the dashboard read list cursors
 )
 
 # Include webhook routes
@@ -108,13 +265,34 @@ async def health_check():
     """
     Health check endpoint.
     """
+    redis_state = redis_breaker.state
     return {
-        "status": "healthy",
+        # Degraded: Redis is being bypassed and limits are enforced per worker
+        "status": "healthy" if redis_state == BREAKER_CLOSED else "degraded",
         "service": "webhook-gateway",
         "version": "1.0.0",
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "forwarding_queue": {
+            "depth": forwarding_pool.depth,
+            "capacity": forwarding_pool.max_queue_size
+        },
+        "security_log_sink": security_event_sink.stats(),
+        "replay_cache": replay_cache.stats(),
+        "redis_circuit": redis_breaker.stats()
     }
 
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics in the text exposition format.
+
+    Covers every worker when METRICS_DIR is set, otherwise only the
+    worker that served the request.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """
@@ -1,17 +1,74 @@
 """
 Pydantic schemas for provider management.
 """
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
+from app.core.rate_limit import RATE_LIMIT_ALGORITHMS
+from app.core.security import SIGNATURE_SCHEMES, DEFAULT_SIGNATURE_SCHEME
+
+
+def _check_signature_scheme(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in SIGNATURE_SCHEMES:
+        raise ValueError(f"signature_scheme must be one of: {', '.join(SIGNATURE_SCHEMES)}")
+    return value
+
+
+def _normalize_header_names(value: Optional[List[str]]) -> Optional[List[str]]:
+    if value is None:
+        return value
+    return sorted({name.strip().lower() for name in value if name.strip()})
+
+
+def _check_rate_limit_algorithm(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in RATE_LIMIT_ALGORITHMS:
+        raise ValueError(f"rate_limit_algorithm must be one of: {', '.join(RATE_LIMIT_ALGORITHMS)}")
+    return value
+
+
+# ProviderUpdate value that resets rate_limit_algorithm to the global setting
+RATE_LIMIT_ALGORITHM_DEFAULT = "default"
+
+
+def _check_rate_limit_algorithm_update(value: Optional[str]) -> Optional[str]:
+    if value == RATE_LIMIT_ALGORITHM_DEFAULT:
+        return value
+    return _check_rate_limit_algorithm(value)
+
 
 class ProviderCreate(BaseModel):
     """Schema for creating a new provider."""
     name: str = Field(..., description="Provider name (e.g., 'stripe', 'github')")
     secret_key: str = Field(..., description="HMAC secret key")
     forwarding_url: str = Field(..., description="Internal service URL to forward webhooks")
+    max_payload_size_bytes: Optional[int] = Field(
+        None, gt=0, description="Max payload size in bytes (default: global limit)"
+    )
+    signature_scheme: str = Field(DEFAULT_SIGNATURE_SCHEME, description="Signature scheme")
+    additional_secret_keys: List[str] = Field(
+        default_factory=list, description="Extra HMAC secret keys accepted during rotation"
+    )
+    rate_limit_algorithm: Optional[str] = Field(
+        None, description="Rate limit algorithm (default: global setting)"
+    )
+    rate_limit_requests: Optional[int] = Field(
+        None, gt=0, description="Requests per period (default: global limit)"
+    )
+    rate_limit_period_seconds: Optional[int] = Field(
+        None, gt=0, description="Rate limit period in seconds (default: global window)"
+    )
+    rate_limit_burst: Optional[int] = Field(
+        None, gt=0, description="GCRA burst size (default: rate_limit_requests)"
+    )
+    captured_headers: Optional[List[str]] = Field(
+        None, description="Header names stored with each webhook (default: global allowlist)"
+    )
+
+    _validate_scheme = field_validator("signature_scheme")(_check_signature_scheme)
+    _validate_algorithm = field_validator("rate_limit_algorithm")(_check_rate_limit_algorithm)
+    _normalize_headers = field_validator("captured_headers")(_normalize_header_names)
 
 
 class ProviderUpdate(BaseModel):
@@ -19,6 +76,35 @@ class ProviderUpdate(BaseModel):
     secret_key: Optional[str] = Field(None, description="New HMAC secret key")
     forwarding_url: Optional[str] = Field(None, description="New forwarding URL")
     is_active: Optional[bool] = Field(None, description="Enable/disable provider")
+    max_payload_size_bytes: Optional[int] = Field(
+        None, ge=0, description="New max payload size in bytes (0 = global limit)"
+    )
+    signature_scheme: Optional[str] = Field(None, description="New signature scheme")
+    additional_secret_keys: Optional[List[str]] = Field(
+        None, description="Replace extra HMAC secret keys ([] to clear)"
+    )
+    # Rate limit policy: an explicit null (or "default" / 0) resets a field to its default
+    rate_limit_algorithm: Optional[str] = Field(
+        None, description="New rate limit algorithm (\"default\" or null = global setting)"
+    )
+    rate_limit_requests: Optional[int] = Field(
+        None, ge=0, description="New requests per period (0 or null = global limit)"
+    )
+    rate_limit_period_seconds: Optional[int] = Field(
+        None, ge=0, description="New period in seconds (0 or null = global window)"
+    )
+    rate_limit_burst: Optional[int] = Field(
+        None, ge=0, description="New GCRA burst size (0 or null = rate_limit_requests)"
+    )
+    captured_headers: Optional[List[str]] = Field(
+        None, description="Replace stored header names ([] = global allowlist)"
+    )
+
+    _validate_scheme = field_validator("signature_scheme")(_check_signature_scheme)
+    _validate_algorithm = field_validator("rate_limit_algorithm")(
+        _check_rate_limit_algorithm_update
+    )
+    _normalize_headers = field_validator("captured_headers")(_normalize_header_names)
 
 
 class ProviderResponse(BaseModel):
@@ -27,7 +113,26 @@ class ProviderResponse(BaseModel):
     name: str = Field(..., description="Provider name")
     forwarding_url: str = Field(..., description="Forwarding URL")
     is_active: bool = Field(..., description="Is provider active")
+    max_payload_size_bytes: Optional[int] = Field(
+        None, description="Max payload size in bytes (null = global limit)"
+    )
+    signature_scheme: str = Field(..., description="Signature scheme")
+    rate_limit_algorithm: Optional[str] = Field(
+        None, description="Rate limit algorithm (null = global setting)"
+    )
+    rate_limit_requests: Optional[int] = Field(
+        None, description="Requests per period (null = global limit)"
+    )
+    rate_limit_period_seconds: Optional[int] = Field(
+        None, description="Rate limit period in seconds (null = global window)"
+    )
+    rate_limit_burst: Optional[int] = Field(
+        None, description="GCRA burst size (null = rate_limit_requests)"
+    )
+    captured_headers: Optional[List[str]] = Field(
+        None, description="Header names stored with each webhook (null = global allowlist)"
+    )
     created_at: datetime = Field(..., description="Creation timestamp")
     updated_at: datetime = Field(..., description="Last update timestamp")
-    
+
     model_config = ConfigDict(from_attributes=True)
@@ -52,8 +52,13 @@ class WebhookEventResponse(BaseModel):
     id: UUID = Field(..., description="Webhook event ID")
     provider_id: UUID = Field(..., description="Provider ID")
     request_id: str = Field(..., description="Request ID for deduplication")
-    payload: Dict[str, Any] = Field(..., description="Webhook payload")
-    headers: Dict[str, str] = Field(..., description="Request headers")
+    payload: Optional[Dict[str, Any]] = Field(
+        None, description="Webhook payload (null if an archived payload cannot be read)"
+    )
+    headers: Optional[Dict[str, str]] = Field(None, description="Request headers")
+    archived: bool = Field(
+        False, description="Whether payload and headers live in the cold-tier archive"
+    )
     signature_valid: bool = Field(..., description="Whether signature was valid")
     forwarded: bool = Field(..., description="Whether webhook was forwarded")
     received_at: datetime = Field(..., description="When webhook was received")
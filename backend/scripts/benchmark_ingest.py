@@ -0,0 +1,338 @@
+"""
+Webhook ingest benchmark.
+
+Drives POST /webhooks/{provider} in-process (httpx ASGI transport, so no
+network between client and app) against a real Postgres, with fakeredis
+or a real Redis. The background components the app starts in its
+lifespan run too: the group-commit writer, the security event sink, the
+rollup accumulator and the forwarding pool, which delivers to a minimal
+HTTP receiver started by this script.
+
+Run from backend/ against a migrated scratch database (DATABASE_URL,
+REDIS_URL and JWT_SECRET_KEY are read as usual from .env / the
+environment):
+
+    python -m scripts.benchmark_ingest --requests 5000 --concurrency 100 --batch-sizes 1,200
+
+Each value of --batch-sizes is one run with that WEBHOOK_WRITER_BATCH_SIZE;
+1 commits every webhook in its own transaction, as before group commit.
+A run reports accepted webhooks per second: the endpoint only answers
+once the row is committed.
+
+--mode latency measures small webhooks while --large-concurrency clients
+keep sending --large-bytes payloads, once per --offload-thresholds value
+(HMAC_OFFLOAD_THRESHOLD_BYTES; 0 hashes everything on the event loop):
+
+    python -m scripts.benchmark_ingest --mode latency --offload-thresholds 0,65536
+
+It reports p50 / p99 / max latency of the small requests.
+
+The benchmark provider and its rows are deleted at the end.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.core.event_writer import webhook_event_writer
+from app.core.forwarding import forwarding_pool
+from app.core.http_clients import http_client_pool
+from app.core.provider_cache import provider_registry
+from app.core.rollups import rollup_accumulator
+from app.core.security import shutdown_hash_executor
+from app.core.security_logger import security_event_sink
+from app.db.models.metric_rollup import MetricRollup
+from app.db.models.provider import Provider
+from app.db.models.security_log import SecurityLog
+from app.db.models.webhook_event import WebhookEvent
+from app.db.session import AsyncSessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+RECEIVER_RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok"
+
+
+async def _serve_forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answer every forwarded webhook with 200 (keep-alive, HTTP/1.1)."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            writer.write(RECEIVER_RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _create_provider(
+    forwarding_url: str, secret: str, max_payload_size_bytes: int
+) -> Provider:
+    provider = Provider(
+        id=uuid.uuid4(),
+        name=f"bench-{uuid.uuid4().hex[:8]}",
+        secret_key=secret,
+        forwarding_url=forwarding_url,
+        is_active=True,
+        max_payload_size_bytes=max_payload_size_bytes,
+        # Measure the pipeline, not the rate limiter's rejections
+        rate_limit_algorithm="fixed_window",
+        rate_limit_requests=1_000_000_000,
+        rate_limit_period_seconds=60,
+    )
+    async with AsyncSessionLocal() as db:
+        db.add(provider)
+        await db.commit()
+    return provider
+
+
+async def _delete_provider(provider: Provider) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(MetricRollup).where(MetricRollup.provider_id == provider.id))
+        await db.execute(delete(WebhookEvent).where(WebhookEvent.provider_id == provider.id))
+        await db.execute(delete(SecurityLog).where(SecurityLog.provider_name == provider.name))
+        await db.execute(delete(Provider).where(Provider.id == provider.id))
+        await db.commit()
+
+
+def _payload(index: int, size: int) -> bytes:
+    body = {"event": "benchmark", "index": index, "data": ""}
+    padding = max(size - len(json.dumps(body)), 0)
+    body["data"] = "x" * padding
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+class Sender:
+    """Signs and posts webhooks for one provider."""
+
+    def __init__(self, client: httpx.AsyncClient, provider: Provider, secret: str):
+        self.client = client
+        self.path = f"/webhooks/{provider.name}"
+        self.secret = secret.encode()
+        self.statuses: Counter = Counter()
+
+    async def send(self, body: bytes) -> float:
+        """Post one webhook; returns its latency in seconds."""
+        headers = {
+            "Content-Type": "application/json",
+            "X-Signature": hmac.new(self.secret, body, hashlib.sha256).hexdigest(),
+            "X-Timestamp": datetime.utcnow().isoformat() + "Z",
+            "X-Request-ID": uuid.uuid4().hex,
+        }
+        started = time.perf_counter()
+        response = await self.client.post(self.path, content=body, headers=headers)
+        elapsed = time.perf_counter() - started
+        self.statuses[response.status_code] += 1
+        return elapsed
+
+
+async def run_throughput(
+    sender: Sender, requests: int, concurrency: int, payload_bytes: int
+) -> float:
+    """Send requests webhooks from concurrency clients; returns elapsed seconds."""
+    remaining = iter(range(requests))
+
+    async def client() -> None:
+        for index in remaining:
+            await sender.send(_payload(index, payload_bytes))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_latency(
+    sender: Sender,
+    requests: int,
+    concurrency: int,
+    payload_bytes: int,
+    large_bytes: int,
+    large_concurrency: int
+) -> tuple[list[float], int]:
+    """
+    Send small webhooks while large ones are in flight.
+
+    Returns:
+        (latency of each small webhook in seconds, number of large webhooks sent)
+    """
+    remaining = iter(range(requests))
+    latencies: list[float] = []
+    large_body = _payload(0, large_bytes)
+    large_sent = 0
+    done = asyncio.Event()
+
+    async def small_client() -> None:
+        for index in remaining:
+            latencies.append(await sender.send(_payload(index, payload_bytes)))
+
+    async def large_client() -> None:
+        nonlocal large_sent
+        while not done.is_set():
+            await sender.send(large_body)
+            large_sent += 1
+
+    large_clients = [asyncio.create_task(large_client()) for _ in range(large_concurrency)]
+    try:
+        # Let the large senders get going first
+        await asyncio.sleep(0.1)
+        await asyncio.gather(*(small_client() for _ in range(concurrency)))
+    finally:
+        done.set()
+        await asyncio.gather(*large_clients)
+    return latencies, large_sent
+
+
+async def _throughput_runs(sender: Sender, args: argparse.Namespace) -> None:
+    print(f"{'batch size':>10} {'requests':>9} {'seconds':>8} {'req/s':>9}  statuses")
+    for batch_size in args.batch_sizes:
+        webhook_event_writer.batch_size = batch_size
+        webhook_event_writer.start()
+        sender.statuses.clear()
+        try:
+            elapsed = await run_throughput(
+                sender, args.requests, args.concurrency, args.payload_bytes
+            )
+        finally:
+            await webhook_event_writer.stop()
+        accepted = sum(count for code, count in sender.statuses.items() if 200 <= code < 300)
+        print(
+            f"{batch_size:>10} {args.requests:>9} {elapsed:>8.2f} {accepted / elapsed:>9.1f}  "
+            f"{dict(sender.statuses)}"
+        )
+
+
+async def _latency_runs(sender: Sender, args: argparse.Namespace) -> None:
+    print(
+        f"{'threshold':>10} {'small':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'large':>7}  statuses"
+    )
+    webhook_event_writer.start()
+    try:
+        for threshold in args.offload_thresholds:
+            settings.HMAC_OFFLOAD_THRESHOLD_BYTES = threshold
+            sender.statuses.clear()
+            latencies, large_sent = await run_latency(
+                sender, args.requests, args.concurrency, args.payload_bytes,
+                args.large_bytes, args.large_concurrency
+            )
+            print(
+                f"{threshold:>10} {len(latencies):>7} "
+                f"{_percentile(latencies, 0.5) * 1000:>8.2f} "
+                f"{_percentile(latencies, 0.99) * 1000:>8.2f} "
+                f"{max(latencies) * 1000:>8.2f} {large_sent:>7}  {dict(sender.statuses)}"
+            )
+    finally:
+        await webhook_event_writer.stop()
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+    import app.main
+
+    if args.redis_url:
+        import redis.asyncio as redis
+        redis_client = redis.from_url(args.redis_url, encoding="utf-8", decode_responses=True)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    app.main.redis_client = redis_client
+
+    receiver = await asyncio.start_server(_serve_forward, "127.0.0.1", 0)
+    host, port = receiver.sockets[0].getsockname()[:2]
+    secret = uuid.uuid4().hex
+    provider = await _create_provider(
+        f"http://{host}:{port}/webhook",
+        secret,
+        max(settings.MAX_PAYLOAD_SIZE_BYTES, args.large_bytes + 1024)
+    )
+
+    provider_registry.start(redis_client)
+    security_event_sink.start()
+    rollup_accumulator.start()
+    http_client_pool.start()
+    forwarding_pool.start()
+
+    transport = httpx.ASGITransport(app=app.main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            sender = Sender(client, provider, secret)
+            # Warm the provider cache and the connection pool
+            await sender.send(_payload(0, args.payload_bytes))
+
+            if args.mode == "latency":
+                await _latency_runs(sender, args)
+            else:
+                await _throughput_runs(sender, args)
+    finally:
+        await forwarding_pool.stop()
+        await http_client_pool.close()
+        await rollup_accumulator.stop()
+        await security_event_sink.stop()
+        await provider_registry.stop()
+        shutdown_hash_executor()
+        receiver.close()
+        await receiver.wait_closed()
+        if not args.keep:
+            await _delete_provider(provider)
+        await redis_client.aclose()
+        await engine.dispose()
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_ingest")
+    parser.add_argument("--mode", choices=["throughput", "latency"], default="throughput")
+    parser.add_argument("--requests", type=int, default=2000, help="Webhooks per run")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument(
+        "--payload-bytes", type=int, default=1024, help="Approximate JSON body size"
+    )
+    parser.add_argument(
+        "--batch-sizes", type=_int_list, default=[1, settings.WEBHOOK_WRITER_BATCH_SIZE],
+        help="Comma-separated WEBHOOK_WRITER_BATCH_SIZE values, one run each"
+    )
+    parser.add_argument(
+        "--offload-thresholds", type=_int_list, default=[0, settings.HMAC_OFFLOAD_THRESHOLD_BYTES],
+        help="Latency mode: comma-separated HMAC_OFFLOAD_THRESHOLD_BYTES values, one run each"
+    )
+    parser.add_argument(
+        "--large-bytes", type=int, default=900_000, help="Latency mode: large body size"
+    )
+    parser.add_argument(
+        "--large-concurrency", type=int, default=4, help="Latency mode: large-payload clients"
+    )
+    parser.add_argument("--redis-url", help="Use this Redis instead of fakeredis")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the benchmark provider and its rows"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
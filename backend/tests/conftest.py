@@ -0,0 +1,69 @@
+"""
+Shared fixtures.
+
+Tests run against an in-memory SQLite database (aiosqlite) instead of
+Postgres; the Postgres-only column types and the interval EXTRACT used by
+the stats queries are compiled to SQLite equivalents below.
+
+The required settings get test defaults in tests/__init__.py, which is
+imported before this module.
+"""
+import pytest
+from sqlalchemy.sql import operators
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import BinaryExpression, Extract
+
+from app.db.base import Base
+from app.db.models.metric_rollup import MetricRollup
+from app.db.models.provider import Provider
+from app.db.models.security_log import SecurityLog
+from app.db.models.webhook_event import WebhookEvent
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(UUID, "sqlite")
+def _compile_uuid(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@compiles(Extract, "sqlite")
+def _compile_extract(element, compiler, **kw):
+    # EXTRACT(epoch FROM a - b): seconds between two timestamps
+    expr = element.expr
+    if (
+        element.field == "epoch"
+        and isinstance(expr, BinaryExpression)
+        and expr.operator is operators.sub
+    ):
+        left = compiler.process(expr.left, **kw)
+        right = compiler.process(expr.right, **kw)
+        return f"((julianday({left}) - julianday({right})) * 86400.0)"
+    return compiler.visit_extract(element, **kw)
+
+
+@pytest.fixture
+async def db():
+    """Session on a fresh database with the tables the tests read."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[
+                Provider.__table__,
+                WebhookEvent.__table__,
+                SecurityLog.__table__,
+                MetricRollup.__table__,
+            ]
+        )
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+
+    await engine.dispose()
@@ -0,0 +1,105 @@
+"""
+Pending-forward sweep.
+
+A row is queued again when its last forwarding job is older than
+FORWARDING_SWEEP_MIN_AGE_SECONDS and left no outcome, including rows a
+crashed sweep had already claimed and rows archived meanwhile.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core import forwarding
+from app.core.archive import SegmentReader, SegmentWriter
+from app.core.config import settings
+from app.core.payload import encode_payload
+from app.db.models.provider import Provider
+from app.db.models.webhook_event import WebhookEvent
+
+NOW = datetime(2024, 3, 1, 12, 0, 0)
+OLD = NOW - timedelta(seconds=settings.FORWARDING_SWEEP_MIN_AGE_SECONDS + 60)
+
+
+def _event(provider, received_at, queued_at=None, forwarded=False, **values):
+    return WebhookEvent(
+        id=uuid.uuid4(),
+        provider_id=provider.id,
+        request_id=f"req-{uuid.uuid4()}",
+        payload={"ok": True},
+        headers={},
+        signature_valid=True,
+        forwarded=forwarded,
+        received_at=received_at,
+        queued_at=queued_at,
+        **values
+    )
+
+
+@pytest.fixture
+def pool(db, monkeypatch):
+    """A running forwarding pool without workers, sweeping through the test database."""
+    pool = forwarding.ForwardingPool(max_queue_size=100, workers=1)
+    pool._queue = asyncio.Queue(maxsize=pool.max_queue_size)
+    monkeypatch.setattr(forwarding, "forwarding_pool", pool)
+    monkeypatch.setattr(forwarding, "engine", db.bind)
+    return pool
+
+
+async def test_sweep_queues_lost_jobs_only(db, pool):
+    provider = Provider(
+        id=uuid.uuid4(), name="stripe", secret_key="s", forwarding_url="http://orders"
+    )
+    never_queued = _event(provider, OLD)
+    lost_claim = _event(provider, OLD - timedelta(hours=1), queued_at=OLD)
+    db.add_all([
+        provider,
+        never_queued,
+        lost_claim,
+        # Queued recently, still waiting in some worker's queue
+        _event(provider, OLD, queued_at=NOW - timedelta(seconds=30)),
+        # Too recent
+        _event(provider, NOW - timedelta(seconds=30), queued_at=NOW - timedelta(seconds=30)),
+        # Has an outcome
+        _event(provider, OLD, queued_at=OLD, forwarded=True, response_status=200, forwarded_at=OLD),
+        _event(provider, OLD, queued_at=OLD, response_status=500, forwarded_at=OLD),
+    ])
+    await db.commit()
+
+    assert await forwarding.sweep_pending_forwards(NOW) == 2
+    queued = [pool._queue.get_nowait() for _ in range(pool.depth)]
+    assert {job.webhook_id for job in queued} == {lost_claim.id, never_queued.id}
+    assert all(job.forwarding_url == "http://orders" for job in queued)
+
+    # The claim moved queued_at, so the next sweep leaves them alone
+    result = await db.execute(
+        select(WebhookEvent.queued_at).where(WebhookEvent.id.in_([lost_claim.id, never_queued.id]))
+    )
+    assert set(result.scalars().all()) == {NOW}
+    assert await forwarding.sweep_pending_forwards(NOW) == 0
+
+    # ...until the claim itself has expired
+    later = NOW + timedelta(seconds=settings.FORWARDING_SWEEP_MIN_AGE_SECONDS + 1)
+    assert await forwarding.sweep_pending_forwards(later) == 4
+
+
+async def test_sweep_reads_archived_payload(db, pool, monkeypatch, tmp_path):
+    provider = Provider(
+        id=uuid.uuid4(), name="stripe", secret_key="s", forwarding_url="http://orders"
+    )
+    archived = _event(provider, OLD)
+    record = b'{"payload":{"archived":true},"headers":{}}'
+    [(segment, offset, length)] = SegmentWriter(str(tmp_path)).append([(archived.id, record)])
+    archived.payload = None
+    archived.headers = None
+    archived.archive_segment = segment
+    archived.archive_offset = offset
+    archived.archive_length = length
+    db.add_all([provider, archived])
+    await db.commit()
+    monkeypatch.setattr(forwarding, "segment_reader", SegmentReader(str(tmp_path)))
+
+    assert await forwarding.sweep_pending_forwards(NOW) == 1
+    assert pool._queue.get_nowait().body == encode_payload({"archived": True})
@@ -0,0 +1,84 @@
+"""
+Rollup accumulator.
+
+Counts survive a failed flush (up to max_pending rows), and a retried
+webhook's previous forwarding result is taken back so each webhook
+counts once.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import rollups
+from app.core.rollups import (
+    OUTCOME_FORWARDED_FAILED,
+    OUTCOME_FORWARDED_OK,
+    OUTCOME_RECEIVED,
+    RollupAccumulator,
+)
+
+MINUTE = datetime(2024, 3, 1, 12, 0)
+PROVIDER_ID = uuid.uuid4()
+
+
+class _UnavailableEngine:
+    def begin(self):
+        raise ConnectionError("database unavailable")
+
+
+@pytest.fixture
+def accumulator():
+    return RollupAccumulator(flush_interval_seconds=60)
+
+
+def _key(outcome, minute=MINUTE):
+    return (minute, PROVIDER_ID, outcome)
+
+
+async def test_failed_flush_keeps_counts(accumulator, monkeypatch):
+    monkeypatch.setattr(rollups, "engine", _UnavailableEngine())
+    accumulator.record(PROVIDER_ID, OUTCOME_RECEIVED, at=MINUTE)
+    accumulator.record(PROVIDER_ID, OUTCOME_FORWARDED_OK, latency=0.5, at=MINUTE)
+
+    await accumulator.flush()
+    accumulator.record(PROVIDER_ID, OUTCOME_RECEIVED, at=MINUTE + timedelta(seconds=30))
+
+    assert accumulator._pending == {
+        _key(OUTCOME_RECEIVED): [2, 0.0],
+        _key(OUTCOME_FORWARDED_OK): [1, 0.5],
+    }
+    assert accumulator.failed == 0
+
+
+async def test_failed_flush_is_bounded(accumulator, monkeypatch):
+    monkeypatch.setattr(rollups, "engine", _UnavailableEngine())
+    accumulator.max_pending = 2
+    for minutes in range(3):
+        accumulator.record(PROVIDER_ID, OUTCOME_RECEIVED, at=MINUTE + timedelta(minutes=minutes))
+    assert accumulator.failed == 1
+
+    await accumulator.flush()
+    # A new row while full is dropped, an existing one still adds up
+    accumulator.record(PROVIDER_ID, OUTCOME_FORWARDED_OK, at=MINUTE)
+    accumulator.record(PROVIDER_ID, OUTCOME_RECEIVED, at=MINUTE)
+
+    assert len(accumulator._pending) == 2
+    assert accumulator._pending[_key(OUTCOME_RECEIVED)] == [2, 0.0]
+    assert accumulator.failed == 2
+
+
+def test_retry_replaces_previous_result(accumulator):
+    received_at = MINUTE + timedelta(seconds=10)
+    first = MINUTE + timedelta(seconds=40)
+    accumulator.record(PROVIDER_ID, OUTCOME_FORWARDED_FAILED, latency=30.0, at=first)
+
+    # Admin retry: take the failure back, then the new result is recorded
+    accumulator.retract_forward_result(PROVIDER_ID, False, received_at, first)
+    second = MINUTE + timedelta(minutes=5)
+    accumulator.record(PROVIDER_ID, OUTCOME_FORWARDED_OK, latency=290.0, at=second)
+
+    assert accumulator._pending == {
+        _key(OUTCOME_FORWARDED_FAILED): [0, 0.0],
+        _key(OUTCOME_FORWARDED_OK, MINUTE + timedelta(minutes=5)): [1, 290.0],
+    }
@@ -0,0 +1,230 @@
+"""
+Admin stats endpoints.
+
+Provider stats compute their counters with one SQL aggregate
+(_webhook_aggregates); those tests check every field against the per-row
+Python logic the endpoints used before. /webhooks/stats and /logs/stats
+read metric_rollups instead.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.api.routes.admin import (
+    _webhook_aggregates,
+    get_provider_stats,
+    get_security_stats,
+    get_webhook_stats,
+)
+from app.db.models.metric_rollup import MetricRollup
+from app.db.models.provider import Provider
+from app.db.models.security_log import SecurityLog
+from app.db.models.webhook_event import WebhookEvent
+
+
+def _reference_stats(webhooks):
+    """The per-row computation the endpoints used before the SQL aggregate."""
+    total = len(webhooks)
+    successful = sum(
+        1 for w in webhooks if w.forwarded and w.response_status and 200 <= w.response_status < 300
+    )
+    failed = sum(
+        1 for w in webhooks if w.forwarded and w.response_status and w.response_status >= 400
+    )
+    pending = sum(1 for w in webhooks if not w.forwarded)
+
+    avg_response_time = 0
+    if successful > 0:
+        response_times = [
+            w.forwarded_at.timestamp() - w.received_at.timestamp()
+            for w in webhooks if w.forwarded_at and w.received_at
+        ]
+        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+
+    return {
+        "total": total,
+        "successful": successful,
+        "failed": failed,
+        "pending": pending,
+        "avg_response_time": avg_response_time,
+        "last_webhook_at": max([w.received_at for w in webhooks], default=None),
+    }
+
+
+def _event(provider, received_at, forwarded=False, response_status=None, forward_after=None):
+    return WebhookEvent(
+        id=uuid.uuid4(),
+        provider_id=provider.id,
+        request_id=f"req-{uuid.uuid4()}",
+        payload={"ok": True},
+        headers={},
+        signature_valid=True,
+        forwarded=forwarded,
+        response_status=response_status,
+        received_at=received_at,
+        forwarded_at=received_at + forward_after if forward_after is not None else None,
+    )
+
+
+@pytest.fixture
+async def providers(db):
+    """Two providers with webhooks in every state, and one with none."""
+    stripe = Provider(
+        id=uuid.uuid4(), name="stripe", secret_key="s", forwarding_url="http://orders"
+    )
+    github = Provider(id=uuid.uuid4(), name="github", secret_key="s", forwarding_url="http://ci")
+    idle = Provider(id=uuid.uuid4(), name="idle", secret_key="s", forwarding_url="http://idle")
+    db.add_all([stripe, github, idle])
+
+    start = datetime(2024, 3, 1, 12, 0, 0)
+    db.add_all([
+        # Forwarded successfully
+        _event(stripe, start, True, 200, timedelta(milliseconds=120)),
+        _event(stripe, start + timedelta(minutes=1), True, 204, timedelta(milliseconds=480)),
+        _event(github, start + timedelta(minutes=2), True, 201, timedelta(seconds=2)),
+        # Forwarded but the service answered with an error
+        _event(stripe, start + timedelta(minutes=3), True, 500, timedelta(milliseconds=900)),
+        _event(github, start + timedelta(minutes=4), True, 404, timedelta(milliseconds=50)),
+        # Forward attempted and failed (forwarded_at set, still pending)
+        _event(stripe, start + timedelta(minutes=5), False, 502, timedelta(seconds=10)),
+        # Never attempted
+        _event(stripe, start + timedelta(minutes=6)),
+        _event(github, start + timedelta(minutes=7)),
+        # Marked forwarded without a status
+        _event(github, start + timedelta(minutes=8), True, None, timedelta(seconds=1)),
+        # 3xx counts as neither successful nor failed
+        _event(stripe, start + timedelta(minutes=9), True, 302, timedelta(milliseconds=300)),
+    ])
+    await db.commit()
+    return {"stripe": stripe, "github": github, "idle": idle}
+
+
+async def _reference_for(db, provider=None):
+    stmt = select(WebhookEvent)
+    if provider is not None:
+        stmt = stmt.where(WebhookEvent.provider_id == provider.id)
+    webhooks = (await db.execute(stmt)).scalars().all()
+    return _reference_stats(webhooks)
+
+
+@pytest.mark.parametrize("provider_name", [None, "stripe", "github", "idle"])
+async def test_webhook_aggregates_match_reference(db, providers, provider_name):
+    provider = providers.get(provider_name)
+    expected = await _reference_for(db, provider)
+
+    stats = await _webhook_aggregates(db, provider.id if provider else None)
+
+    assert stats.total == expected["total"]
+    assert stats.successful == expected["successful"]
+    assert stats.failed == expected["failed"]
+    assert stats.pending == expected["pending"]
+    assert stats.last_webhook_at == expected["last_webhook_at"]
+    # The endpoints only report the average once something succeeded
+    if expected["successful"]:
+        assert stats.avg_response_time == pytest.approx(expected["avg_response_time"], abs=1e-3)
+
+
+@pytest.mark.parametrize("provider_name", ["stripe", "github", "idle"])
+async def test_provider_stats_match_reference(db, providers, provider_name):
+    expected = await _reference_for(db, providers[provider_name])
+
+    stats = await get_provider_stats(provider_name=provider_name, db=db)
+
+    assert stats == {
+        "total_webhooks": expected["total"],
+        "successful_webhooks": expected["successful"],
+        "failed_webhooks": expected["failed"],
+        "last_webhook_at": expected["last_webhook_at"],
+    }
+
+
+def _rollup(provider, bucket, outcome, count, latency_sum=0.0):
+    return MetricRollup(
+        bucket=bucket, provider_id=provider.id, outcome=outcome, count=count,
+        latency_sum=latency_sum
+    )
+
+
+async def test_webhook_stats_read_rollups(db, providers):
+    stripe, github = providers["stripe"], providers["github"]
+    bucket = datetime(2024, 3, 1, 12, 0)
+    db.add_all([
+        _rollup(stripe, bucket, "received", 7),
+        _rollup(stripe, bucket, "forwarded_ok", 3, latency_sum=1.5),
+        _rollup(stripe, bucket + timedelta(minutes=1), "forwarded_failed", 1, latency_sum=10.0),
+        _rollup(github, bucket, "received", 2),
+        _rollup(github, bucket, "forwarded_ok", 1, latency_sum=2.0),
+        _rollup(github, bucket, "invalid_signature", 5),
+    ])
+    await db.commit()
+
+    assert await get_webhook_stats(provider_name="stripe", db=db) == {
+        "total": 7, "successful": 3, "failed": 1, "pending": 3, "avg_response_time": 11.5 / 4
+    }
+    assert await get_webhook_stats(provider_name=None, db=db) == {
+        "total": 9, "successful": 4, "failed": 1, "pending": 4, "avg_response_time": 13.5 / 5
+    }
+    assert await get_webhook_stats(provider_name="idle", db=db) == {
+        "total": 0, "successful": 0, "failed": 0, "pending": 0, "avg_response_time": 0
+    }
+
+
+async def test_security_stats_read_rollups(db, providers):
+    stripe, github = providers["stripe"], providers["github"]
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    db.add_all([
+        _rollup(stripe, now, "received", 50),
+        _rollup(stripe, now, "invalid_signature", 4),
+        _rollup(stripe, now - timedelta(minutes=1), "timestamp_too_old", 2),
+        _rollup(github, now, "rate_limit_exceeded", 3),
+        _rollup(github, now, "replay_attempt", 1),
+        _rollup(github, now - timedelta(days=3), "invalid_signature", 9),
+    ])
+    raw_events = (
+        ("10.0.0.1", 3, timedelta(minutes=5)),
+        ("10.0.0.2", 1, timedelta(minutes=5)),
+        ("10.0.0.3", 6, timedelta(days=2)),
+    )
+    for ip_address, count, age in raw_events:
+        db.add_all([
+            SecurityLog(
+                id=uuid.uuid4(), provider_name="github", event_type="rate_limit_exceeded",
+                ip_address=ip_address, details={}, created_at=now - age
+            )
+            for _ in range(count)
+        ])
+    await db.commit()
+
+    stats = await get_security_stats(
+        provider_name=None, date_from=None, date_to=None, top_n=10, db=db
+    )
+    assert stats["events_by_type"] == {
+        "invalid_signature": 13,
+        "timestamp_too_old": 2,
+        "rate_limit_exceeded": 3,
+        "replay_attempt": 1,
+    }
+    assert stats["total_events"] == 19
+    assert stats["invalid_signatures"] == 13
+    assert stats["timestamp_errors"] == 2
+    # All time, like the counts
+    assert stats["top_ips"] == [
+        {"ip_address": "10.0.0.3", "count": 6},
+        {"ip_address": "10.0.0.1", "count": 3},
+        {"ip_address": "10.0.0.2", "count": 1},
+    ]
+
+    since = (now - timedelta(hours=1)).isoformat()
+    stats = await get_security_stats(
+        provider_name="github", date_from=since, date_to=None, top_n=1, db=db
+    )
+    assert stats["events_by_type"] == {"rate_limit_exceeded": 3, "replay_attempt": 1}
+    assert stats["top_ips"] == [{"ip_address": "10.0.0.1", "count": 3}]
+
+    stats = await get_security_stats(
+        provider_name="unknown", date_from=None, date_to=None, top_n=0, db=db
+    )
+    assert stats["total_events"] == 0
+    assert stats["top_ips"] == []
@@ -1,14 +1,16 @@
 'use client'
 
 import React from 'react'
-import { useSecurityLogs } from '@/hooks/useSecurityLogs'
+import { useSecurityLogsPage } from '@/hooks/useSecurityLogs'
+import { useCursorPagination } from '@/hooks/useCursorPagination'
 import { formatDateTime, formatEventType, formatIPAddress } from '@/utils/formatters'
 import { DataTable } from '@/components/ui/DataTable'
 import DashboardLayout from '@/components/layout/DashboardLayout'
 import gsap from 'gsap'
 
 export default function SecurityLogsPage() {
-    const { data: logs, isLoading, error } = useSecurityLogs()
+    const { cursor, page, nextPage, prevPage } = useCursorPagination()
+    const { data, isLoading, isFetching, error } = useSecurityLogsPage(undefined, 50, cursor)
 
     React.useEffect(() => {
         gsap.from('.page-header', { opacity: 0, x: -20, duration: 0.5, ease: 'power2.out' })
@@ -43,8 +45,15 @@ export default function SecurityLogsPage() {
                 ) : (
                     <DataTable
                         columns={columns}
-                        data={logs || []}
+                        data={data?.items || []}
                         delay={0.2}
+                        pagination={{
+                            page,
+                            hasNextPage: !!data?.next_cursor,
+                            onNextPage: () => nextPage(data?.next_cursor),
+                            onPrevPage: prevPage,
+                            isFetching,
+                        }}
                     />
                 )}
             </div>
@@ -1,14 +1,16 @@
 'use client'
 
 import React from 'react'
-import { useWebhookEvents } from '@/hooks/useWebhooks'
+import { useWebhookEventsPage } from '@/hooks/useWebhooks'
+import { useCursorPagination } from '@/hooks/useCursorPagination'
 import { formatDateTime } from '@/utils/formatters'
 import { DataTable } from '@/components/ui/DataTable'
 import DashboardLayout from '@/components/layout/DashboardLayout'
 import gsap from 'gsap'
 
 export default function WebhooksPage() {
-    const { data: webhooks, isLoading, error } = useWebhookEvents()
+    const { cursor, page, nextPage, prevPage } = useCursorPagination()
+    const { data, isLoading, isFetching, error } = useWebhookEventsPage(undefined, 50, cursor)
 
     React.useEffect(() => {
         gsap.from('.page-header', { opacity: 0, x: -20, duration: 0.5, ease: 'power2.out' })
@@ -55,8 +57,15 @@ export default function WebhooksPage() {
                 ) : (
                     <DataTable
                         columns={columns}
-                        data={webhooks || []}
+                        data={data?.items || []}
                         delay={0.2}
+                        pagination={{
+                            page,
+                            hasNextPage: !!data?.next_cursor,
+                            onNextPage: () => nextPage(data?.next_cursor),
+                            onPrevPage: prevPage,
+                            isFetching,
+                        }}
                     />
                 )}
             </div>
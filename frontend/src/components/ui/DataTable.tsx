@@ -8,14 +8,23 @@ interface Column {
     render?: (item: any) => React.ReactNode
 }
 
+interface PaginationProps {
+    page: number  // zero-based
+    hasNextPage: boolean
+    onNextPage: () => void
+    onPrevPage: () => void
+    isFetching?: boolean
+}
+
 interface DataTableProps {
     title?: string
     columns: Column[]
     data: any[]
     delay?: number
+    pagination?: PaginationProps
 }
 
-export function DataTable({ title, columns, data, delay = 0 }: DataTableProps) {
+export function DataTable({ title, columns, data, delay = 0, pagination }: DataTableProps) {
     const animationDelay = `${delay}s`
 
     return (
@@ -76,6 +85,31 @@ export function DataTable({ title, columns, data, delay = 0 }: DataTableProps) {
                     </tbody>
                 </table>
             </div>
+
+            {pagination && (
+                <div className="px-6 py-4 border-t border-slate-700 flex items-center justify-between">
+                    <span className="text-sm text-slate-400">
+                        Page {pagination.page + 1}
+                        {pagination.isFetching && <span className="ml-2 animate-pulse">Loading...</span>}
+                    </span>
+                    <div className="flex gap-2">
+                        <button
+                            onClick={pagination.onPrevPage}
+                            disabled={pagination.page === 0}
+                            className="px-3 py-1.5 rounded-lg text-sm font-medium bg-slate-700 text-slate-200 hover:bg-slate-600 disabled:opacity-40 disabled:cursor-not-allowed transition-colors"
+                        >
+                            Previous
+                        </button>
+                        <button
+                            onClick={pagination.onNextPage}
+                            disabled={!pagination.hasNextPage}
+                            className="px-3 py-1.5 rounded-lg text-sm font-medium bg-slate-700 text-slate-200 hover:bg-slate-600 disabled:opacity-40 disabled:cursor-not-allowed transition-colors"
+                        >
+                            Next
+                        </button>
+                    </div>
+                </div>
+            )}
         </div>
     )
 }
@@ -0,0 +1,30 @@
+/**
+ * Cursor pagination state for list pages
+ *
+ * Keeps the cursors of the pages already visited, so "previous" goes back
+ * without the API having to support reverse paging.
+ */
+
+import { useCallback, useState } from 'react'
+
+export const useCursorPagination = () => {
+    // cursors[i] is the cursor that loads page i (page 0 has none)
+    const [cursors, setCursors] = useState<(string | null)[]>([null])
+
+    const page = cursors.length - 1
+    const cursor = cursors[page]
+
+    const nextPage = useCallback((nextCursor: string | null | undefined) => {
+        if (nextCursor) setCursors((prev) => [...prev, nextCursor])
+    }, [])
+
+    const prevPage = useCallback(() => {
+        setCursors((prev) => (prev.length > 1 ? prev.slice(0, -1) : prev))
+    }, [])
+
+    const reset = useCallback(() => setCursors([null]), [])
+
+    return { cursor, page, nextPage, prevPage, reset }
+}
+
+export default useCursorPagination
@@ -2,7 +2,7 @@
  * Custom hook for security logs data fetching with React Query
  */
 
-import { useQuery, useMutation } from '@tanstack/react-query'
+import { useQuery, useMutation, keepPreviousData } from '@tanstack/react-query'
 import { SecurityLogFilters } from '@/types'
 import * as securityLogService from '@/services/security-logs'
 import { useNotificationStore } from '@/store/useNotificationStore'
@@ -31,6 +31,22 @@ export const useSecurityLogs = (
     })
 }
 
+/**
+ * Hook to fetch one cursor page of security logs
+ * (keeps showing the current page while the next one loads)
+ */
+export const useSecurityLogsPage = (
+    filters?: SecurityLogFilters,
+    limit: number = 50,
+    cursor: string | null = null
+) => {
+    return useQuery({
+        queryKey: securityLogKeys.list({ filters, limit, cursor }),
+        queryFn: () => securityLogService.getSecurityLogsPage(filters, limit, cursor),
+        placeholderData: keepPreviousData,
+    })
+}
+
 /**
  * Hook to fetch a single security log
  */
@@ -82,6 +98,7 @@ export const useExportSecurityLogs = () => {
 
 export default {
     useSecurityLogs,
+    useSecurityLogsPage,
     useSecurityLog,
     useSecurityStats,
     useExportSecurityLogs,
@@ -2,7 +2,7 @@
  * Custom hook for webhook data fetching with React Query
  */
 
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { useQuery, useMutation, useQueryClient, keepPreviousData } from '@tanstack/react-query'
 import { WebhookResponse } from '@/types'
 import * as webhookService from '@/services/webhooks'
 import { useNotificationStore } from '@/store/useNotificationStore'
@@ -31,6 +31,22 @@ export const useWebhookEvents = (
     })
 }
 
+/**
+ * Hook to fetch one cursor page of webhook events
+ * (keeps showing the current page while the next one loads)
+ */
+export const useWebhookEventsPage = (
+    providerName?: string,
+    limit: number = 50,
+    cursor: string | null = null
+) => {
+    return useQuery({
+        queryKey: webhookKeys.list({ providerName, limit, cursor }),
+        queryFn: () => webhookService.getWebhookEventsPage(providerName, limit, cursor),
+        placeholderData: keepPreviousData,
+    })
+}
+
 /**
  * Hook to fetch a single webhook event
  */
@@ -101,6 +117,7 @@ export const useRetryWebhook = (webhookId: string) => {
 
 export default {
     useWebhookEvents,
+    useWebhookEventsPage,
     useWebhookEvent,
     useWebhookStats,
     useSendTestWebhook,
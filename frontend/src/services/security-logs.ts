@@ -4,7 +4,7 @@
  */
 
 import { apiClient } from './api'
-import { SecurityLog } from '@/types'
+import { CursorPage, SecurityLog } from '@/types'
 
 /**
  * Get security logs
@@ -39,6 +39,42 @@ export const getSecurityLogs = async (
     }
 }
 
+/**
+ * Get one page of security logs using cursor pagination.
+ * Pass the previous page's next_cursor to continue; constant time per page.
+ */
+export const getSecurityLogsPage = async (
+    filters?: {
+        event_type?: string
+        provider_name?: string
+        date_from?: string
+        date_to?: string
+    },
+    limit: number = 50,
+    cursor?: string | null
+): Promise<CursorPage<SecurityLog>> => {
+    try {
+        const params = new URLSearchParams()
+        if (filters?.event_type) params.append('event_type', filters.event_type)
+        if (filters?.provider_name) params.append('provider_name', filters.provider_name)
+        if (filters?.date_from) params.append('date_from', filters.date_from)
+        if (filters?.date_to) params.append('date_to', filters.date_to)
+        params.append('limit', limit.toString())
+        if (cursor) params.append('cursor', cursor)
+
+        const response = await apiClient.get<SecurityLog[]>(
+            `/admin/logs?${params.toString()}`
+        )
+        return {
+            items: response.data,
+            next_cursor: response.headers['x-next-cursor'] ?? null,
+        }
+    } catch (error) {
+        console.warn('Security logs endpoint not available')
+        return { items: [], next_cursor: null }
+    }
+}
+
 /**
  * Get security log details
  */
@@ -50,19 +86,26 @@ export const getSecurityLog = async (logId: string): Promise<SecurityLog> => {
 }
 
 /**
- * Get security statistics
+ * Get security statistics, optionally for one provider and time window
  */
-export const getSecurityStats = async (): Promise<{
+export const getSecurityStats = async (params?: {
+    provider_name?: string
+    date_from?: string
+    date_to?: string
+    top_n?: number
+}): Promise<{
     total_events: number
     invalid_signatures: number
     rate_limit_events: number
     replay_attempts: number
     timestamp_errors: number
     events_by_type: Record<string, number>
+    top_ips: { ip_address: string; count: number }[]
 }> => {
     try {
         const response = await apiClient.get(
-            '/admin/logs/stats'
+            '/admin/logs/stats',
+            { params }
         )
         return response.data
     } catch (error) {
@@ -74,6 +117,7 @@ export const getSecurityStats = async (): Promise<{
             replay_attempts: 0,
             timestamp_errors: 0,
             events_by_type: {},
+            top_ips: [],
         }
     }
 }
@@ -106,6 +150,7 @@ export const exportSecurityLogs = async (
 
 export default {
     getSecurityLogs,
+    getSecurityLogsPage,
     getSecurityLog,
     getSecurityStats,
     exportSecurityLogs,
@@ -5,7 +5,7 @@
 
 import { apiClient } from './api'
 import { API_CONFIG } from '@/config/api.config'
-import { WebhookEvent, WebhookResponse } from '@/types'
+import { CursorPage, WebhookEvent, WebhookResponse } from '@/types'
 
 /**
  * Send a test webhook to a provider
@@ -54,6 +54,34 @@ export const getWebhookEvents = async (
     }
 }
 
+/**
+ * Get one page of webhook events using cursor pagination.
+ * Pass the previous page's next_cursor to continue; constant time per page.
+ */
+export const getWebhookEventsPage = async (
+    providerName?: string,
+    limit: number = 50,
+    cursor?: string | null
+): Promise<CursorPage<WebhookEvent>> => {
+    try {
+        const params = new URLSearchParams()
+        if (providerName) params.append('provider_name', providerName)
+        params.append('limit', limit.toString())
+        if (cursor) params.append('cursor', cursor)
+
+        const response = await apiClient.get<WebhookEvent[]>(
+            `${API_CONFIG.ENDPOINTS.ADMIN_WEBHOOKS}?${params.toString()}`
+        )
+        return {
+            items: response.data,
+            next_cursor: response.headers['x-next-cursor'] ?? null,
+        }
+    } catch (error) {
+        console.warn('Webhooks list endpoint not available')
+        return { items: [], next_cursor: null }
+    }
+}
+
 /**
  * Get webhook event details
  */
@@ -107,6 +135,7 @@ export const getWebhookStats = async (providerName?: string): Promise<{
 export default {
     sendTestWebhook,
     getWebhookEvents,
+    getWebhookEventsPage,
     getWebhookEvent,
     retryWebhook,
     getWebhookStats,
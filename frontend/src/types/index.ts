@@ -3,12 +3,28 @@
  */
 
 // Provider types
+export type SignatureScheme =
+    | 'sha256-hex'
+    | 'sha512-hex'
+    | 'sha256-base64'
+    | 'sha512-base64'
+    | 'timestamped-sha256'
+
+export type RateLimitAlgorithm = 'fixed_window' | 'sliding_window' | 'gcra'
+
 export interface Provider {
     id: string
     name: string
     secret_key: string
     forwarding_url: string
     is_active: boolean
+    max_payload_size_bytes?: number | null
+    signature_scheme?: SignatureScheme
+    rate_limit_algorithm?: RateLimitAlgorithm | null
+    rate_limit_requests?: number | null
+    rate_limit_period_seconds?: number | null
+    rate_limit_burst?: number | null
+    captured_headers?: string[] | null
     created_at?: string
     updated_at?: string
 }
@@ -17,12 +33,29 @@ export interface ProviderCreate {
     name: string
     secret_key: string
     forwarding_url: string
+    max_payload_size_bytes?: number
+    signature_scheme?: SignatureScheme
+    additional_secret_keys?: string[]
+    rate_limit_algorithm?: RateLimitAlgorithm
+    rate_limit_requests?: number
+    rate_limit_period_seconds?: number
+    rate_limit_burst?: number
+    captured_headers?: string[]
 }
 
 export interface ProviderUpdate {
     secret_key?: string
     forwarding_url?: string
     is_active?: boolean
+    max_payload_size_bytes?: number
+    signature_scheme?: SignatureScheme
+    additional_secret_keys?: string[]
+    // null (or 'default' / 0) resets a rate limit field to the global default
+    rate_limit_algorithm?: RateLimitAlgorithm | 'default' | null
+    rate_limit_requests?: number | null
+    rate_limit_period_seconds?: number | null
+    rate_limit_burst?: number | null
+    captured_headers?: string[]
 }
 
 // Webhook event types
@@ -30,8 +63,9 @@ export interface WebhookEvent {
     id: string
     provider_id: string
     request_id: string
-    payload: Record<string, any>
-    headers: Record<string, string>
+    payload: Record<string, any> | null  // null if an archived payload can't be read
+    headers: Record<string, string> | null
+    archived: boolean
     signature_valid: boolean
     forwarded: boolean
     received_at: string
@@ -86,6 +120,12 @@ export interface PaginatedResponse<T> {
     pages: number
 }
 
+// Cursor (keyset) pagination: next_cursor is null on the last page
+export interface CursorPage<T> {
+    items: T[]
+    next_cursor: string | null
+}
+
 // Filter types
 export interface ProviderFilters {
     search?: string